@@ -0,0 +1,149 @@
+"""
+Drive a brain over its stdin/stdout pipes while it is thinking and check how long stop()
+takes to return for the commands that interrupt a turn (RESTART, TURN, END). The brain
+reports every stop() wait when PISQPIPE_REPORT_STOP_WAIT is set, the reply time of RESTART
+is measured from outside as well. Exits with status 1 when a stop() wait exceeds the bound.
+This is the manual benchmark, tests/test_protocol.py checks the replies and the bound.
+
+    python bench_protocol.py --rounds 200 --bound-ms 50
+    python bench_protocol.py --cmd "dist/pbrain-agent/pbrain-agent.exe"
+"""
+
+import argparse
+import os
+import queue
+import shlex
+import subprocess
+import sys
+import threading
+import time
+
+DEFAULT_CMD = [
+    sys.executable,
+    os.path.join(os.path.dirname(__file__), "gomoku_agent_template.py"),
+]
+
+
+class BrainProcess:
+    def __init__(self, cmd: list[str]):
+        env = dict(os.environ, PISQPIPE_REPORT_STOP_WAIT="1")
+        self.process = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+            env=env,
+        )
+        self.lines: queue.Queue = queue.Queue()
+        self.stop_waits: queue.Queue = queue.Queue()
+        threading.Thread(target=self._read, daemon=True).start()
+
+    def _read(self):
+        for line in self.process.stdout:
+            line = line.strip()
+            if line.startswith("DEBUG stop "):
+                self.stop_waits.put(float(line.split()[2]))
+            else:
+                self.lines.put(line)
+
+    def send(self, command: str):
+        self.process.stdin.write(command + "\n")
+        self.process.stdin.flush()
+
+    def expect_ok(self, timeout=10.0):
+        """wait for OK, skipping moves and DEBUG or MESSAGE output"""
+        deadline = time.perf_counter() + timeout
+        while True:
+            line = self.lines.get(timeout=max(deadline - time.perf_counter(), 0))
+            if line == "OK":
+                return
+            if not (is_move(line) or line.startswith(("DEBUG", "MESSAGE"))):
+                raise RuntimeError(f"unexpected brain output: {line}")
+
+    def next_stop_waits(self, count: int, timeout=10.0):
+        """stop() waits of the next count commands that called it, in command order"""
+        return [self.stop_waits.get(timeout=timeout) for _ in range(count)]
+
+
+def is_move(line: str):
+    return line.count(",") == 1 and all(v.isdigit() for v in line.split(","))
+
+
+def percentile(values: list[float], p: float):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * p / 100), len(ordered) - 1)]
+
+
+def measure(cmd: list[str], rounds: int):
+    brain = BrainProcess(cmd)
+    brain.send("START 20")
+    brain.expect_ok()
+    brain.next_stop_waits(1)
+
+    stop_waits: dict[str, list[float]] = {"RESTART": [], "TURN": [], "END": []}
+    replies: list[float] = []
+    for i in range(rounds):
+        # RESTART while thinking about the first move
+        brain.send("BEGIN")
+        start = time.perf_counter()
+        brain.send("RESTART")
+        brain.expect_ok()
+        replies.append((time.perf_counter() - start) * 1000)
+        _, restart = brain.next_stop_waits(2)
+        stop_waits["RESTART"].append(restart)
+
+        # TURN while thinking about the first move, then RESTART while thinking about the turn
+        # (the opponent's move is kept off the center, where BEGIN plays)
+        brain.send("BEGIN")
+        brain.send(f"TURN {i % 20},0")
+        brain.send("RESTART")
+        brain.expect_ok()
+        _, turn, restart = brain.next_stop_waits(3)
+        stop_waits["TURN"].append(turn)
+        stop_waits["RESTART"].append(restart)
+
+    brain.send("BEGIN")
+    brain.send("END")
+    _, end = brain.next_stop_waits(2)
+    stop_waits["END"].append(end)
+    brain.process.wait(timeout=10)
+    return stop_waits, replies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--cmd", help="brain command line, defaults to the agent template"
+    )
+    parser.add_argument("--rounds", type=int, default=100)
+    parser.add_argument(
+        "--bound-ms",
+        type=float,
+        default=50,
+        help="fail if stop() ever waits longer than this for the working thread",
+    )
+    args = parser.parse_args()
+    cmd = shlex.split(args.cmd) if args.cmd else DEFAULT_CMD
+
+    stop_waits, replies = measure(cmd, args.rounds)
+    worst = 0.0
+    for command, values in stop_waits.items():
+        worst = max(worst, max(values))
+        print(
+            f"stop() after {command:8} n={len(values):4}  p50={percentile(values, 50):7.3f}ms"
+            f"  p99={percentile(values, 99):7.3f}ms  max={max(values):7.3f}ms"
+        )
+    print(
+        f"RESTART reply while thinking  p50={percentile(replies, 50):7.3f}ms"
+        f"  p99={percentile(replies, 99):7.3f}ms  max={max(replies):7.3f}ms"
+    )
+
+    if worst > args.bound_ms:
+        print(f"FAIL: stop() waited {worst:.3f}ms, bound is {args.bound_ms}ms")
+        sys.exit(1)
+    print(f"OK: stop() always returned within {args.bound_ms}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Measure brain startup: time from launching the process to the OK answering START and to
+the first move answering BEGIN. By default compares the unpackaged agent template with the
+PyInstaller build when one exists; results can be written as JSON to track regressions.
+
+    python bench_startup.py --runs 20 --json startup.json
+    python bench_startup.py --cmd "python pbrain_shim.py"
+"""
+
+import argparse
+import json
+import os
+import shlex
+import statistics
+import subprocess
+import sys
+import time
+
+BASE_BRAIN_PATH = os.path.dirname(os.path.abspath(__file__))
+UNPACKAGED_CMD = [
+    sys.executable,
+    os.path.join(BASE_BRAIN_PATH, "gomoku_agent_template.py"),
+]
+PACKAGED_CMD = [
+    os.path.join(BASE_BRAIN_PATH, "dist", "pbrain-agent", "pbrain-agent.exe")
+]
+
+
+def read_answer(process: subprocess.Popen):
+    """next protocol answer, skipping DEBUG and MESSAGE lines"""
+    while True:
+        line = process.stdout.readline()
+        if not line:
+            raise RuntimeError("brain exited before answering")
+        line = line.strip()
+        if not line.startswith(("DEBUG", "MESSAGE")):
+            return line
+
+
+def time_startup(cmd: list[str]):
+    """seconds until the START answer and until the first move"""
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, bufsize=1
+    )
+    process.stdin.write("START 20\n")
+    process.stdin.flush()
+    answer = read_answer(process)
+    first_ok = time.perf_counter() - start
+    if answer != "OK":
+        raise RuntimeError(f"unexpected START answer: {answer}")
+
+    process.stdin.write("BEGIN\n")
+    process.stdin.flush()
+    read_answer(process)
+    first_move = time.perf_counter() - start
+
+    process.stdin.write("END\n")
+    process.stdin.flush()
+    process.wait(timeout=10)
+    return first_ok, first_move
+
+
+def summarize(values: list[float]):
+    return {
+        "median_ms": round(statistics.median(values) * 1000, 2),
+        "min_ms": round(min(values) * 1000, 2),
+        "max_ms": round(max(values) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--cmd",
+        action="append",
+        help="brain command line to measure, may be repeated",
+    )
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    if args.cmd:
+        commands = {cmd: shlex.split(cmd) for cmd in args.cmd}
+    else:
+        commands = {"unpackaged": UNPACKAGED_CMD}
+        if os.path.exists(PACKAGED_CMD[0]):
+            commands["packaged"] = PACKAGED_CMD
+
+    results = {}
+    for name, cmd in commands.items():
+        runs = [time_startup(cmd) for _ in range(args.runs)]
+        results[name] = {
+            "runs": args.runs,
+            "first_ok": summarize([ok for ok, _ in runs]),
+            "first_move": summarize([move for _, move in runs]),
+        }
+        print(
+            f"{name}: first OK {results[name]['first_ok']['median_ms']}ms,"
+            f" first move {results[name]['first_move']['median_ms']}ms (median of {args.runs})"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Long lived brain server holding many independent Gomocup sessions, so that a game does not
+pay for interpreter startup and numpy imports. Every connection on the Unix socket is one
+session; pbrain_shim.py is the command the tournament manager launches to open one.
+
+A session is a fork of the server running the real brain, gomoku_agent_template and the
+pisqpipe command loop, with the connection as its stdin and stdout. The server imports the
+engine before forking, so sessions start with it loaded, and every session has the module
+state of a freshly started brain.
+
+    python brain_server.py --workers 8
+
+Genetic agents then use the shim as their cmd, e.g. python ../base_brain/pbrain_shim.py
+"""
+
+import argparse
+import io
+import os
+import socketserver
+import sys
+
+import gomoku_agent_template
+import pisqpipe as pp
+from pbrain_shim import SOCKET_PATH
+
+# the engine modules gomoku_agent_template.load_engine imports on the first START, imported
+# here before forking so that each session starts warm
+import evaluation
+import numpy
+import search
+import transposition
+
+
+def get_line():
+    """read a line from the session, the session ends when the shim is gone"""
+    line = sys.stdin.readline()
+    if not line:
+        os._exit(0)
+    return line.strip()
+
+
+class SessionHandler(socketserver.StreamRequestHandler):
+    # the genome line is read unbuffered, the commands after it are left for the brain
+    rbufsize = 0
+
+    def handle(self):
+        """runs in the forked session process, which exits when the brain does"""
+        # the genome is the first line of a session, as the shim got it on its command line
+        genome = self.rfile.readline().decode().strip() or "null"
+        # the brain reads and writes the connection like the pipes of a manager
+        fd = self.connection.fileno()
+        os.dup2(fd, 0)
+        os.dup2(fd, 1)
+        sys.stdin = io.TextIOWrapper(io.FileIO(0, "r", closefd=False))
+        sys.stdout = io.TextIOWrapper(io.FileIO(1, "w", closefd=False))
+        sys.argv = [sys.argv[0]] if genome == "null" else [sys.argv[0], genome]
+        pp.get_line = get_line
+        try:
+            gomoku_agent_template.main()
+        except ValueError as e:
+            pp.pipe_out(f"ERROR {e}")
+        except SystemExit:
+            # END, the session process exits once the connection is closed
+            pass
+
+
+class BrainServer(socketserver.ForkingMixIn, socketserver.UnixStreamServer):
+    # sessions of one worker running at once, more wait for one to end
+    max_children = 256
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--socket", default=SOCKET_PATH)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="processes accepting sessions on the shared socket",
+    )
+    args = parser.parse_args()
+
+    if os.path.exists(args.socket):
+        os.remove(args.socket)
+    server = BrainServer(args.socket, SessionHandler)
+    # pre-fork workers share the listening socket, a worker that loses the race for a
+    # connection just goes back to waiting instead of blocking in accept
+    server.socket.setblocking(False)
+    for _ in range(args.workers - 1):
+        if os.fork() == 0:
+            break
+
+    print(f"brain server (pid {os.getpid()}) listening on {args.socket}", flush=True)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
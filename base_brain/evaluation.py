@@ -0,0 +1,250 @@
+# vectorized threat evaluation, scores every point of a board in a few array operations
+# board convention: 0 = empty, 1 = my stone, -1 = opponent's stone, 3 = winning move
+
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+THREAT_SCALE = 1000
+# score of a point that completes five for the player
+WIN_SCORE = 2.0 * THREAT_SCALE
+MAX_LENGTH = 5
+REACH = MAX_LENGTH - 1  # points crawled in each direction from the center
+WINDOW = 2 * REACH + 1
+# value read for points outside of the board, blocks threats of both players
+EDGE = 4
+directions = [[0, 1], [1, 1], [1, 0], [1, -1]]
+
+# a threat only depends on the 8 neighbours of a point along a direction, each of which
+# is open, one of the player's pieces or a blocker (opponent's piece or board edge)
+OPEN, OWN, BLOCKER = 0, 1, 2
+NEIGHBOURS = WINDOW - 1
+PATTERN_COUNT = 3**NEIGHBOURS
+# base 3 digit weight of each window index, the center point does not count
+PATTERN_POWERS = np.array(
+    [3**i for i in range(REACH)] + [0] + [3**i for i in range(REACH, NEIGHBOURS)],
+    dtype=np.int16,
+)
+
+
+def line_windows(board: np.ndarray, fill=EDGE):
+    """
+    Return one strided view per direction holding the 9 point line centred on every point.
+    Each view has shape board.shape + (9,), window index 4 is the point itself
+    """
+    pad = [(0, 0)] * (board.ndim - 2) + [(REACH, REACH)] * 2
+    padded = np.pad(board, pad, constant_values=fill)
+    *batch, width, height = board.shape
+    stride_x, stride_y = padded.strides[-2:]
+
+    windows = []
+    for dx, dy in directions:
+        # start each window at the point REACH steps back along the direction
+        start = padded[..., REACH - REACH * dx :, REACH - REACH * dy :]
+        windows.append(
+            as_strided(
+                start,
+                shape=(*batch, width, height, WINDOW),
+                strides=(
+                    *padded.strides[:-2],
+                    stride_x,
+                    stride_y,
+                    dx * stride_x + dy * stride_y,
+                ),
+                writeable=False,
+            )
+        )
+    return windows
+
+
+def crawl(own: np.ndarray, blocker: np.ndarray):
+    """
+    Follow one side of a line outwards from the center, last axis ordered by distance.
+    Returns the pieces counted before the first blocker, whether a blocker was found
+    and the number of open points before it (0 when the side is not blocked)
+    """
+    open_so_far = np.logical_and.accumulate(~blocker, axis=-1)
+    tiles = (own & open_so_far).sum(axis=-1)
+    blocked = ~open_so_far[..., -1]
+    length = np.where(blocked, np.argmax(blocker, axis=-1), 0)
+    return tiles, blocked, length
+
+
+def threat_features(own: np.ndarray, blocker: np.ndarray):
+    """
+    Compute the threat of a single direction from the 9 point line of each point.
+    Returns the lookup index of the threat, whether it completes five and whether the
+    line is too closed in to ever make five (which ends the scan of further directions)
+    """
+    tiles_pos, blocked_pos, length_pos = crawl(
+        own[..., REACH + 1 :], blocker[..., REACH + 1 :]
+    )
+    tiles_neg, blocked_neg, length_neg = crawl(
+        own[..., REACH - 1 :: -1], blocker[..., REACH - 1 :: -1]
+    )
+
+    tiles = 1 + tiles_pos + tiles_neg
+    blocked = blocked_pos | blocked_neg
+    closed = (
+        (length_pos != 0)
+        & (length_neg != 0)
+        & (length_pos + length_neg + 1 < MAX_LENGTH)
+    )
+    win = tiles >= MAX_LENGTH
+    # blocked threats use the closed entry of the lookup table, open threats the open one
+    index = np.clip(np.where(blocked, 2 * tiles - 2, 2 * tiles - 1), 0, 7)
+    return index, win, closed
+
+
+def combine_directions(values, wins, closed):
+    """
+    Sum the per direction values, directions along the last axis in direction order. A
+    closed direction stops the scan, any direction completing five before that makes the
+    point a win
+    """
+    active = np.logical_and.accumulate(~closed, axis=-1)
+    winning = (active & wins).any(axis=-1)
+    total = np.where(active, values, 0).sum(axis=-1)
+    return np.where(winning, WIN_SCORE, total)
+
+
+def pattern_features():
+    """Threat features of every neighbour pattern, independent of the genome"""
+    # the center has no digit, decode it with a dummy power and mark it open
+    powers = np.where(PATTERN_POWERS == 0, 1, PATTERN_POWERS)
+    digits = (np.arange(PATTERN_COUNT)[:, None] // powers) % 3
+    digits[:, REACH] = OPEN
+    return threat_features(digits == OWN, digits == BLOCKER)
+
+
+PATTERN_INDEX, PATTERN_WIN, PATTERN_CLOSED = pattern_features()
+
+# offsets of the 9 point line of every direction from its center, (direction, window index)
+LINE_DX, LINE_DY = (
+    np.array([[(k - REACH) * d[axis] for k in range(WINDOW)] for d in directions])
+    for axis in (0, 1)
+)
+
+
+def build_pattern_table(genome):
+    """Score of every neighbour pattern for a genome, indexed by pattern code"""
+    return genome_lookup(genome)[PATTERN_INDEX]
+
+
+def point_states(board: np.ndarray, player=1):
+    """OPEN, OWN or BLOCKER of every point for player"""
+    # codes stay below 3**8, small integers keep the window products cheap
+    return np.where(
+        board == player, OWN, np.where(board == -player, BLOCKER, OPEN)
+    ).astype(np.int16)
+
+
+def pattern_codes(board: np.ndarray, player=1):
+    """Base 3 neighbour pattern code of every point, directions along the last axis"""
+    windows = line_windows(point_states(board, player), fill=BLOCKER)
+    return np.stack([window @ PATTERN_POWERS for window in windows], axis=-1)
+
+
+def lookup_codes(table: np.ndarray, code: np.ndarray):
+    """
+    Index a pattern table with pattern codes. A stack of tables (one per board) is indexed
+    along the leading axis of the codes, so each board is scored with its own genome
+    """
+    if table.ndim == 1:
+        return table[code]
+    offsets = np.arange(len(table)) * PATTERN_COUNT
+    return np.take(table, code + offsets.reshape((-1,) + (1,) * (code.ndim - 1)))
+
+
+def score_codes(codes, table: np.ndarray):
+    """Score points from their pattern codes, directions along the last axis"""
+    return combine_directions(
+        lookup_codes(table, codes), PATTERN_WIN[codes], PATTERN_CLOSED[codes]
+    )
+
+
+def score_board(board: np.ndarray, table: np.ndarray, player=1):
+    """
+    Score every point of the board for player, occupied points included.
+    Also accepts a stack of boards together with one pattern table per board
+    """
+    return score_codes(pattern_codes(board, player), table)
+
+
+def score_points(board: np.ndarray, xs, ys, table: np.ndarray, player=1):
+    """Score only the points (xs[i], ys[i]) of the board for player"""
+    # only the lines through the points are gathered and encoded, not the whole board
+    # points off the board read as the opponent, blocking the line like the board edge
+    padded = np.pad(board, REACH, constant_values=-player)
+    lines = padded[np.add.outer(xs, LINE_DX + REACH), np.add.outer(ys, LINE_DY + REACH)]
+    return score_codes(point_states(lines, player) @ PATTERN_POWERS, table)
+
+
+def genome_lookup(genome):
+    """Scaled threat values of a genome, indexed by lookup index"""
+    return np.array(genome[:-1]) * THREAT_SCALE
+
+
+def relevant_points(board: np.ndarray):
+    """Mask of the points with a piece within their 9*9 relevance window"""
+    # box sum of occupied points through a summed area table
+    pad = [(0, 0)] * (board.ndim - 2) + [(REACH + 1, REACH)] * 2
+    summed = np.pad(board != 0, pad).cumsum(axis=-1).cumsum(axis=-2)
+    counts = (
+        summed[..., WINDOW:, WINDOW:]
+        - summed[..., :-WINDOW, WINDOW:]
+        - summed[..., WINDOW:, :-WINDOW]
+        + summed[..., :-WINDOW, :-WINDOW]
+    )
+    return counts > 0
+
+
+def total_scores(offensive, defensive, candidates, aggression):
+    """
+    Weight offensive and defensive scores by aggression, the brain truncates the scores
+    to whole values before and after weighting. Points that are not candidates score 0
+    """
+    total = aggression * offensive.astype(int) + (1 - aggression) * defensive.astype(
+        int
+    )
+    return np.where(candidates, total, 0).astype(int)
+
+
+def completes_five(board: np.ndarray, x, y, player=1, exact=True):
+    """Whether the piece of player at (x, y) is part of five in a row (exactly five if exact)"""
+    width, height = board.shape
+    for dx, dy in directions:
+        length = 1
+        for sign in (1, -1):
+            i, j = x + sign * dx, y + sign * dy
+            while 0 <= i < width and 0 <= j < height and board[i, j] == player:
+                length += 1
+                i += sign * dx
+                j += sign * dy
+        if length == MAX_LENGTH or (length > MAX_LENGTH and not exact):
+            return True
+    return False
+
+
+def best_move(totals: np.ndarray, rng=np.random):
+    """Randomly pick one of the highest scoring points, None if every point scores the same"""
+    max_score = np.max(totals)
+    if max_score == np.min(totals):
+        return None
+    max_positions = np.argwhere(totals == max_score)
+    x, y = max_positions[rng.choice(len(max_positions))]
+    return int(x), int(y)
+
+
+def choose_move(board: np.ndarray, table: np.ndarray, aggression, rng=np.random):
+    """
+    Move of the brain on a board seen from its own perspective: the best aggression
+    weighted score among the empty points in relevance range, the center if none stands out
+    """
+    candidates = relevant_points(board) & (board == 0)
+    offensive = score_board(board, table)
+    defensive = score_board(board, table, player=-1)
+    move = best_move(total_scores(offensive, defensive, candidates, aggression), rng)
+    if move is None:
+        width, height = board.shape
+        move = (width // 2, height // 2)
+    return move
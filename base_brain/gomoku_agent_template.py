@@ -1,113 +1,149 @@
 import json
 import sys
 
-import numpy as np
 import pisqpipe as pp
 from pisqpipe import state
-from scipy import signal
-from structs import Point
+from structs import DEFAULT_GENOME, Point
+
+# numpy and the evaluator are imported by load_engine on the first START, so that starting
+# the brain stays cheap
+np = None
+evaluation = None
+search = None
+transposition = None
 
 pp.infotext = 'name="pbrain-geneticPeabrain", authors="Andrew Petten, Chance Kane, Jack Klobchar, Tim Xu"'
 # genome for the genetic algorithm 11 values, 10 arbitrary, one constrained to [0,1]
 # #genome = [zero-closed,zero-open,one-closed,one-open,two-closed,two-open,three-closed,three-open,four-closed,four-open, aggression]
 # default genome values
-genome = [0.004, 0.008, 0.016, 0.032, 0.064, 0.56, 0.5, 1.0, 0.5]
-THREAT_SCALE = 1000
+genome = list(DEFAULT_GENOME)
+# threat score of every line pattern for the genome, loaded by load_engine
+patternTable = None
 
 MAX_BOARD = 20
 # 0 = empty, 1 = my stone, 2 = opponent's stone, 3 = winning move
 board = [[0 for i in range(MAX_BOARD)] for j in range(MAX_BOARD)]
-relevanceKernal = np.ones((9, 9))  # used to track relevance of a point
-directions = [[0, 1], [1, 1], [1, 0], [1, -1]]
-# possible alternatives for kernels: 8 compass directions? twice as many ops, but better for threats accurately
-
-
-def clamp(value, min_val, max_val):
-    """Clamps a single numerical value within a specified range."""
-    return max(min(value, max_val), min_val)
-
-
-# Generate and return a board mask indicating which positions are within relevance range of another piece
-def identify_relevant_positions(board):
-    relevantMask = np.zeros_like(board, dtype=int)  # create blank mask
-    convolved = signal.convolve2d(
-        board, relevanceKernal, mode="same", boundary="fill", fillvalue=0
-    )  # convolve board with 9*9 of 1s to render any point within 5 squares of a piece nonzero
-    relevantMask = (
-        convolved != 0
-    ) * 1  # update mask to show locations within 5 of another piece
-    return relevantMask
-
-
-def calculate_value_at_point(board, x, y, maxLength=5, player=1):
-    value = 0
-    lookup = np.array(genome[:-1]) * THREAT_SCALE
-    for direction in directions:
-        i, j = x, y
-        tilesInARow = 1
-        lengthPos, lengthNeg = 0, 0
-        blocked = False
-
-        for k in range(1, maxLength):  # crawl direction out to max length
-            i += direction[0]
-            j += direction[1]
-            if i < 0 or i >= len(board) or j < 0 or j >= len(board[0]):
-                lengthPos = k - 1
-                blocked = True
-                break
-            if board[i][j] == 0:
-                continue
-            elif board[i][j] == player:  # if new piece of
-                tilesInARow += 1
-            # if there's an enemy piece, threat cannot continue in this direction
-            elif board[i][j] == -player:
-                lengthPos = k - 1
-                blocked = True
-                break
-        i, j = x, y
-        for k in range(1, maxLength):  # crawl direction out to max length
-            i -= direction[0]
-            j -= direction[1]
-            if i < 0 or i >= len(board) or j < 0 or j >= len(board[0]):
-                lengthNeg = k - 1
-                blocked = True
-                break
-            if board[i][j] == 0:
-                continue
-            elif board[i][j] == player:  # if new piece of
-                tilesInARow += 1
-            elif (
-                board[i][j] == -player
-            ):  # if there's an enemy piece, threat cannot continue in this direction
-                lengthNeg = k - 1
-                blocked = True
-                break
-        # if continuous length is bounded on both ends
-        if lengthNeg != 0 and lengthPos != 0:
-            maxLengthAlongAxis = lengthNeg + lengthPos + 1
-            # if the max length of contiguous spaces containing this point between obstructions can't possibly generate a winning threat
-            if maxLengthAlongAxis < 5:
-                break
-        if tilesInARow >= 5:
-            # if this point is part of a winning threat, return infinity/max value
-            return 2.0 * THREAT_SCALE
-        if blocked:
-            value += lookup[
-                clamp(2 * (tilesInARow) - 2, 0, len(lookup) - 1)
-            ]  # if the threat is blocked on one side, use the lookup table to get the value of the threat
-        else:
-            value += lookup[clamp(2 * (tilesInARow) - 1, 0, len(lookup) - 1)]
-    return value
+RELEVANCE_RANGE = 4  # a point is relevant if a piece lies within its 9*9 window
+
+# score state kept in sync with the board by place_stone / remove_stone so that a turn
+# only has to rescore the lines through the last changed point, created by reset_scores
+# 0 = empty, 1 = my stone, -1 = opponent's stone, 3 = winning move
+npBoard = None
+offensiveScores = None
+defensiveScores = None
+# number of pieces within the relevance window of each point
+relevanceCounts = None
+# Zobrist hash of npBoard, kept by place_stone / remove_stone
+zobrist = None
+positionHash = 0
+# search results and evaluations kept between turns, sized from INFO max_memory
+transpositionTable = None
+evaluationCache = None
+tableMemory = None
+# points scored by the incremental updates since the last turn, and the counters of the last
+# turn for the pisqpipe trace
+cellsScored = 0
+turnCounters = {}
+
+
+def load_engine():
+    """Import numpy and the evaluator and load the genome's pattern table on first use"""
+    global np, evaluation, search, transposition, patternTable
+    if patternTable is not None:
+        return
+    import evaluation
+    import numpy as np
+    import search
+    import transposition
+
+    patternTable = evaluation.build_pattern_table(genome)
+
+
+def score_points(xs, ys):
+    """Recalculate the offensive and defensive scores of the points (xs[i], ys[i])"""
+    global cellsScored
+    cellsScored += 2 * len(xs)
+    empty = npBoard[xs, ys] == 0
+    offensiveScores[xs, ys] = np.where(
+        empty, evaluation.score_points(npBoard, xs, ys, patternTable), 0
+    )
+    defensiveScores[xs, ys] = np.where(
+        empty, evaluation.score_points(npBoard, xs, ys, patternTable, player=-1), 0
+    )
+
+
+def reset_scores():
+    """Rebuild all score state for an empty board of the current size"""
+    global npBoard, offensiveScores, defensiveScores, relevanceCounts
+    global zobrist, positionHash
+    npBoard = np.zeros((state.width, state.height), dtype=int)
+    if zobrist is None or zobrist.shape != (state.width, state.height):
+        zobrist = transposition.Zobrist(state.width, state.height)
+    positionHash = 0
+    offensiveScores = evaluation.score_board(npBoard, patternTable)
+    defensiveScores = evaluation.score_board(npBoard, patternTable, player=-1)
+    relevanceCounts = np.zeros((state.width, state.height), dtype=int)
+
+
+def update_scores(x, y):
+    """Rescore the points whose threat lines pass through (x, y)"""
+    width, height = npBoard.shape
+    xs, ys = [], []
+    for dx, dy in evaluation.directions:
+        for k in range(-evaluation.REACH, evaluation.REACH + 1):
+            i, j = x + k * dx, y + k * dy
+            if 0 <= i < width and 0 <= j < height:
+                xs.append(i)
+                ys.append(j)
+    score_points(np.array(xs), np.array(ys))
+
+
+def update_relevance(x, y, delta):
+    """Add delta to the relevance count of every point within range of (x, y)"""
+    width, height = relevanceCounts.shape
+    relevanceCounts[
+        max(x - RELEVANCE_RANGE, 0) : min(x + RELEVANCE_RANGE + 1, width),
+        max(y - RELEVANCE_RANGE, 0) : min(y + RELEVANCE_RANGE + 1, height),
+    ] += delta
+
+
+def create_tables():
+    """(Re)create the transposition tables when the memory limit changes"""
+    global transpositionTable, evaluationCache, tableMemory
+    if tableMemory != state.info_max_memory:
+        transpositionTable, evaluationCache = transposition.create_tables(
+            state.info_max_memory, search.MAX_CANDIDATES
+        )
+        tableMemory = state.info_max_memory
+
+
+def place_stone(p: Point, value):
+    global positionHash
+    npBoard[p.x][p.y] = value
+    positionHash ^= zobrist.stone(value, p.x, p.y)
+    update_relevance(p.x, p.y, 1)
+    update_scores(p.x, p.y)
+
+
+def remove_stone(p: Point):
+    global positionHash
+    positionHash ^= zobrist.stone(int(npBoard[p.x][p.y]), p.x, p.y)
+    npBoard[p.x][p.y] = 0
+    update_relevance(p.x, p.y, -1)
+    update_scores(p.x, p.y)
 
 
 def brain_restart():
     for x in range(state.width):
         for y in range(state.height):
             board[x][y] = 0
+    reset_scores()
     pp.pipe_out("OK")
 
 
 def brain_init():
+    load_engine()
+    create_tables()
     if state.width < 5 or state.height < 5:
         pp.pipe_out("ERROR size of the board")
         return
@@ -128,6 +164,7 @@ def is_free(p: Point):
 def brain_my(p: Point):
     if is_free(p):
         board[p.x][p.y] = 1
+        place_stone(p, 1)
     else:
         pp.pipe_out(f"ERROR my move {p}")
 
@@ -135,6 +172,7 @@ def brain_my(p: Point):
 def brain_opponents(p: Point):
     if is_free(p):
         board[p.x][p.y] = 2
+        place_stone(p, -1)
     else:
         pp.pipe_out(f"ERROR opponents's move {p}")
 
@@ -142,6 +180,7 @@ def brain_opponents(p: Point):
 def brain_block(p: Point):
     if is_free(p):
         board[p.x][p.y] = 3
+        place_stone(p, 3)
     else:
         pp.pipe_out(f"ERROR winning move {p}")
 
@@ -149,53 +188,72 @@ def brain_block(p: Point):
 def brain_takeback(p: Point):
     if is_valid(p) and (board[p.x][p.y] != 0):
         board[p.x][p.y] = 0
+        remove_stone(p)
         return 0
     return 2
 
 
 def brain_turn():
+    global cellsScored, turnCounters
     # if AI slated for termination, return immediately
     if state.terminate_ai:
         return
-    npBoard = np.array(board, dtype=int)
-    offensiveScores = np.zeros_like(board)
-    defensiveScores = np.zeros_like(board)
-    totalScores = np.zeros_like(board)
-    relevantPositions = identify_relevant_positions(npBoard)
-    # Replace Gomocup standard format of 2 = opponent piece for computations
-    npBoard[npBoard == 2] = -1
-    validPositions = np.zeros_like(board, dtype=int)
-    validPositions[npBoard == 0] = 1
-    for x in range(len(board)):
-        for y in range(len(board[0])):
-            # poll for termination
-            if state.terminate_ai:
-                return
-
-            if (
-                relevantPositions[x][y] == 1 and validPositions[x][y] == 1
-            ):  # only calculate scores for valid points within 5 of another piece
-                offensiveScores[x][y] = calculate_value_at_point(npBoard, x, y)
-                defensiveScores[x][y] = calculate_value_at_point(
-                    npBoard, x, y, player=-1
-                )
-                totalScores[x][y] = (
-                    genome[-1] * offensiveScores[x][y]
-                    + (1 - genome[-1]) * defensiveScores[x][y]
-                )
-    maxScore = np.max(totalScores)
-    minScore = np.min(totalScores)
-    if maxScore == minScore:  # if all scores are equal, suggest the center of the board
+    turnCounters = {"cells": cellsScored}
+    cellsScored = 0
+    # only use scores for valid points within 5 of another piece
+    candidates = (relevanceCounts > 0) & (npBoard == 0)
+    if not candidates.any():  # empty board, suggest the center of the board
         p = Point(state.width // 2, state.height // 2)
+        pp.pipe_out("DEBUG no stones on the board, choosing center...")
+    else:
+        # root moves ordered by the incrementally kept scores, then searched as deep as
+        # the time controls allow, the best move so far is played if the AI is terminated
+        totalScores = evaluation.total_scores(
+            offensiveScores, defensiveScores, candidates, genome[-1]
+        )
+        timeManager = search.TimeManager(
+            state.info_timeout_turn,
+            state.info_timeout_match,
+            state.info_time_left,
+            state.start_time,
+        )
+        create_tables()
+        transpositionTable.reset_counters()
+        evaluationCache.reset_counters()
+        searcher = search.Search(
+            patternTable,
+            genome[-1],
+            timeManager,
+            lambda: state.terminate_ai,
+            exact5=bool(state.info_exact5),
+            zobrist=zobrist,
+            transpositions=transpositionTable,
+            evaluations=evaluationCache,
+        )
+        move, score = searcher.run(
+            npBoard, search.order_moves(totalScores, candidates), positionHash
+        )
         pp.pipe_out(
-            "DEBUG no relative maximum value position found, choosing center..."
+            f"DEBUG depth {searcher.depth} nodes {searcher.nodes}"
+            f" nps {searcher.nodes_per_second():.0f} score {score:.0f}"
+            f" time {timeManager.elapsed():.0f}/{timeManager.budget:.0f}ms"
         )
-    else:
-        # Find the point with the maximum score
-        max_positions = np.argwhere(totalScores == maxScore)
-        # Randomly choose one of the positions with the maximum score
-        x, y = max_positions[np.random.choice(len(max_positions))]
-        p = Point(int(x), int(y))
+        pp.pipe_out(
+            f"DEBUG {transpositionTable.report('tt')},"
+            f" {evaluationCache.report('eval')}"
+        )
+        # every evaluation cache miss scores the whole board for both players
+        misses = evaluationCache.probes - evaluationCache.hits
+        turnCounters = {
+            "depth": searcher.depth,
+            "nodes": searcher.nodes,
+            "cells": turnCounters["cells"] + 2 * npBoard.size * misses,
+            "tt_hits": transpositionTable.hits,
+            "tt_probes": transpositionTable.probes,
+            "eval_hits": evaluationCache.hits,
+            "eval_probes": evaluationCache.probes,
+        }
+        p = Point(*move)
     if not is_free(p):
         pp.pipe_out(f"ERROR my move {p}")
         return
@@ -210,6 +268,10 @@ def brain_about():
     pp.pipe_out(pp.infotext)
 
 
+def brain_counters():
+    return turnCounters
+
+
 # "overwrites" functions in pisqpipe module
 pp.brain_init = brain_init
 pp.brain_restart = brain_restart
@@ -220,16 +282,17 @@ pp.brain_takeback = brain_takeback
 pp.brain_turn = brain_turn
 pp.brain_end = brain_end
 pp.brain_about = brain_about
+pp.brain_counters = brain_counters
 
 
 def load_genome():
+    global genome
     if len(sys.argv) <= 1:
         pp.pipe_out("DEBUG no genome file provided, using default genome.")
         return
 
     data = json.loads(sys.argv[1])
 
-    global genome
     if (
         isinstance(data, list)
         and len(data) == len(genome)
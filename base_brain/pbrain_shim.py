@@ -0,0 +1,55 @@
+"""
+Stand-in brain executable for the tournament manager. Instead of starting a full brain it
+connects to a running brain_server.py, opens a session with the genome given on the
+command line and forwards the manager's protocol lines in both directions.
+
+    python pbrain_shim.py "[0.1, 0.2, ...]"
+
+Only the standard library is imported so that the shim starts as fast as possible.
+"""
+
+import os
+import socket
+import sys
+import threading
+
+SOCKET_PATH = os.environ.get("PBRAIN_SERVER_SOCKET", "/tmp/pbrain-server.sock")
+
+
+def forward_stdin(sock: socket.socket):
+    """manager -> server"""
+    try:
+        for line in sys.stdin.buffer:
+            sock.sendall(line)
+        sock.shutdown(socket.SHUT_WR)
+    except OSError:
+        # the server ended the session
+        pass
+
+
+def main():
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(SOCKET_PATH)
+    except OSError as e:
+        print(f"ERROR brain server unavailable at {SOCKET_PATH}: {e}", flush=True)
+        sys.exit(1)
+
+    # the first line of a session is its genome, null selects the default genome
+    genome = sys.argv[1] if len(sys.argv) > 1 else "null"
+    sock.sendall(genome.encode() + b"\n")
+
+    threading.Thread(target=forward_stdin, args=(sock,), daemon=True).start()
+
+    # server -> manager, the server closes the session after END
+    with sock.makefile("rb") as f:
+        for line in f:
+            sys.stdout.buffer.write(line)
+            sys.stdout.buffer.flush()
+    # the forwarding thread may still be blocked reading stdin, an interpreter shutdown
+    # would abort on the stdin lock it holds
+    os._exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,39 @@
 # functions and variables for pipe AI and functions that communicate with manager through pipes
 
+import os
 import sys
+import threading
+import time
 from typing import Optional
 
-import win32api
-import win32event
-import win32process
-import win32security
 from structs import GameParameters, Point
 
 DEBUG = False
 ABOUT_FUNC = True
 DEBUG_EVAL = False
+# report how long each stop() waited for the working thread as "DEBUG stop <ms>"
+REPORT_STOP_WAIT = bool(os.environ.get("PISQPIPE_REPORT_STOP_WAIT"))
+# trace every command, brain_turn and stop() wait to a file per process in this folder, also
+# turned on by "INFO profile <folder>"
+PROFILE_VARIABLE = "PISQPIPE_PROFILE"
 
 state = GameParameters()
-event1 = win32event.CreateEvent(None, 0, 0, None)
-event2 = win32event.CreateEvent(None, 1, 1, None)
+# set to wake the working thread for a turn
+event1 = threading.Event()
+# set while the working thread is idle
+event2 = threading.Event()
+event2.set()
+output_lock = threading.Lock()
+
+"""time stop() spent waiting for the working thread, in milliseconds"""
+last_stop_wait: float = 0
+max_stop_wait: float = 0
+
+"""trace file while profiling, lines of milliseconds since the process started, event,
+duration in milliseconds and the event's counters as key=value"""
+trace_file = None
+trace_lock = threading.Lock()
+process_start = time.perf_counter()
 
 
 # you have to implement these functions
@@ -73,10 +91,46 @@ def brain_about():
     raise NotImplementedError
 
 
+def brain_counters() -> dict:
+    """counters of the last brain_turn for the trace, like nodes searched or cache hits"""
+    return {}
+
+
+def start_trace(folder: str):
+    """start profiling to trace_<pid>.txt in folder"""
+    global trace_file
+    if trace_file is not None:
+        return
+    os.makedirs(folder, exist_ok=True)
+    # line buffered, the lines before a brain is killed for a timeout are kept
+    trace_file = open(
+        os.path.join(folder, f"trace_{os.getpid()}.txt"), "a", buffering=1
+    )
+    trace_file.write(f"# pid {os.getpid()} start {time.time():.3f}\n")
+
+
+def trace(event: str, start: float, counters: Optional[dict] = None):
+    """trace line of an event that started at start, a time.perf_counter() value"""
+    if trace_file is None:
+        return
+    end = time.perf_counter()
+    line = f"{(start - process_start) * 1000:.1f} {event} {(end - start) * 1000:.3f}"
+    for key, value in (counters or {}).items():
+        line += f" {key}={value}"
+    with trace_lock:
+        trace_file.write(line + "\n")
+
+
 def pipe_out(what):
     """write a line to sys.stdout"""
-    print(what)
-    sys.stdout.flush()
+    with output_lock:
+        print(what)
+        sys.stdout.flush()
+
+
+def get_tick_count() -> int:
+    """milliseconds from a monotonic clock"""
+    return int(time.monotonic() * 1000)
 
 
 def do_mymove(p: Point):
@@ -132,26 +186,39 @@ def get_cmd_param(command: str, input: str):
 def thread_loop():
     """main function for the working thread"""
     while True:
-        win32event.WaitForSingleObject(event1, win32event.INFINITE)
-        brain_turn()
-        win32event.SetEvent(event2)
+        event1.wait()
+        event1.clear()
+        start = time.perf_counter()
+        try:
+            brain_turn()
+        finally:
+            if trace_file is not None:
+                trace("brain_turn", start, brain_counters())
+            event2.set()
 
 
 def turn():
     """start thinking"""
     state.terminate_ai = False
-    win32event.ResetEvent(event2)
-    win32event.SetEvent(event1)
+    event2.clear()
+    event1.set()
 
 
 def stop():
     """stop thinking"""
+    global last_stop_wait, max_stop_wait
+    wait_start = time.perf_counter()
     state.terminate_ai = True
-    win32event.WaitForSingleObject(event2, win32event.INFINITE)
+    event2.wait()
+    last_stop_wait = (time.perf_counter() - wait_start) * 1000
+    max_stop_wait = max(max_stop_wait, last_stop_wait)
+    if REPORT_STOP_WAIT:
+        pipe_out(f"DEBUG stop {last_stop_wait:.3f}")
+    trace("stop", wait_start)
 
 
 def start():
-    state.start_time = win32api.GetTickCount()
+    state.start_time = get_tick_count()
     stop()
     if not state.width:
         state.width = state.height = 20
@@ -159,6 +226,19 @@ def start():
 
 
 def do_command(cmd):
+    """do command cmd, timed in the trace while profiling"""
+    if trace_file is None:
+        run_command(cmd)
+        return
+    start = time.perf_counter()
+    try:
+        run_command(cmd)
+    finally:
+        words = cmd.split()
+        trace(words[0].upper() if words else "EMPTY", start)
+
+
+def run_command(cmd):
     """do command cmd"""
     #
     param = get_cmd_param("info", cmd)
@@ -201,6 +281,11 @@ def do_command(cmd):
             state.dataFolder = info
             return
         #
+        info = get_cmd_param("profile", param)
+        if info is not None:
+            start_trace(info)
+            return
+        #
         info = get_cmd_param("evaluate", param)
         if DEBUG_EVAL and info is not None:
             p: Optional[Point] = parse_coord(info)
@@ -327,9 +412,10 @@ def do_command(cmd):
 
 def main():
     """main function for AI console application"""
+    if os.environ.get(PROFILE_VARIABLE):
+        start_trace(os.environ[PROFILE_VARIABLE])
 
-    sa = win32security.SECURITY_ATTRIBUTES()
-    win32process.beginthreadex(sa, 0, thread_loop, (), 0)
+    threading.Thread(target=thread_loop, daemon=True).start()
 
     while True:
         cmd = get_line()
@@ -0,0 +1,277 @@
+# iterative deepening alpha-beta search with the genome weighted threat scores as evaluation
+# board convention: 0 = empty, 1 = my stone, -1 = opponent's stone, 3 = winning move
+
+import time
+from typing import Callable, Optional
+
+import evaluation
+import numpy as np
+import transposition
+from transposition import EXACT, LOWER, UPPER
+
+# score of a won position, wins found sooner score higher
+WIN_VALUE = 1e9
+MAX_DEPTH = 10
+# scores beyond this are wins or losses at a distance in plies
+WIN_BOUND = WIN_VALUE - 2 * MAX_DEPTH
+# moves searched from every position, best greedy totals first
+MAX_CANDIDATES = 8
+# check the clock and terminate flag every this many nodes
+CHECK_INTERVAL = 4
+
+
+class SearchAborted(Exception):
+    pass
+
+
+def to_table(value: float, ply: int):
+    """wins are stored as the distance from the stored position instead of from the root"""
+    if value >= WIN_BOUND:
+        return value + ply
+    if value <= -WIN_BOUND:
+        return value - ply
+    return value
+
+
+def from_table(value: float, ply: int):
+    if value >= WIN_BOUND:
+        return value - ply
+    if value <= -WIN_BOUND:
+        return value + ply
+    return value
+
+
+def order_moves(totals: np.ndarray, candidates: np.ndarray):
+    """candidate points by descending total score, at most MAX_CANDIDATES"""
+    xs, ys = np.nonzero(candidates)
+    order = np.argsort(-totals[xs, ys], kind="stable")[:MAX_CANDIDATES]
+    return [(int(xs[i]), int(ys[i])) for i in order]
+
+
+class TimeManager:
+    """
+    Turn budget from the manager's time controls, all in milliseconds. The turn may use
+    its own timeout or an even share of the time left in the match, whichever is smaller
+    """
+
+    # expected number of own moves left when splitting the match time
+    MOVES_TO_GO = 30
+    SAFETY = 0.8
+    # reserved for process and pipe latency
+    OVERHEAD = 30
+
+    def __init__(
+        self,
+        timeout_turn: int,
+        timeout_match: int,
+        time_left: int,
+        start: Optional[float] = None,
+    ):
+        """start is when the command arrived, in milliseconds of the monotonic clock"""
+        self.start = time.monotonic() * 1000 if start is None else start
+        budgets = [timeout_turn]
+        if timeout_match > 0:
+            budgets.append(time_left / self.MOVES_TO_GO)
+        self.budget = max(min(budgets) * self.SAFETY - self.OVERHEAD, 0)
+
+    def elapsed(self):
+        return time.monotonic() * 1000 - self.start
+
+    def out_of_time(self):
+        return self.elapsed() >= self.budget
+
+    def can_deepen(self, last_iteration: float):
+        """the next depth usually costs several times the last one"""
+        return self.elapsed() + 2 * last_iteration < self.budget
+
+
+class Search:
+    def __init__(
+        self,
+        table: np.ndarray,
+        aggression: float,
+        time_manager: TimeManager,
+        should_stop: Callable[[], bool] = lambda: False,
+        exact5=False,
+        zobrist: Optional[transposition.Zobrist] = None,
+        transpositions: Optional[transposition.TranspositionTable] = None,
+        evaluations: Optional[transposition.EvaluationCache] = None,
+    ):
+        """the tables are kept between searches by the caller, fresh ones are made if not given"""
+        self.table = table
+        self.aggression = aggression
+        self.time_manager = time_manager
+        self.should_stop = should_stop
+        self.exact5 = exact5
+        self.zobrist = zobrist
+        if transpositions is None or evaluations is None:
+            transpositions, evaluations = transposition.create_tables(0, MAX_CANDIDATES)
+        self.transpositions = transpositions
+        self.evaluations = evaluations
+        self.nodes = 0
+        self.depth = 0
+        # a depth is only interrupted once a full depth has given a move to fall back on
+        self.abortable = False
+
+    def check_abort(self):
+        self.nodes += 1
+        if self.nodes % CHECK_INTERVAL == 0 and (
+            self.should_stop() or (self.abortable and self.time_manager.out_of_time())
+        ):
+            raise SearchAborted
+
+    def expand(self, board: np.ndarray, key: int, side: int):
+        """static value for side to move and its candidate moves, best greedy totals first"""
+        cached = self.evaluations.probe(key)
+        if cached is not None:
+            return cached
+
+        view = board * side
+        candidates = evaluation.relevant_points(view) & (view == 0)
+        offensive = evaluation.score_board(view, self.table)
+        defensive = evaluation.score_board(view, self.table, player=-1)
+        if not candidates.any():
+            self.evaluations.store(key, 0.0, [])
+            return 0.0, []
+
+        value = (
+            self.aggression * offensive[candidates].max()
+            - (1 - self.aggression) * defensive[candidates].max()
+        )
+        totals = evaluation.total_scores(
+            offensive, defensive, candidates, self.aggression
+        )
+        moves = order_moves(totals, candidates)
+        self.evaluations.store(key, value, moves)
+        return value, moves
+
+    def negamax(
+        self,
+        board,
+        key: int,
+        depth: int,
+        alpha: float,
+        beta: float,
+        side: int,
+        ply: int,
+    ):
+        """key hashes the stones only, the side to move is added here"""
+        self.check_abort()
+        node_key = key ^ self.zobrist.side if side == -1 else key
+        entry = self.transpositions.probe(node_key)
+        hash_move = None
+        if entry is not None:
+            stored, stored_depth, flag, hash_move = entry
+            if stored_depth >= depth:
+                stored = from_table(stored, ply)
+                if flag == EXACT:
+                    return stored
+                if flag == LOWER:
+                    alpha = max(alpha, stored)
+                elif flag == UPPER:
+                    beta = min(beta, stored)
+                if alpha >= beta:
+                    return stored
+
+        value, moves = self.expand(board, node_key, side)
+        if depth == 0 or not moves:
+            return value
+        if hash_move in moves:
+            moves = [hash_move] + [move for move in moves if move != hash_move]
+
+        window_start = alpha
+        best, best_move = -np.inf, moves[0]
+        for x, y in moves:
+            board[x, y] = side
+            if evaluation.completes_five(board, x, y, side, self.exact5):
+                score = WIN_VALUE - ply
+            else:
+                child = key ^ self.zobrist.stone(side, x, y)
+                score = -self.negamax(
+                    board, child, depth - 1, -beta, -alpha, -side, ply + 1
+                )
+            board[x, y] = 0
+            if score > best:
+                best, best_move = score, (x, y)
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                break
+
+        if best <= window_start:
+            flag = UPPER
+        elif best >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.transpositions.store(node_key, to_table(best, ply), depth, flag, best_move)
+        return best
+
+    def search_root(self, board: np.ndarray, key: int, depth: int, moves: list):
+        alpha = -np.inf
+        scored = []
+        for x, y in moves:
+            board[x, y] = 1
+            if evaluation.completes_five(board, x, y, 1, self.exact5):
+                score = WIN_VALUE
+            else:
+                child = key ^ self.zobrist.stone(1, x, y)
+                score = -self.negamax(board, child, depth - 1, -np.inf, -alpha, -1, 1)
+            board[x, y] = 0
+            scored.append((score, (x, y)))
+            alpha = max(alpha, score)
+        # the best move first keeps the next depth's window tight
+        scored.sort(key=lambda entry: entry[0], reverse=True)
+        self.transpositions.store(key, scored[0][0], depth, EXACT, scored[0][1])
+        return scored
+
+    def run(
+        self,
+        board: np.ndarray,
+        moves: Optional[list] = None,
+        key: Optional[int] = None,
+        max_depth: int = MAX_DEPTH,
+    ) -> Optional[tuple[tuple[int, int], float]]:
+        """
+        Search deeper until time runs out, the terminate flag is raised or max_depth is
+        searched, returns the best move of the deepest completed depth and its score, None if
+        there is no candidate. The root moves are generated from the board unless they are
+        given in order, key is the board's Zobrist hash if it is kept by the caller
+        """
+        board = board.copy()
+        if self.zobrist is None:
+            self.zobrist = transposition.Zobrist(*board.shape)
+        if key is None:
+            key = self.zobrist.board_hash(board)
+        self.transpositions.new_search()
+        if moves is None:
+            _, moves = self.expand(board, key, 1)
+        if not moves:
+            return None
+        # the best move of an earlier search of this position is tried first
+        entry = self.transpositions.probe(key)
+        if entry is not None and entry[3] in moves:
+            moves = [entry[3]] + [move for move in moves if move != entry[3]]
+
+        best = (moves[0], -np.inf)
+        last_iteration = 0.0
+        for depth in range(1, min(max_depth, MAX_DEPTH) + 1):
+            iteration_start = self.time_manager.elapsed()
+            try:
+                scored = self.search_root(board, key, depth, moves)
+            except SearchAborted:
+                break
+            self.abortable = True
+            self.depth = depth
+            moves = [move for _, move in scored]
+            best = (scored[0][1], float(scored[0][0]))
+            last_iteration = self.time_manager.elapsed() - iteration_start
+            # a forced result does not change with depth
+            if abs(best[1]) >= WIN_BOUND:
+                break
+            if not self.time_manager.can_deepen(last_iteration):
+                break
+        return best
+
+    def nodes_per_second(self):
+        elapsed = self.time_manager.elapsed()
+        return self.nodes / elapsed * 1000 if elapsed > 0 else 0.0
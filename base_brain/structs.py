@@ -1,5 +1,9 @@
 from typing import NamedTuple
 
+# genome for the genetic algorithm, 8 threat values followed by aggression, all in [0, 1]
+# genome = [zero-closed,zero-open,one-closed,one-open,two-closed,two-open,three-closed,three-open, aggression]
+DEFAULT_GENOME = [0.004, 0.008, 0.016, 0.032, 0.064, 0.56, 0.5, 1.0, 0.5]
+
 
 class Point(NamedTuple):
     x: int
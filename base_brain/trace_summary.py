@@ -0,0 +1,158 @@
+"""
+Summarize the pisqpipe traces of every brain process of a tournament: time per protocol
+command, brain_turn and stop() wait, the counters of the turns, and the slowest turns with the
+process they ran in. Brains write traces when started with PISQPIPE_PROFILE set to a folder
+(an absolute path, brains may run in another directory) or after "INFO profile <folder>".
+
+    PISQPIPE_PROFILE=/tmp/traces python main.py
+    python trace_summary.py /tmp/traces --budget-ms 5000 --json summary.json
+"""
+
+import argparse
+import glob
+import json
+import os
+from typing import Optional
+
+# turn counters summed over all turns, hit rates are computed from them
+RATES = {"tt": ("tt_hits", "tt_probes"), "eval": ("eval_hits", "eval_probes")}
+
+
+def percentile(values: list[float], p: float):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * p / 100), len(ordered) - 1)]
+
+
+def read_trace(path: str):
+    """(pid, [(time ms, event, duration ms, counters)]) of a trace file"""
+    pid = os.path.basename(path).removeprefix("trace_").removesuffix(".txt")
+    events = []
+    with open(path) as f:
+        for line in f:
+            if line.startswith("#") or not line.strip():
+                continue
+            parts = line.split()
+            if len(parts) < 3:
+                # the last line of a brain killed while writing it
+                continue
+            counters = {}
+            for field in parts[3:]:
+                key, _, value = field.partition("=")
+                counters[key] = int(value) if value.isdigit() else float(value)
+            events.append((float(parts[0]), parts[1], float(parts[2]), counters))
+    return pid, events
+
+
+def summarize(paths: list[str], budget_ms: Optional[float] = None, slowest=10):
+    durations: dict[str, list[float]] = {}
+    counters: dict[str, float] = {}
+    turns: list[tuple[float, str, float, dict]] = []
+    processes = {}
+    for path in paths:
+        pid, events = read_trace(path)
+        process_turns = []
+        for time_ms, event, duration, event_counters in events:
+            durations.setdefault(event, []).append(duration)
+            if event == "brain_turn":
+                process_turns.append(duration)
+                turns.append((duration, pid, time_ms, event_counters))
+                for key, value in event_counters.items():
+                    counters[key] = counters.get(key, 0) + value
+        processes[pid] = {
+            "events": len(events),
+            "turns": len(process_turns),
+            "max_turn_ms": max(process_turns, default=0.0),
+        }
+
+    events_summary = {
+        event: {
+            "count": len(values),
+            "total_s": round(sum(values) / 1000, 3),
+            "mean_ms": round(sum(values) / len(values), 3),
+            "p50_ms": round(percentile(values, 50), 3),
+            "p90_ms": round(percentile(values, 90), 3),
+            "p99_ms": round(percentile(values, 99), 3),
+            "max_ms": round(max(values), 3),
+        }
+        for event, values in sorted(durations.items())
+    }
+    turn_count = len(durations.get("brain_turn", []))
+    summary = {
+        "processes": len(processes),
+        "events": events_summary,
+        "turn_counters": {
+            key: {"total": round(total), "per_turn": round(total / turn_count, 1)}
+            for key, total in sorted(counters.items())
+        },
+        "hit_rates": {
+            name: round(counters[hits] / counters[probes], 4)
+            for name, (hits, probes) in RATES.items()
+            if counters.get(probes)
+        },
+        "slowest_turns": [
+            {"pid": pid, "at_ms": time_ms, "duration_ms": duration} | turn_counters
+            for duration, pid, time_ms, turn_counters in sorted(
+                turns, key=lambda turn: turn[0], reverse=True
+            )[:slowest]
+        ],
+        "slowest_processes": dict(
+            sorted(
+                processes.items(),
+                key=lambda entry: entry[1]["max_turn_ms"],
+                reverse=True,
+            )[:slowest]
+        ),
+    }
+    if budget_ms is not None:
+        summary["turns_over_budget"] = sum(turn[0] > budget_ms for turn in turns)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("folders", nargs="+", help="folders of trace_<pid>.txt files")
+    parser.add_argument(
+        "--budget-ms", type=float, help="count the turns that took longer than this"
+    )
+    parser.add_argument("--slowest", type=int, default=10)
+    parser.add_argument("--json", help="write the summary to this file")
+    args = parser.parse_args()
+
+    paths = sorted(
+        path
+        for folder in args.folders
+        for path in glob.glob(os.path.join(folder, "trace_*.txt"))
+    )
+    if not paths:
+        raise SystemExit(f"no traces in {', '.join(args.folders)}")
+    summary = summarize(paths, args.budget_ms, args.slowest)
+
+    print(f"{len(paths)} brain processes")
+    for event, values in summary["events"].items():
+        print(
+            f"  {event:12} n={values['count']:7}  total={values['total_s']:9.3f}s"
+            f"  p50={values['p50_ms']:9.3f}ms  p99={values['p99_ms']:9.3f}ms"
+            f"  max={values['max_ms']:9.3f}ms"
+        )
+    for key, values in summary["turn_counters"].items():
+        print(f"  {key:12} {values['total']:12} total, {values['per_turn']} per turn")
+    for name, rate in summary["hit_rates"].items():
+        print(f"  {name} hit rate {rate:.1%}")
+    if "turns_over_budget" in summary:
+        print(f"  {summary['turns_over_budget']} turns over {args.budget_ms}ms")
+    print("slowest turns:")
+    for turn in summary["slowest_turns"]:
+        print(
+            f"  {turn['duration_ms']:9.3f}ms in pid {turn['pid']} at {turn['at_ms']}ms"
+            f" depth {turn.get('depth', '-')} nodes {turn.get('nodes', '-')}"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+# Zobrist hashing and fixed size transposition tables for the search
+# board convention: 0 = empty, 1 = my stone, -1 = opponent's stone, 3 = winning move
+
+import numpy as np
+
+# stone value -> row of the Zobrist key table
+STONE_KINDS = {1: 0, -1: 1, 3: 2}
+# fixed seed so that every process hashes a position the same way
+ZOBRIST_SEED = 5
+# bound stored with a search result
+EXACT, LOWER, UPPER = 0, 1, 2
+# share of INFO max_memory given to the tables, the rest is left to the interpreter
+MEMORY_SHARE = 0.5
+# table memory when the manager does not limit memory (max_memory 0)
+DEFAULT_MEMORY = 64 * 1024 * 1024
+MIN_ENTRIES = 1024
+
+
+class Zobrist:
+    """Random keys of every stone kind on every point, a position hashes to the xor of its stones"""
+
+    def __init__(self, width: int, height: int, seed=ZOBRIST_SEED):
+        self.shape = (width, height)
+        rng = np.random.default_rng(seed)
+        keys = rng.integers(
+            0, 2**64, size=(len(STONE_KINDS) + 1, width, height), dtype=np.uint64
+        )
+        # python ints xor faster than numpy scalars
+        self.keys = keys[:-1].tolist()
+        # xored in when the opponent is to move
+        self.side = int(keys[-1, 0, 0])
+
+    def stone(self, value: int, x: int, y: int) -> int:
+        return self.keys[STONE_KINDS[value]][x][y]
+
+    def board_hash(self, board: np.ndarray) -> int:
+        key = 0
+        for x, y in zip(*np.nonzero(board)):
+            key ^= self.stone(int(board[x, y]), x, y)
+        return key
+
+
+def table_entries(memory: float, entry_bytes: int):
+    """largest power of two number of entries fitting in memory bytes"""
+    entries = int(memory // entry_bytes)
+    return max(1 << (entries.bit_length() - 1), MIN_ENTRIES) if entries else MIN_ENTRIES
+
+
+class TableCounters:
+    def __init__(self):
+        self.reset_counters()
+
+    def reset_counters(self):
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        # stores that evicted a different position
+        self.replaced = 0
+
+    def report(self, name: str):
+        rate = self.hits / self.probes * 100 if self.probes else 0.0
+        return (
+            f"{name} hits {self.hits}/{self.probes} ({rate:.1f}%)"
+            f" stores {self.stores} replaced {self.replaced}"
+        )
+
+
+class TranspositionTable(TableCounters):
+    """
+    Search results by position hash: value, searched depth, bound and best move. A slot
+    keeps the deeper result of the current search, results of earlier searches are always
+    replaced
+    """
+
+    ENTRY_BYTES = 8 + 8 + 1 + 1 + 1 + 2
+
+    def __init__(self, entries: int):
+        super().__init__()
+        self.mask = entries - 1
+        self.keys = np.zeros(entries, dtype=np.uint64)
+        self.values = np.zeros(entries, dtype=np.float64)
+        # -1 marks an empty slot
+        self.depths = np.full(entries, -1, dtype=np.int8)
+        self.flags = np.zeros(entries, dtype=np.int8)
+        self.ages = np.zeros(entries, dtype=np.uint8)
+        self.moves = np.zeros((entries, 2), dtype=np.int8)
+        self.age = 0
+
+    def new_search(self):
+        self.age = (self.age + 1) % 256
+
+    def probe(self, key: int):
+        """(value, depth, flag, move) stored for the position, None if there is none"""
+        self.probes += 1
+        i = key & self.mask
+        if self.depths[i] < 0 or self.keys[i] != key:
+            return None
+        self.hits += 1
+        move = self.moves[i]
+        return (
+            float(self.values[i]),
+            int(self.depths[i]),
+            int(self.flags[i]),
+            (int(move[0]), int(move[1])),
+        )
+
+    def store(self, key: int, value: float, depth: int, flag: int, move):
+        i = key & self.mask
+        if self.depths[i] >= 0 and self.keys[i] != key:
+            if self.ages[i] == self.age and self.depths[i] > depth:
+                return
+            self.replaced += 1
+        self.stores += 1
+        self.keys[i] = key
+        self.values[i] = value
+        self.depths[i] = depth
+        self.flags[i] = flag
+        self.ages[i] = self.age
+        self.moves[i] = move
+
+
+class EvaluationCache(TableCounters):
+    """
+    Static value and best scored candidate cells of a position for the side to move, which
+    cost two whole board evaluations to recompute. Always replaces
+    """
+
+    def __init__(self, entries: int, width: int):
+        super().__init__()
+        self.mask = entries - 1
+        self.keys = np.zeros(entries, dtype=np.uint64)
+        self.used = np.zeros(entries, dtype=bool)
+        self.values = np.zeros(entries, dtype=np.float64)
+        self.counts = np.zeros(entries, dtype=np.int8)
+        self.moves = np.zeros((entries, width, 2), dtype=np.int8)
+
+    @staticmethod
+    def entry_bytes(width: int):
+        return 8 + 1 + 8 + 1 + 2 * width
+
+    def probe(self, key: int):
+        """(value, moves) stored for the position, None if there is none"""
+        self.probes += 1
+        i = key & self.mask
+        if not self.used[i] or self.keys[i] != key:
+            return None
+        self.hits += 1
+        moves = self.moves[i, : self.counts[i]].tolist()
+        return float(self.values[i]), [(x, y) for x, y in moves]
+
+    def store(self, key: int, value: float, moves: list):
+        i = key & self.mask
+        if self.used[i] and self.keys[i] != key:
+            self.replaced += 1
+        self.stores += 1
+        self.keys[i] = key
+        self.used[i] = True
+        self.values[i] = value
+        self.counts[i] = len(moves)
+        if moves:
+            self.moves[i, : len(moves)] = moves
+
+
+def create_tables(
+    max_memory: int, width: int
+) -> tuple[TranspositionTable, EvaluationCache]:
+    """
+    Tables sized from INFO max_memory (bytes, 0 = no limit), split evenly between search
+    results and evaluations holding up to width candidate cells
+    """
+    memory = max_memory * MEMORY_SHARE if max_memory > 0 else DEFAULT_MEMORY
+    return (
+        TranspositionTable(table_entries(memory / 2, TranspositionTable.ENTRY_BYTES)),
+        EvaluationCache(
+            table_entries(memory / 2, EvaluationCache.entry_bytes(width)), width
+        ),
+    )
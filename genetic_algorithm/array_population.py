@@ -0,0 +1,236 @@
+import random
+import re
+from typing import Optional
+
+import numpy as np
+from agent import MUTATION_RATE, NUM_WEIGHTS, GeneticAgent
+from fitness_stream import FitnessStream
+from population import AGENT_CMD, BREEDING_POOL_SIZE, ELITE_COUNT
+
+# mutation noise is drawn from [-MUTATION_STEP, MUTATION_STEP], like GeneticAgent.mutate
+MUTATION_STEP = 0.2
+NO_PARENT = -1
+AGENT_NAME = re.compile(r"Agent (\d+)\.(\d+)")
+
+
+class ArrayPopulation:
+    """
+    Population kept as columns of numpy arrays, one row per agent: the (N, NUM_WEIGHTS)
+    weights, fitness (-1 until set) and the lineage of each agent. Selection, crossover and
+    mutation run on whole arrays at once, GeneticAgent models are only built when the
+    tournament asks for agents. Breeds the same way as Population
+    """
+
+    def __init__(
+        self,
+        size: int,
+        pool_size: int = BREEDING_POOL_SIZE,
+        elite_count: int = ELITE_COUNT,
+        seed: Optional[int] = None,
+    ):
+        # seeded from the random module unless given, so random.seed fixes both
+        self.rng = np.random.default_rng(
+            random.getrandbits(64) if seed is None else seed
+        )
+        self.pool_size = pool_size
+        self.elite_count = elite_count
+        self.generation = 1
+
+        self.weights = self.rng.random((size, NUM_WEIGHTS))
+        self.fitness = np.full(size, -1.0)
+        # lineage: unique id, generation born and number within it (the agent's name), ids
+        # of both parents and whether the agent is an elite kept from an earlier generation
+        self.ids = np.arange(size, dtype=np.int64)
+        self.born = np.full(size, self.generation, dtype=np.int32)
+        self.number = np.arange(size, dtype=np.int32)
+        self.parents = np.full((size, 2), NO_PARENT, dtype=np.int64)
+        self.elite = np.zeros(size, dtype=bool)
+        self.next_id = size
+
+        self._agents: Optional[list[GeneticAgent]] = None
+        self._rows: Optional[dict[str, int]] = None
+
+    @classmethod
+    def from_agents(
+        cls,
+        agents: list[GeneticAgent],
+        generation: int,
+        rng_state: Optional[dict] = None,
+    ):
+        """
+        population of the agents of a checkpoint, breeding on from the bit generator state
+        of its rng when given. Generation born and number are read back from the names, the
+        parents are not known
+        """
+        # a saved rng state leaves the random module as the checkpoint put it
+        population = cls(len(agents), seed=None if rng_state is None else 0)
+        if rng_state is not None:
+            population.rng.bit_generator.state = rng_state
+        population.generation = generation
+        population.weights = np.array([agent.weights for agent in agents], dtype=float)
+        population.fitness = np.array([agent.fitness for agent in agents], dtype=float)
+        for row, agent in enumerate(agents):
+            match = AGENT_NAME.match(agent.name)
+            if match:
+                population.born[row] = int(match[1])
+                population.number[row] = int(match[2])
+            else:
+                population.born[row], population.number[row] = generation, row
+            population.elite[row] = "(ELITE)" in agent.name
+        return population
+
+    def __len__(self):
+        return len(self.weights)
+
+    def name(self, row: int):
+        name = f"Agent {self.born[row]}.{self.number[row]}"
+        return f"{name} (ELITE)" if self.elite[row] else name
+
+    def names(self) -> list[str]:
+        """names of all rows, from python ints which format faster than numpy scalars"""
+        return [
+            f"Agent {born}.{number} (ELITE)" if elite else f"Agent {born}.{number}"
+            for born, number, elite in zip(
+                self.born.tolist(), self.number.tolist(), self.elite.tolist()
+            )
+        ]
+
+    def agent(self, row: int) -> GeneticAgent:
+        return GeneticAgent(
+            name=self.name(row),
+            cmd=AGENT_CMD,
+            weights=self.weights[row].tolist(),
+            fitness=float(self.fitness[row]),
+        )
+
+    @property
+    def agents(self) -> list[GeneticAgent]:
+        """the agents as models for the tournament, built once per generation"""
+        if self._agents is None:
+            self._agents = [
+                GeneticAgent(name=name, cmd=AGENT_CMD, weights=weights, fitness=fitness)
+                for name, weights, fitness in zip(
+                    self.names(), self.weights.tolist(), self.fitness.tolist()
+                )
+            ]
+        return self._agents
+
+    @property
+    def rows(self) -> dict[str, int]:
+        """row of every agent by name"""
+        if self._rows is None:
+            self._rows = {name: row for row, name in enumerate(self.names())}
+        return self._rows
+
+    def ranking(self):
+        """rows by fitness, best first, ties in row order like the stable sort of Population"""
+        return np.argsort(-self.fitness, kind="stable")
+
+    def get_top_agents(self, n: int):
+        """Get the top n agents by fitness"""
+        return [self.agent(row) for row in self.ranking()[:n]]
+
+    def breed_weights(self, parent_rows: np.ndarray, count: int):
+        """
+        weights of count children of random pairs of parent rows through uniform crossover and
+        mutation, with the row pairs of the parents
+        """
+        pairs = parent_rows[self.rng.integers(len(parent_rows), size=(count, 2))]
+        from_first = self.rng.random((count, NUM_WEIGHTS)) < 0.5
+        children = np.where(
+            from_first, self.weights[pairs[:, 0]], self.weights[pairs[:, 1]]
+        )
+
+        mutated = self.rng.random((count, NUM_WEIGHTS)) < MUTATION_RATE
+        noise = self.rng.uniform(-MUTATION_STEP, MUTATION_STEP, (count, NUM_WEIGHTS))
+        children += np.where(mutated, noise, 0.0)
+        np.clip(children, 0.0, 1.0, out=children)
+        return children, pairs
+
+    def breed(self, parents: list[GeneticAgent], count: int) -> list[GeneticAgent]:
+        """Population.breed for offspring bred while the tournament is running"""
+        children, _ = self.breed_weights(
+            np.array([self.rows[parent.name] for parent in parents]), count
+        )
+        return [
+            GeneticAgent(name="child", cmd=AGENT_CMD, weights=weights.tolist())
+            for weights in children
+        ]
+
+    def evolve(self, offspring: Optional[list[GeneticAgent]] = None):
+        """
+        Evolve the population like Population.evolve: the top pool_size agents breed the
+        offspring and the top elite_count agents are kept unchanged. offspring already bred,
+        e.g. while the tournament was still running, is used instead of breeding new children
+        """
+        ranking = self.ranking()
+        pool = ranking[: self.pool_size]
+        elites = ranking[: self.elite_count]
+        count = len(self) - len(elites)
+
+        if offspring is None:
+            children, pairs = self.breed_weights(pool, count)
+            parent_ids = self.ids[pairs]
+        else:
+            children = np.array([child.weights for child in offspring[:count]])
+            # parents of offspring bred elsewhere are not known
+            parent_ids = np.full((len(children), 2), NO_PARENT, dtype=np.int64)
+
+        self.generation += 1
+        self.weights = np.concatenate([self.weights[elites], children])
+        self.fitness = np.full(len(self.weights), -1.0)
+        self.ids = np.concatenate(
+            [
+                self.ids[elites],
+                np.arange(self.next_id, self.next_id + len(children), dtype=np.int64),
+            ]
+        )
+        self.next_id += len(children)
+        self.born = np.concatenate(
+            [
+                self.born[elites],
+                np.full(len(children), self.generation, dtype=np.int32),
+            ]
+        )
+        self.number = np.concatenate(
+            [
+                self.number[elites],
+                np.arange(len(elites), len(elites) + len(children), dtype=np.int32),
+            ]
+        )
+        self.parents = np.concatenate([self.parents[elites], parent_ids])
+        self.elite = np.concatenate(
+            [np.ones(len(elites), dtype=bool), np.zeros(len(children), dtype=bool)]
+        )
+        self._agents = None
+        self._rows = None
+
+        print(f"Evolution complete. Generation: {self.generation}")
+        print(
+            f"Population size: {len(self)} ({len(elites)} elites"
+            f" + {len(children)} offspring)"
+        )
+
+    def apply_fitness(self, stream: FitnessStream):
+        """Set fitness from a stream that followed the tournament"""
+        scored = 0
+        for name, row in self.rows.items():
+            if not stream.games.get(name) and name not in stream.estimates:
+                continue
+            self.fitness[row] = round(stream.final_fitness(name), 4)
+            scored += 1
+        # the agent models are rebuilt with their fitness
+        self._agents = None
+        print(f"Fitness set for {scored} of {len(self)} agents")
+
+    def get_statistics(self):
+        """Get population statistics"""
+        fitnesses = self.fitness[self.fitness != -1]
+        if not len(fitnesses):
+            return {"best": 0, "average": 0, "worst": 0}
+
+        return {
+            "best": float(fitnesses.max()),
+            "average": float(fitnesses.mean()),
+            "worst": float(fitnesses.min()),
+        }
@@ -0,0 +1,136 @@
+import time
+from typing import Optional, Sequence
+
+import numpy as np
+from agent import GeneticAgent
+from referee import BLACK, WHITE, GameRecord, evaluation
+
+
+def first_moves(totals: np.ndarray, rng: np.random.Generator):
+    """
+    Pick a random highest scoring point on every board of a (games, width, height) stack.
+    Boards where every point scores the same get the center, as the brain does
+    """
+    games, width, height = totals.shape
+    flat = totals.reshape(games, -1)
+    maxima = flat.max(axis=1, keepdims=True)
+    # random keys on the maximum points give a uniform tie break
+    keys = np.where(flat == maxima, rng.random(flat.shape), -1)
+    index = keys.argmax(axis=1)
+    undecided = maxima[:, 0] == flat.min(axis=1)
+    index[undecided] = (width // 2) * height + height // 2
+    return index // height, index % height
+
+
+def run_lengths(boards: np.ndarray, xs, ys, color):
+    """
+    Length of the line of color through (xs[g], ys[g]) on every board, per direction.
+    Lines are followed up to MAX_LENGTH points each way, enough to tell five from more
+    """
+    reach = evaluation.MAX_LENGTH
+    padded = np.pad(boards, [(0, 0), (reach, reach), (reach, reach)])
+    games = np.arange(len(boards))[:, None]
+    steps = np.arange(1, reach + 1)
+    lengths = []
+    for dx, dy in evaluation.directions:
+        length = np.ones(len(boards), dtype=int)
+        for sign in (1, -1):
+            line = padded[
+                games,
+                xs[:, None] + reach + sign * steps * dx,
+                ys[:, None] + reach + sign * steps * dy,
+            ]
+            length += np.cumprod(line == color, axis=1).sum(axis=1)
+        lengths.append(length)
+    return np.stack(lengths, axis=1)
+
+
+class BatchSimulator:
+    """
+    Plays many genetic agent games in lockstep. All boards are held in one
+    (games, width, height) array and every live game's move is scored in one pass,
+    each game with its own genomes. Agents play the greedy move choice, the referee with
+    depth 0, not the brain's search
+    """
+
+    def __init__(self, board_size=20, exact5=True, seed: Optional[int] = None):
+        self.board_size = board_size
+        self.exact5 = exact5
+        self.rng = np.random.default_rng(seed)
+        self.games_per_second = 0.0
+
+    def _wins(self, lengths: np.ndarray):
+        if self.exact5:
+            return (lengths == evaluation.MAX_LENGTH).any(axis=1)
+        return (lengths >= evaluation.MAX_LENGTH).any(axis=1)
+
+    def play(
+        self, pairings: Sequence[tuple[GeneticAgent, GeneticAgent]]
+    ) -> list[GameRecord]:
+        """Play one game for every (black, white) pairing"""
+        start = time.time()
+        games = len(pairings)
+        size = self.board_size
+        boards = np.zeros((games, size, size), dtype=int)
+        tables = {
+            BLACK: np.stack(
+                [evaluation.build_pattern_table(b.weights) for b, _ in pairings]
+            ),
+            WHITE: np.stack(
+                [evaluation.build_pattern_table(w.weights) for _, w in pairings]
+            ),
+        }
+        aggression = {
+            BLACK: np.array([b.weights[-1] for b, _ in pairings]),
+            WHITE: np.array([w.weights[-1] for _, w in pairings]),
+        }
+        moves = np.zeros((games, size * size, 2), dtype=int)
+        results = np.full(games, "1/2-1/2", dtype=object)
+        plies = np.zeros(games, dtype=int)
+        live = np.ones(games, dtype=bool)
+
+        color = BLACK
+        for ply in range(size * size):
+            idx = np.flatnonzero(live)
+            if len(idx) == 0:
+                break
+
+            view = boards[idx] * color
+            table = tables[color][idx]
+            candidates = evaluation.relevant_points(view) & (view == 0)
+            offensive = evaluation.score_board(view, table)
+            defensive = evaluation.score_board(view, table, player=-1)
+            totals = evaluation.total_scores(
+                offensive, defensive, candidates, aggression[color][idx, None, None]
+            )
+            xs, ys = first_moves(totals, self.rng)
+
+            # an illegal move forfeits the game, as the tournament manager would
+            illegal = view[np.arange(len(idx)), xs, ys] != 0
+            results[idx[illegal]] = "1-0" if color == BLACK else "0-1"
+            live[idx[illegal]] = False
+            idx, xs, ys = idx[~illegal], xs[~illegal], ys[~illegal]
+
+            boards[idx, xs, ys] = color
+            moves[idx, ply] = np.stack([xs, ys], axis=1)
+            plies[idx] = ply + 1
+
+            won = self._wins(run_lengths(boards[idx], xs, ys, color))
+            results[idx[won]] = "0-1" if color == BLACK else "1-0"
+            live[idx[won]] = False
+            color = -color
+
+        elapsed = time.time() - start
+        self.games_per_second = games / elapsed if elapsed > 0 else 0.0
+
+        return [
+            GameRecord(
+                black=black.name,
+                white=white.name,
+                result=results[g],
+                moves=[(int(x), int(y)) for x, y in moves[g, : plies[g]]],
+                board_size=size,
+                round=g + 1,
+            )
+            for g, (black, white) in enumerate(pairings)
+        ]
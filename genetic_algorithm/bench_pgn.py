@@ -0,0 +1,107 @@
+"""
+Compare the header scanner used for fitness with python-chess on a synthetic PGN file with
+the tags and tag order c-gomoku-cli writes. Both parsers must return the same headers.
+
+    python bench_pgn.py --games 1000000
+    python bench_pgn.py --games 1000000 --chess-games 100000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import chess.pgn
+from pgn_scan import scan_headers
+from referee import GameRecord
+
+RESULTS = ["1-0", "0-1", "1/2-1/2"]
+
+
+def write_synthetic_pgn(path: str, games: int, board_size=20, seed=0):
+    """random games written as c-gomoku-cli writes them, with its tag order"""
+    rng = random.Random(seed)
+    names = [f"Agent 1.{i}" for i in range(50)] + [f"gomocup{i}" for i in range(6)]
+    with open(path, "w") as f:
+        for game in range(games):
+            white, black = rng.sample(names, 2)
+            record = GameRecord(
+                black=black,
+                white=white,
+                result=rng.choice(RESULTS),
+                moves=[
+                    (rng.randrange(board_size), rng.randrange(board_size))
+                    for _ in range(rng.randint(9, 120))
+                ],
+                board_size=board_size,
+                round=game + 1,
+            )
+            f.write(record.to_cli_pgn())
+
+
+def chess_headers(path: str, limit: int):
+    with open(path) as f:
+        for _ in range(limit):
+            headers = chess.pgn.read_headers(f)
+            if headers is None:
+                return
+            yield (
+                headers["White"],
+                headers["Black"],
+                headers["Result"],
+                int(headers["PlyCount"]),
+            )
+
+
+def timed(label: str, games, size: int):
+    start = time.perf_counter()
+    parsed = list(games)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{label:8} {len(parsed):8} games in {elapsed:7.2f}s"
+        f"  {len(parsed) / elapsed:10.0f} games/sec  {size / elapsed / 1e6:7.1f} MB/s"
+    )
+    return parsed, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--games", type=int, default=1_000_000)
+    parser.add_argument(
+        "--chess-games",
+        type=int,
+        help="only parse this many games with python-chess, its rate is extrapolated",
+    )
+    parser.add_argument("--pgn", help="benchmark this file instead of a synthetic one")
+    args = parser.parse_args()
+
+    path = args.pgn
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(), "synthetic.pgn")
+        start = time.perf_counter()
+        write_synthetic_pgn(path, args.games)
+        print(
+            f"wrote {args.games} games to {path} in {time.perf_counter() - start:.1f}s"
+        )
+    size = os.path.getsize(path)
+
+    try:
+        scanned, scan_time = timed("scanner", scan_headers(path), size)
+        chess_limit = args.chess_games or len(scanned)
+        chess_size = size * chess_limit / max(len(scanned), 1)
+        parsed, chess_time = timed(
+            "chess", chess_headers(path, chess_limit), int(chess_size)
+        )
+    finally:
+        if args.pgn is None:
+            os.remove(path)
+
+    if parsed != scanned[: len(parsed)]:
+        raise SystemExit("FAIL: the scanner and python-chess disagree")
+    speedup = (chess_time / len(parsed)) / (scan_time / len(scanned))
+    print(f"headers match, scanner is {speedup:.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
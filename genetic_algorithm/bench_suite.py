@@ -0,0 +1,397 @@
+"""
+Brain performance benchmark on a fixed corpus of positions, from the opening to the late
+middlegame. Every position is set up through the agent template's own place_stone and
+replayed through its turn, with the search stopped at a fixed depth instead of the clock.
+Reports latency percentiles per turn and per evaluated cell, games/sec of the local play
+path and pgn parse throughput of generate_fitness_values. Results can be written as JSON and
+compared with an earlier run.
+
+    python bench_suite.py --json bench.json
+    python bench_suite.py --json new.json --compare bench.json
+    python bench_suite.py --make-corpus bench_positions.json --corpus-seed 1
+
+A new corpus changes what is measured, bump CORPUS_VERSION when making one.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+from agent import GeneticAgent
+from batch_sim import BatchSimulator
+from population import Population
+from reference_agents import GENOME, SEARCH, ReferenceAgent
+from referee import (
+    SEARCH_DEPTH,
+    UNLIMITED_MS,
+    Referee,
+    evaluation,
+    move_from_str,
+    move_to_str,
+)
+
+import gomoku_agent_template as brain  # noqa: E402, on the base_brain path added by referee
+import search  # noqa: E402
+from pisqpipe import state  # noqa: E402
+from structs import DEFAULT_GENOME, Point  # noqa: E402
+
+CORPUS_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "bench_positions.json"
+)
+CORPUS_VERSION = 1
+# plies played before the positions of each phase, inclusive
+PHASES = {"opening": (2, 10), "middlegame": (11, 30), "late_middlegame": (31, 60)}
+POSITIONS_PER_PHASE = 20
+# second genome of the local play games
+CHALLENGER_GENOME = [0.01, 0.02, 0.05, 0.1, 0.2, 0.4, 0.6, 0.9, 0.6]
+
+
+def percentiles(values: list[float]):
+    ordered = sorted(values)
+
+    def at(p: float):
+        return round(ordered[min(int(len(ordered) * p / 100), len(ordered) - 1)], 3)
+
+    return {
+        "n": len(ordered),
+        "p50": at(50),
+        "p90": at(90),
+        "p99": at(99),
+        "max": at(100),
+    }
+
+
+def make_corpus(path: str, max_games: int, board_size=20, seed=0):
+    """
+    Positions of games between the default genome and a depth 2 search, at most one per
+    phase of a game, until every phase has POSITIONS_PER_PHASE positions
+    """
+    rng = random.Random(seed)
+    referee = Referee(board_size=board_size, seed=seed)
+    genome = ReferenceAgent(name="genome", brain=GENOME)
+    searcher = ReferenceAgent(name="search2", brain=SEARCH, depth=2)
+    positions = []
+    counts = {phase: 0 for phase in PHASES}
+    for game in range(max_games):
+        if all(count == POSITIONS_PER_PHASE for count in counts.values()):
+            break
+        black, white = (genome, searcher) if game % 2 == 0 else (searcher, genome)
+        moves = referee.play(black, white).moves
+        for phase, (first, last) in PHASES.items():
+            # the position keeps a move to play
+            plies = range(first, min(last, len(moves) - 1) + 1)
+            if plies and counts[phase] < POSITIONS_PER_PHASE:
+                ply = rng.choice(plies)
+                counts[phase] += 1
+                positions.append(
+                    {
+                        "phase": phase,
+                        "moves": " ".join(move_to_str(x, y) for x, y in moves[:ply]),
+                    }
+                )
+    with open(path, "w") as f:
+        json.dump(
+            {
+                "version": CORPUS_VERSION,
+                "board_size": board_size,
+                "positions": positions,
+            },
+            f,
+            indent=1,
+        )
+    return positions
+
+
+def load_corpus(path: str = CORPUS_PATH):
+    with open(path) as f:
+        corpus = json.load(f)
+    if corpus["version"] != CORPUS_VERSION:
+        raise ValueError(
+            f"corpus version {corpus['version']} is not {CORPUS_VERSION}, results would"
+            " not compare"
+        )
+    return corpus
+
+
+def rescored_cells(x: int, y: int):
+    """points update_scores rescores for both players after a stone at (x, y)"""
+    cells = 0
+    for dx, dy in evaluation.directions:
+        for k in range(-evaluation.REACH, evaluation.REACH + 1):
+            i, j = x + k * dx, y + k * dy
+            cells += 0 <= i < state.width and 0 <= j < state.height
+    return 2 * cells
+
+
+def bench_brain(corpus: dict, depth: int, repeat: int, genome=DEFAULT_GENOME):
+    """replay every position through the template's stone updates and turn"""
+    state.width = state.height = corpus["board_size"]
+    brain.genome = list(genome)
+    brain.load_engine()
+
+    turns: dict[str, list[float]] = {phase: [] for phase in PHASES}
+    static_turns: list[float] = []
+    update_cells: list[float] = []
+    evaluate_cells: list[float] = []
+    relevant: list[float] = []
+    nodes = 0
+    search_time = 0.0
+    for position in corpus["positions"]:
+        moves = [move_from_str(move) for move in position["moves"].split()]
+        for _ in range(repeat):
+            brain.reset_scores()
+            for ply, (x, y) in enumerate(moves):
+                # the side to move is 1
+                value = 1 if (len(moves) - ply) % 2 == 0 else -1
+                start = time.perf_counter()
+                brain.place_stone(Point(x, y), value)
+                elapsed = time.perf_counter() - start
+                update_cells.append(elapsed * 1e9 / rescored_cells(x, y))
+
+            board = brain.npBoard
+            start = time.perf_counter()
+            evaluation.score_board(board, brain.patternTable)
+            evaluation.score_board(board, brain.patternTable, player=-1)
+            evaluate_cells.append(
+                (time.perf_counter() - start) * 1e9 / (2 * board.size)
+            )
+
+            start = time.perf_counter()
+            evaluation.relevant_points(board)
+            relevant.append((time.perf_counter() - start) * 1e6)
+
+            # fresh tables, as after START
+            brain.tableMemory = None
+            brain.create_tables()
+            start = time.perf_counter()
+            candidates = (brain.relevanceCounts > 0) & (board == 0)
+            totals = evaluation.total_scores(
+                brain.offensiveScores, brain.defensiveScores, candidates, genome[-1]
+            )
+            ordered = search.order_moves(totals, candidates)
+            static = time.perf_counter() - start
+            searcher = search.Search(
+                brain.patternTable,
+                genome[-1],
+                search.TimeManager(UNLIMITED_MS, 0, 0),
+                exact5=True,
+                zobrist=brain.zobrist,
+                transpositions=brain.transpositionTable,
+                evaluations=brain.evaluationCache,
+            )
+            searcher.run(board, ordered, brain.positionHash, max_depth=depth)
+            turn = time.perf_counter() - start
+            turns[position["phase"]].append(turn * 1000)
+            static_turns.append(static * 1000)
+            nodes += searcher.nodes
+            search_time += turn - static
+
+    all_turns = [turn for phase_turns in turns.values() for turn in phase_turns]
+    return {
+        "depth": depth,
+        "turn_ms": {"all": percentiles(all_turns)}
+        | {phase: percentiles(values) for phase, values in turns.items() if values},
+        "static_turn_ms": percentiles(static_turns),
+        "update_cell_ns": percentiles(update_cells),
+        "evaluate_cell_ns": percentiles(evaluate_cells),
+        "relevant_points_us": percentiles(relevant),
+        "nodes_per_second": round(nodes / search_time),
+    }
+
+
+def bench_local_play(games: int, batch_games: int, board_size=20, seed=0):
+    """
+    games/sec between two fixed genomes of the referee, searching SEARCH_DEPTH plies like
+    local games, and of the greedy batch simulator
+    """
+    first = GeneticAgent(name="default", cmd="", weights=list(DEFAULT_GENOME))
+    second = GeneticAgent(name="challenger", cmd="", weights=CHALLENGER_GENOME)
+    referee = Referee(board_size=board_size, seed=seed)
+    start = time.perf_counter()
+    records = [
+        referee.play(first, second) if game % 2 == 0 else referee.play(second, first)
+        for game in range(games)
+    ]
+    elapsed = time.perf_counter() - start
+    plies = sum(record.ply_count for record in records)
+
+    simulator = BatchSimulator(board_size=board_size, seed=seed)
+    simulator.play([(first, second), (second, first)] * (batch_games // 2))
+    return {
+        "referee_games": games,
+        "referee_depth": SEARCH_DEPTH,
+        "referee_games_per_sec": round(games / elapsed, 3),
+        "referee_plies_per_sec": round(plies / elapsed, 1),
+        "batch_games": batch_games // 2 * 2,
+        "batch_games_per_sec": round(simulator.games_per_second, 3),
+    }, records
+
+
+def bench_pgn_parse(records: list, games: int):
+    """
+    generate_fitness_values over a pgn of games copies of the local play games, written
+    with the tags and tag order of c-gomoku-cli like the tournament files it reads
+    """
+    names = [f"Agent 1.{i}" for i in range(50)] + [f"gomocup{i}" for i in range(6)]
+    rng = random.Random(0)
+    folder = tempfile.mkdtemp()
+    path = os.path.join(folder, "bench.pgn")
+    try:
+        with open(path, "w") as f:
+            for game in range(games):
+                record = records[game % len(records)].model_copy()
+                record.white, record.black = rng.sample(names, 2)
+                record.round = game + 1
+                f.write(record.to_cli_pgn())
+        size = os.path.getsize(path)
+        start = time.perf_counter()
+        Population(0).generate_fitness_values(path)
+        elapsed = time.perf_counter() - start
+    finally:
+        os.remove(path)
+        os.rmdir(folder)
+    return {
+        "games": games,
+        "format": "cli",
+        "games_per_sec": round(games / elapsed),
+        "mb_per_sec": round(size / elapsed / 1e6, 2),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def flatten(results: dict, prefix=""):
+    """numeric results by their dotted path"""
+    values = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            values |= flatten(value, f"{prefix}{key}.")
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[f"{prefix}{key}"] = value
+    return values
+
+
+def compare(results: dict, baseline: dict):
+    if baseline.get("corpus_version") != results["corpus_version"]:
+        print("baseline was measured on another corpus version, not comparing")
+        return
+    if baseline["brain"]["depth"] != results["brain"]["depth"]:
+        print(
+            f"baseline turns searched to depth {baseline['brain']['depth']},"
+            f" these to {results['brain']['depth']}"
+        )
+    old_depth = baseline.get("local_play", {}).get("referee_depth", 0)
+    if old_depth != results["local_play"]["referee_depth"]:
+        print(
+            f"baseline referee games searched to depth {old_depth},"
+            f" these to {results['local_play']['referee_depth']}"
+        )
+    old_format = baseline.get("pgn_parse", {}).get("format", "referee")
+    if old_format != results["pgn_parse"]["format"]:
+        print(
+            f"baseline parsed {old_format} format pgn,"
+            f" these {results['pgn_parse']['format']} format"
+        )
+    old, new = flatten(baseline), flatten(results)
+    print(f"compared with {baseline.get('commit')} ({baseline.get('time')}):")
+    for key in new:
+        if key in old and old[key] and not key.endswith(".n"):
+            print(
+                f"  {key:40} {old[key]:12} -> {new[key]:12}  x{new[key] / old[key]:.2f}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--corpus", default=CORPUS_PATH)
+    parser.add_argument("--depth", type=int, default=3, help="search depth of a turn")
+    parser.add_argument("--repeat", type=int, default=3, help="runs of every position")
+    parser.add_argument("--games", type=int, default=20, help="referee games")
+    parser.add_argument("--batch-games", type=int, default=200)
+    parser.add_argument("--pgn-games", type=int, default=100_000)
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--compare", help="results of an earlier run to compare with")
+    parser.add_argument(
+        "--make-corpus", help="write a new position corpus to this file"
+    )
+    parser.add_argument("--corpus-games", type=int, default=200)
+    parser.add_argument("--corpus-seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.make_corpus:
+        positions = make_corpus(
+            args.make_corpus, args.corpus_games, seed=args.corpus_seed
+        )
+        print(f"wrote {len(positions)} positions to {args.make_corpus}")
+        return
+
+    corpus = load_corpus(args.corpus)
+    results = {
+        "corpus_version": corpus["version"],
+        "positions": len(corpus["positions"]),
+        "commit": git_commit(),
+        "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "numpy": np.__version__,
+    }
+
+    start = time.perf_counter()
+    results["brain"] = bench_brain(corpus, args.depth, args.repeat)
+    turn = results["brain"]["turn_ms"]
+    print(
+        f"brain: {len(corpus['positions'])} positions x {args.repeat} in"
+        f" {time.perf_counter() - start:.1f}s, turn at depth {args.depth}"
+        f" p50={turn['all']['p50']}ms p99={turn['all']['p99']}ms,"
+        f" evaluate p50={results['brain']['evaluate_cell_ns']['p50']}ns/cell,"
+        f" update p50={results['brain']['update_cell_ns']['p50']}ns/cell"
+    )
+    for phase in PHASES:
+        if phase in turn:
+            print(
+                f"  {phase:16} turn p50={turn[phase]['p50']}ms p99={turn[phase]['p99']}ms"
+            )
+
+    results["local_play"], records = bench_local_play(args.games, args.batch_games)
+    print(
+        f"local play: referee {results['local_play']['referee_games_per_sec']} games/sec"
+        f" at depth {SEARCH_DEPTH},"
+        f" greedy batch {results['local_play']['batch_games_per_sec']} games/sec"
+    )
+
+    results["pgn_parse"] = bench_pgn_parse(records, args.pgn_games)
+    print(
+        f"pgn parse: {results['pgn_parse']['games_per_sec']} games/sec,"
+        f" {results['pgn_parse']['mb_per_sec']} MB/s"
+    )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=4)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import json
+import os
+import random
+import tempfile
+from typing import Optional, Union
+
+from agent import GeneticAgent
+from array_population import ArrayPopulation
+from population import Population
+from pydantic import BaseModel
+
+CHECKPOINT_PATH = "./log/checkpoint.json"
+
+
+class Checkpoint(BaseModel):
+    """
+    State of the generation loop: the population, the random state for breeding, and the games
+    of the population trial completed so far. The games themselves are kept in the fitness
+    cache, which makes the resumed trial skip them
+    """
+
+    generation: int
+    agents: list[GeneticAgent]
+    # random.getstate() as json: version, internal state, gauss_next
+    rng_state: list
+    # (white, black, result, plies) of the trial games read so far in this generation
+    games: list[tuple[str, str, str, int]] = []
+    # offspring already bred while the trial was running
+    offspring: list[GeneticAgent] = []
+    # bit generator state of the numpy rng an ArrayPopulation breeds with
+    array_rng_state: Optional[dict] = None
+
+    @classmethod
+    def capture(
+        cls,
+        population: Union[Population, ArrayPopulation],
+        games: Optional[list[tuple[str, str, str, int]]] = None,
+        offspring: Optional[list[GeneticAgent]] = None,
+    ):
+        version, state, gauss_next = random.getstate()
+        array_rng_state = None
+        if isinstance(population, ArrayPopulation):
+            array_rng_state = population.rng.bit_generator.state
+        return cls(
+            generation=population.generation,
+            agents=population.agents,
+            rng_state=[version, list(state), gauss_next],
+            games=games or [],
+            offspring=offspring or [],
+            array_rng_state=array_rng_state,
+        )
+
+    def restore(self) -> Population:
+        """population of the checkpoint, with the random state put back"""
+        population = Population(0)
+        population.generation = self.generation
+        population.agents = [agent.model_copy(deep=True) for agent in self.agents]
+        version, state, gauss_next = self.rng_state
+        random.setstate((version, tuple(state), gauss_next))
+        return population
+
+    def restore_array(self) -> ArrayPopulation:
+        """array population of the checkpoint, with both random states put back"""
+        population = self.restore()
+        return ArrayPopulation.from_agents(
+            population.agents, self.generation, self.array_rng_state
+        )
+
+
+def save_checkpoint(checkpoint: Checkpoint, path: str = CHECKPOINT_PATH):
+    """write to a temporary file next to path and rename it, a crash leaves the old one"""
+    folder = os.path.dirname(path) or "."
+    os.makedirs(folder, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=folder, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(checkpoint.model_dump_json())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def load_checkpoint(path: str = CHECKPOINT_PATH) -> Checkpoint:
+    with open(path) as f:
+        return Checkpoint(**json.load(f))
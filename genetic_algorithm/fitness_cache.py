@@ -0,0 +1,96 @@
+import hashlib
+import json
+import os
+from typing import Optional
+
+from pydantic import BaseModel
+
+FITNESS_CACHE_PATH = "./log/fitness_cache.jsonl"
+# games are played from an empty board, no opening book is given to the cli
+NO_OPENING = "empty board"
+
+
+def genome_hash(weights: list[float]):
+    """sha1 of the weights as json floats, equal genomes give equal hashes"""
+    return hashlib.sha1(json.dumps([float(w) for w in weights]).encode()).hexdigest()
+
+
+class GameOutcome(BaseModel):
+    # the genetic agent's score: "1", "1/2" or "0"
+    score: str
+    plies: int
+
+
+# (genome hash, opponent name, time control, board size, opening)
+CacheKey = tuple[str, str, str, int, str]
+
+
+class FitnessCache:
+    """
+    Per-game outcomes of genomes against fixed opponents, appended to a JSONL file so that
+    elites and clones of already played genomes are not replayed in later generations
+    """
+
+    def __init__(self, path: str = FITNESS_CACHE_PATH):
+        self.path = path
+        self.games: dict[CacheKey, list[GameOutcome]] = {}
+        if os.path.exists(path):
+            self.load()
+
+    def load(self):
+        """read the games of the file, skipping lines that do not parse"""
+        with open(self.path, "rb") as f:
+            lines = f.readlines()
+        end = 0
+        for i, line in enumerate(lines):
+            start, end = end, end + len(line)
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                if i == len(lines) - 1:
+                    # the last line of a run killed while writing it, cut off so that
+                    # the next append starts on a line of its own
+                    with open(self.path, "r+b") as f:
+                        f.truncate(start)
+                    break
+                continue
+            key = (
+                entry["genome"],
+                entry["opponent"],
+                entry["time_control"],
+                entry["board_size"],
+                entry["opening"],
+            )
+            self.games.setdefault(key, []).append(
+                GameOutcome(score=entry["score"], plies=entry["plies"])
+            )
+
+    @staticmethod
+    def key(
+        weights: list[float],
+        opponent: str,
+        time_control: str,
+        board_size: int,
+        opening: str = NO_OPENING,
+    ) -> CacheKey:
+        return (genome_hash(weights), opponent, time_control, board_size, opening)
+
+    def outcomes(self, key: CacheKey, limit: Optional[int] = None):
+        """cached games in the order they were played, at most limit"""
+        return self.games.get(key, [])[:limit]
+
+    def add(self, games: list[tuple[CacheKey, GameOutcome]]):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a") as f:
+            for key, outcome in games:
+                self.games.setdefault(key, []).append(outcome)
+                genome, opponent, time_control, board_size, opening = key
+                entry = {
+                    "genome": genome,
+                    "opponent": opponent,
+                    "time_control": time_control,
+                    "board_size": board_size,
+                    "opening": opening,
+                    **outcome.model_dump(),
+                }
+                print(json.dumps(entry), file=f)
@@ -0,0 +1,187 @@
+import glob
+import threading
+import time
+from typing import Callable, Iterable, Optional
+
+from fitness_cache import GameOutcome
+from pgn_scan import scan_buffer
+
+# seconds between reads of a pgn file that is still being written
+POLL_INTERVAL = 0.5
+# most fitness a single game can give
+WIN_FITNESS = 2
+
+
+def game_fitness(score: str, turns: int) -> float:
+    if score == "1":
+        return 2
+    elif score == "1/2":
+        return 1
+    elif score == "0":
+        # if its a loss, give small amount of fitness for turns survived
+        turns_for_draw = 400
+        max_points = 0.7
+        return (turns / (turns_for_draw - 1)) * max_points
+    else:
+        raise ValueError(f"unknown score ({score})")
+
+
+class PgnFollower:
+    """Reads the games appended to a pgn file, continuing after the last game it read"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.offset = 0
+
+    def read_games(self) -> list[tuple[str, str, str, int]]:
+        """(white, black, result, plies) of the games completed since the last read"""
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(self.offset)
+                data = f.read()
+        except FileNotFoundError:
+            return []
+
+        games = []
+        # a game still being written is read again from its start next time
+        read = 0
+        for game, read in scan_buffer(data, final=False):
+            games.append(game)
+        self.offset += read
+        return games
+
+
+class FitnessStream:
+    """
+    Fitness accumulated game by game while a tournament is still running, from pgn files being
+    written by the cli or from game records of the referee. Gives live standings and tells
+    when the best agents are settled before every game is played
+    """
+
+    def __init__(
+        self, agent_names: Iterable[str], games_per_agent: int = 0, racing=False
+    ):
+        self.agent_names = list(agent_names)
+        self.games_per_agent = games_per_agent
+        # agents may play fewer or more games than games_per_agent
+        self.racing = racing
+        self.fitness: dict[str, float] = {name: 0.0 for name in self.agent_names}
+        self.games: dict[str, int] = {name: 0 for name in self.agent_names}
+        # sums of squared game fitness, for the spread of an agent's scores
+        self.squares: dict[str, float] = {name: 0.0 for name in self.agent_names}
+        # fitness of the full schedule estimated otherwise, as by a rating model
+        self.estimates: dict[str, float] = {}
+        # (white, black, result, plies) of every game read, in order
+        self.results: list[tuple[str, str, str, int]] = []
+        self.followers: dict[str, PgnFollower] = {}
+        # seconds spent reading pgn files
+        self.parse_time = 0.0
+        self.lock = threading.Lock()
+
+    def _score(self, name: str, score: str, plies: int):
+        value = game_fitness(score, plies)
+        self.fitness[name] = self.fitness.get(name, 0.0) + value
+        self.squares[name] = self.squares.get(name, 0.0) + value**2
+        self.games[name] = self.games.get(name, 0) + 1
+
+    def add_outcome(self, name: str, outcome: GameOutcome):
+        """a cached game standing in for one that is not played"""
+        with self.lock:
+            self._score(name, outcome.score, outcome.plies)
+
+    def add_game(self, white: str, black: str, result: str, plies: int):
+        with self.lock:
+            self._add_game(white, black, result, plies)
+
+    def _add_game(self, white: str, black: str, result: str, plies: int):
+        white_score, black_score = result.split("-")
+        self._score(white, white_score, plies)
+        self._score(black, black_score, plies)
+        self.results.append((white, black, result, plies))
+
+    def add_record(self, record):
+        """game record of the referee or the batch simulator"""
+        self.add_game(record.white, record.black, record.result, record.ply_count)
+
+    def read(self, pattern: str) -> int:
+        """read the games appended to the pgn files matching pattern, returns how many"""
+        with self.lock:
+            start = time.perf_counter()
+            count = 0
+            for path in sorted(glob.glob(pattern)):
+                follower = self.followers.setdefault(path, PgnFollower(path))
+                for white, black, result, plies in follower.read_games():
+                    self._add_game(white, black, result, plies)
+                    count += 1
+            self.parse_time += time.perf_counter() - start
+            return count
+
+    def follow(
+        self,
+        pattern: str,
+        done: Callable[[], bool],
+        on_update: Optional[Callable[["FitnessStream"], None]] = None,
+        interval=POLL_INTERVAL,
+    ):
+        """read games as they are written until done() is true, then pick up the last ones"""
+        while True:
+            finished = done()
+            if self.read(pattern) and on_update is not None:
+                on_update(self)
+            if finished:
+                return
+            time.sleep(interval)
+
+    def complete(self, name: str):
+        return self.games.get(name, 0) >= self.games_per_agent
+
+    def fully_scored(self):
+        return [name for name in self.agent_names if self.complete(name)]
+
+    def standings(self) -> list[tuple[str, float, int]]:
+        """(name, fitness so far, games scored) of the tracked agents, best first"""
+        return sorted(
+            ((name, self.fitness[name], self.games[name]) for name in self.agent_names),
+            key=lambda entry: entry[1],
+            reverse=True,
+        )
+
+    def final_fitness(self, name: str):
+        """
+        fitness over the full schedule, estimated from the mean score of the games played
+        when an agent played fewer or more games than games_per_agent
+        """
+        if name in self.estimates:
+            return self.estimates[name]
+        games = self.games.get(name, 0)
+        if not games or not self.games_per_agent or games == self.games_per_agent:
+            return self.fitness.get(name, 0.0)
+        return self.fitness[name] / games * self.games_per_agent
+
+    def max_fitness(self, name: str):
+        """fitness the agent reaches if it wins every game it has left"""
+        remaining = max(self.games_per_agent - self.games.get(name, 0), 0)
+        return self.fitness.get(name, 0.0) + remaining * WIN_FITNESS
+
+    def top_decided(self, n: int):
+        """
+        whether the n best agents are known already: fitness only grows, so they are once the
+        weakest of the current n best can not be caught by any other agent. Not known before
+        the end of a race, where fitness is an estimate
+        """
+        if self.racing:
+            return False
+        standings = self.standings()
+        if len(standings) <= n:
+            return all(self.complete(name) for name in self.agent_names)
+        weakest = standings[n - 1][1]
+        return all(self.max_fitness(name) < weakest for name, _, _ in standings[n:])
+
+    def print_standings(self, top: int = 5):
+        scored = len(self.fully_scored())
+        print(
+            f"Standings after {len(self.results)} games,"
+            f" {scored}/{len(self.agent_names)} agents fully scored:"
+        )
+        for name, fitness, games in self.standings()[:top]:
+            print(f"  {name}: {fitness:.2f} ({games}/{self.games_per_agent} games)")
@@ -0,0 +1,302 @@
+"""
+Island model: several populations evolve in their own processes, each with its own
+tournament, and send their best genomes to the islands their topology points to every few
+generations. The islands talk to a migration hub over a local or tcp socket, so they can run
+on one machine or on several.
+
+    python islands.py local --islands 4 --topology ring
+    python islands.py hub --address 0.0.0.0:6000 --islands 4
+    python islands.py island --address hub-host:6000 --island 2
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import threading
+from multiprocessing.connection import Client, Connection, Listener, wait
+from typing import Optional
+
+from agent import GeneticAgent, GomocupAgent
+from population import Population
+from pydantic import BaseModel
+from tournament import GOMOKU_CLI_PATH, Tournament
+from trials import ShardedTrial
+
+AUTHKEY_VARIABLE = "GA_ISLAND_AUTHKEY"
+DEFAULT_AUTHKEY = b"gomoku-islands"
+
+
+class IslandConfig(BaseModel):
+    islands: int = 4
+    population_size: int = 50
+    # generations each island runs, 0 runs forever
+    generations: int = 0
+    # migration after every migration_interval generations, of the migrants best agents
+    migration_interval: int = 5
+    migrants: int = 2
+    # ring, bidirectional_ring, complete, star or directed edges like "0-1,1-2,2-0"
+    topology: str = "ring"
+    log_folder: str = "./log/islands"
+    agents_path: str = "gomocup_agents/agents.json"
+    cli_path: str = GOMOKU_CLI_PATH
+    # trial games of an island are sharded over this many processes, 0 plays gauntlets
+    workers: int = 0
+    seed: int = 0
+
+
+def migration_sources(topology: str, islands: int) -> dict[int, list[int]]:
+    """islands that send their migrants to each island"""
+    sources: dict[int, list[int]] = {island: [] for island in range(islands)}
+    if topology == "ring":
+        edges = [(island, (island + 1) % islands) for island in range(islands)]
+    elif topology == "bidirectional_ring":
+        edges = [(island, (island + 1) % islands) for island in range(islands)]
+        edges += [(target, source) for source, target in edges]
+    elif topology == "complete":
+        edges = [(a, b) for a in range(islands) for b in range(islands) if a != b]
+    elif topology == "star":
+        edges = [(0, island) for island in range(1, islands)]
+        edges += [(island, 0) for island in range(1, islands)]
+    else:
+        edges = []
+        for edge in topology.split(","):
+            source, target = (int(island) for island in edge.split("-"))
+            if not (0 <= source < islands and 0 <= target < islands):
+                raise ValueError(f"edge {edge} is outside of {islands} islands")
+            edges.append((source, target))
+
+    for source, target in edges:
+        if source != target and source not in sources[target]:
+            sources[target].append(source)
+    return sources
+
+
+def parse_address(address: str):
+    """host:port for tcp, anything else is the path of a unix socket"""
+    host, _, port = address.rpartition(":")
+    if host and port.isdigit():
+        return host, int(port)
+    return address
+
+
+def authkey():
+    return os.environ.get(AUTHKEY_VARIABLE, "").encode() or DEFAULT_AUTHKEY
+
+
+class MigrationHub:
+    """
+    Collects the migrants of every island for a migration and sends each island the migrants
+    of its sources once all islands sent theirs, islands wait for each other at a migration
+    """
+
+    def __init__(self, config: IslandConfig, address):
+        self.config = config
+        self.sources = migration_sources(config.topology, config.islands)
+        self.listener = Listener(address, authkey=authkey())
+        self.connections: dict[int, Connection] = {}
+        # migrants by generation and island
+        self.migrants: dict[int, dict[int, list[dict]]] = {}
+        # best agent of every island that finished
+        self.results: dict[int, dict] = {}
+
+    @property
+    def address(self):
+        return self.listener.address
+
+    def serve(self):
+        """run until every island is done, an island that fails ends all of them"""
+        try:
+            return self._serve()
+        finally:
+            # islands waiting for migrants see the connection close
+            for connection in self.connections.values():
+                connection.close()
+            self.listener.close()
+
+    def _serve(self):
+        while len(self.connections) < self.config.islands:
+            connection = self.listener.accept()
+            kind, island = connection.recv()
+            if kind == "failed":
+                connection.close()
+                raise RuntimeError(f"island {island} exited before joining")
+            self.connections[island] = connection
+            print(f"Island {island} joined")
+
+        open_connections = dict(self.connections)
+        while open_connections:
+            for connection in wait(list(open_connections.values())):
+                island = next(i for i, c in open_connections.items() if c is connection)
+                try:
+                    message = connection.recv()
+                except EOFError:
+                    raise RuntimeError(f"island {island} disconnected")
+                kind = message[0]
+                if kind == "generation":
+                    _, generation, best, average = message
+                    print(
+                        f"Island {island} generation {generation}:"
+                        f" best {best:.2f}, average {average:.2f}"
+                    )
+                elif kind == "migrate":
+                    _, generation, agents = message
+                    self.migrants.setdefault(generation, {})[island] = agents
+                    self._send_migrants(generation)
+                elif kind == "done":
+                    self.results[island] = message[1]
+                    del open_connections[island]
+        return self.results
+
+    def _send_migrants(self, generation: int):
+        migrants = self.migrants[generation]
+        if len(migrants) < self.config.islands:
+            return
+        for island, connection in self.connections.items():
+            immigrants = [
+                (source, agent)
+                for source in self.sources[island]
+                for agent in migrants[source]
+            ]
+            connection.send(("immigrants", immigrants))
+        print(f"Migration after generation {generation}")
+        del self.migrants[generation]
+
+
+def receive_immigrants(
+    population: Population, island: int, immigrants: list[tuple[int, dict]]
+):
+    """immigrants replace the worst agents, keeping the fitness of their own island"""
+    population.agents.sort(key=lambda agent: agent.fitness, reverse=True)
+    for i, (source, data) in enumerate(immigrants[: len(population.agents)]):
+        row = len(population.agents) - 1 - i
+        agent = GeneticAgent(**data)
+        agent.name = f"Agent {population.generation}.{row} (island {source})"
+        population.agents[row] = agent
+    print(f"Island {island} received {len(immigrants)} immigrants")
+
+
+def run_island(island: int, address, config: IslandConfig):
+    """generation loop of one island, migrating through the hub at address"""
+    random.seed(config.seed * 1000 + island)
+    folder = os.path.join(config.log_folder, f"island{island}")
+    os.makedirs(folder, exist_ok=True)
+
+    with open(config.agents_path) as f:
+        gomocup_agents = [GomocupAgent(**entry) for entry in json.load(f)]
+    tournament = Tournament(folder)
+    tournament.cli_path = config.cli_path
+    if config.workers:
+        tournament.trial = ShardedTrial()
+        tournament.workers = config.workers
+    population = Population(config.population_size)
+
+    with Client(address, authkey=authkey()) as connection:
+        connection.send(("join", island))
+        generation = 0
+        while not config.generations or generation < config.generations:
+            generation += 1
+            stream = tournament.population_trial(population, gomocup_agents)
+            population.apply_fitness(stream)
+            stats = population.get_statistics()
+            # taken before a migration, the immigrants are the best of other islands
+            best = population.get_top_agents(1)[0].model_dump()
+            connection.send(
+                ("generation", population.generation, stats["best"], stats["average"])
+            )
+            with open(os.path.join(folder, "generation_results.txt"), "a") as f:
+                print(f"Generation {population.generation}: {stats['best']}", file=f)
+
+            if generation % config.migration_interval == 0:
+                emigrants = population.get_top_agents(config.migrants)
+                connection.send(
+                    (
+                        "migrate",
+                        population.generation,
+                        [agent.model_dump() for agent in emigrants],
+                    )
+                )
+                _, immigrants = connection.recv()
+                receive_immigrants(population, island, immigrants)
+
+            if not config.generations or generation < config.generations:
+                population.evolve()
+
+        connection.send(("done", best))
+
+
+def watch_islands(hub: MigrationHub, processes: list[multiprocessing.Process]):
+    """
+    An island process that exits before joining would leave the hub waiting for it in accept
+    forever, the hub is told instead so that the run fails
+    """
+    pending = {process.sentinel: island for island, process in enumerate(processes)}
+    while pending:
+        for sentinel in wait(list(pending)):
+            island = pending.pop(sentinel)
+            if island in hub.connections:
+                continue
+            try:
+                with Client(hub.address, authkey=authkey()) as connection:
+                    connection.send(("failed", island))
+            except (OSError, EOFError):
+                pass  # the hub is already closed
+            return
+
+
+def run_local(config: IslandConfig, address: Optional[str] = None):
+    """hub in this process and one process per island, on a unix socket by default"""
+    hub = MigrationHub(config, parse_address(address) if address else None)
+    processes = [
+        multiprocessing.Process(target=run_island, args=(island, hub.address, config))
+        for island in range(config.islands)
+    ]
+    for process in processes:
+        process.start()
+    threading.Thread(target=watch_islands, args=(hub, processes), daemon=True).start()
+    try:
+        results = hub.serve()
+    except BaseException:
+        # the other islands would only notice at their next message to the hub
+        for process in processes:
+            process.terminate()
+        raise
+    finally:
+        for process in processes:
+            process.join()
+    for island, best in sorted(results.items()):
+        print(f"Island {island} best: {best['name']} ({best['fitness']:.2f})")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("mode", choices=["local", "hub", "island"])
+    parser.add_argument(
+        "--address", help="host:port or unix socket path of the migration hub"
+    )
+    parser.add_argument("--island", type=int, help="number of this island")
+    for name, field in IslandConfig.model_fields.items():
+        parser.add_argument(
+            f"--{name.replace('_', '-')}", type=field.annotation, default=field.default
+        )
+    args = parser.parse_args()
+    config = IslandConfig(
+        **{name: getattr(args, name) for name in IslandConfig.model_fields}
+    )
+
+    if args.mode == "local":
+        run_local(config, args.address)
+    elif args.mode == "hub":
+        hub = MigrationHub(config, parse_address(args.address))
+        print(f"Migration hub listening on {hub.address}")
+        hub.serve()
+    else:
+        run_island(args.island, parse_address(args.address), config)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,37 +1,184 @@
+import argparse
 import json
 import os
 
 from agent import GomocupAgent
-from population import Population
+from array_population import ArrayPopulation
+from checkpoint import CHECKPOINT_PATH, Checkpoint, load_checkpoint, save_checkpoint
+from fitness_stream import FitnessStream
+from population import BREEDING_POOL_SIZE, ELITE_COUNT, Population
+from reference_agents import LADDER
+from referee import SEARCH_DEPTH
+from telemetry import TELEMETRY_PATH, Telemetry, Timer
 from tournament import Tournament
+from trials import TRIAL_MODES
 
 POPULATION_SIZE = 50
 
 
 def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="continue from the last checkpoint, games already played are not replayed",
+    )
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH)
+    parser.add_argument(
+        "--generations",
+        type=int,
+        default=0,
+        help="stop once this generation is evolved, 0 runs until interrupted",
+    )
+    parser.add_argument(
+        "--surrogate",
+        metavar="CORPUS",
+        help="screen offspring by move agreement on a corpus mined by surrogate.py",
+    )
+    parser.add_argument(
+        "--reference-ladder",
+        action="store_true",
+        help="trial the population against the in process reference agents",
+    )
+    parser.add_argument(
+        "--gomocup-interval",
+        type=int,
+        default=0,
+        help="with --reference-ladder, play the gomocup gauntlets every this many generations",
+    )
+    parser.add_argument(
+        "--local-depth",
+        type=int,
+        default=SEARCH_DEPTH,
+        help="plies genetic agents search in local games, 0 plays the greedy move choice"
+        " instead of the brain's search",
+    )
+    parser.add_argument(
+        "--trial-mode",
+        choices=list(TRIAL_MODES),
+        default="gauntlet",
+        help="how the population trial against the gomocup agents is played",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="processes of the sharded, racing and scheduled trials and of local games",
+    )
+    parser.add_argument(
+        "--jobs-in-flight",
+        type=int,
+        default=4,
+        help="cli runs at once in an orchestrated trial, sharing the concurrency slots",
+    )
+    parser.add_argument(
+        "--array-population",
+        action="store_true",
+        help="keep the genomes in numpy arrays and breed them in batch operations",
+    )
+    parser.add_argument(
+        "--telemetry",
+        default=TELEMETRY_PATH,
+        help="jsonl file of generation and tournament records, see telemetry_report.py",
+    )
+    args = parser.parse_args()
+    if args.array_population and args.surrogate:
+        parser.error("--surrogate screens the offspring of the list population only")
+
     with open("gomocup_agents/agents.json") as f:
         data: list = json.load(f)
 
     gomocup_agents = [GomocupAgent(**entry) for entry in data]
 
-    pop = Population(POPULATION_SIZE)
+    telemetry = Telemetry(args.telemetry)
     tournament = Tournament()
-
-    print(f"Starting Genetic Algorithm with {POPULATION_SIZE} agents")
+    tournament.telemetry = telemetry
+    tournament.local_depth = args.local_depth
+    tournament.trial = TRIAL_MODES[args.trial_mode]()
+    tournament.workers = args.workers
+    tournament.jobs_in_flight = args.jobs_in_flight
+    resumed_offspring = []
+    resumed_games = []
+    if args.resume:
+        checkpoint = load_checkpoint(args.checkpoint)
+        if args.array_population:
+            pop = checkpoint.restore_array()
+        else:
+            pop = checkpoint.restore()
+        resumed_offspring = checkpoint.offspring
+        resumed_games = checkpoint.games
+        # the games of the interrupted trial are in the fitness cache, a checkpoint taken
+        # between generations has no trial to continue
+        tournament.resume_trial = bool(checkpoint.games)
+        print(
+            f"Resuming generation {pop.generation} after {len(checkpoint.games)} games"
+            f" from {args.checkpoint}"
+        )
+    elif args.array_population:
+        pop = ArrayPopulation(POPULATION_SIZE)
+    else:
+        pop = Population(POPULATION_SIZE)
+
+    if args.surrogate:
+        from surrogate import SurrogateEvaluator
+
+        pop.surrogate = SurrogateEvaluator(args.surrogate)
+
+    print(f"Starting Genetic Algorithm with {len(pop.agents)} agents")
     print("Strategy: Top 8 performers crossbreed, keep top 2 elites each generation")
     print("-" * 70)
 
     # Run genetic algorithm for multiple generations
     while True:
-        print(f"\n=== GENERATION {pop.generation} ===")
+        generation = pop.generation
+        generation_timer = Timer()
+
+        # offspring bred as soon as the breeding pool is settled, while games are still running
+        offspring = resumed_offspring
+        earlier_games = resumed_games
+        resumed_offspring, resumed_games = [], []
+        scored_agents = 0
+        save_checkpoint(
+            Checkpoint.capture(pop, earlier_games, offspring), args.checkpoint
+        )
+        # the checkpoint of the next generation is written, --resume continues from it
+        if args.generations and generation > args.generations:
+            break
+        print(f"\n=== GENERATION {generation} ===")
+
+        def on_update(stream: FitnessStream):
+            nonlocal scored_agents
+            scored = len(stream.fully_scored())
+            if scored != scored_agents:
+                scored_agents = scored
+                stream.print_standings()
+            if not offspring and stream.top_decided(BREEDING_POOL_SIZE):
+                pool = {name for name, _, _ in stream.standings()[:BREEDING_POOL_SIZE]}
+                parents = [agent for agent in pop.agents if agent.name in pool]
+                offspring.extend(pop.breed(parents, len(pop.agents) - ELITE_COUNT))
+                print(
+                    f"Breeding pool settled after {len(stream.results)} games, offspring bred"
+                )
+            # the games read so far are in the fitness cache already
+            save_checkpoint(
+                Checkpoint.capture(pop, earlier_games + stream.results, offspring),
+                args.checkpoint,
+            )
 
         # Run tournament to evaluate fitness
         print("Running tournament...")
-        tournament.population_trial(pop, gomocup_agents)
-
-        # Calculate fitness values from tournament results
+        evaluation_timer = Timer()
+        if args.reference_ladder and not (
+            args.gomocup_interval and pop.generation % args.gomocup_interval == 0
+        ):
+            stream = tournament.local_population_trial(pop, LADDER, on_update)
+        else:
+            stream = tournament.population_trial(pop, gomocup_agents, on_update)
+
+        # Fitness was accumulated while the tournament ran
         print("Calculating fitness values...")
-        pop.generate_fitness_values(tournament.pgn_path)
+        pop.apply_fitness(stream)
+        evaluation_s = evaluation_timer.elapsed()
 
         # Show statistics for this generation
         stats = pop.get_statistics()
@@ -60,7 +207,19 @@ def main():
             json.dump([agent.model_dump() for agent in pop.agents], f, indent=4)
 
         print(f"\nEvolving to generation {pop.generation + 1}...")
-        pop.evolve()
+        evolve_timer = Timer()
+        pop.evolve(offspring or None)
+        telemetry.record(
+            "generation",
+            generation=generation,
+            evaluation_s=round(evaluation_s, 3),
+            evolve_s=round(evolve_timer.elapsed(), 3),
+            parse_s=round(stream.parse_time, 3),
+            best=stats["best"],
+            average=stats["average"],
+            worst=stats["worst"],
+            **generation_timer.fields(len(stream.results)),
+        )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,86 @@
+import asyncio
+import subprocess
+import time
+from typing import Callable, Optional
+
+
+class Job:
+    """one cli run: its command, the game slots it takes from the budget and its games"""
+
+    def __init__(self, label: str, command: list[str], slots: int, games: int):
+        self.label = label
+        self.command = command
+        self.slots = slots
+        self.games = games
+        self.elapsed = 0.0
+
+
+class Orchestrator:
+    """
+    Runs cli jobs as asyncio subprocesses, starting them in order as long as their slots fit
+    in the global slot budget. When a job finishes the next ones take its slots, so the slots
+    freed by the last games of one gauntlet go to the next gauntlet instead of idling
+    """
+
+    def __init__(
+        self, slot_budget: int, on_finish: Optional[Callable[[Job], None]] = None
+    ):
+        self.slot_budget = slot_budget
+        self.on_finish = on_finish
+        self.finished: list[Job] = []
+
+    def slots(self, job: Job):
+        """a job bigger than the budget runs on its own"""
+        return min(job.slots, self.slot_budget)
+
+    def run(self, jobs: list[Job]):
+        asyncio.run(self.run_jobs(jobs))
+
+    async def run_jobs(self, jobs: list[Job]):
+        pending = list(jobs)
+        running: set[asyncio.Task] = set()
+        free = self.slot_budget
+        start = time.monotonic()
+        try:
+            while pending or running:
+                while pending and self.slots(pending[0]) <= free:
+                    job = pending.pop(0)
+                    free -= self.slots(job)
+                    running.add(asyncio.create_task(self._run_job(job)))
+
+                done, running = await asyncio.wait(
+                    running, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    job = task.result()
+                    free += self.slots(job)
+                    self.finished.append(job)
+                    print(
+                        f"{job.label} done in {round(job.elapsed, 2)}s"
+                        f" ({round(job.games / job.elapsed, 2)} games/sec),"
+                        f" {len(self.finished)}/{len(jobs)} jobs after"
+                        f" {round(time.monotonic() - start, 2)}s, {len(running)} running"
+                    )
+                    if self.on_finish is not None:
+                        self.on_finish(job)
+        finally:
+            # a failed job stops the others
+            for task in running:
+                task.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+
+    async def _run_job(self, job: Job) -> Job:
+        start = time.monotonic()
+        process = await asyncio.create_subprocess_exec(
+            *job.command, stdout=subprocess.DEVNULL
+        )
+        try:
+            returncode = await process.wait()
+        except asyncio.CancelledError:
+            process.kill()
+            await process.wait()
+            raise
+        job.elapsed = time.monotonic() - start
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, job.command)
+        return job
@@ -0,0 +1,116 @@
+import mmap
+import os
+import re
+from typing import Iterator
+
+# the only tags fitness needs, "WhiteElo" and the like do not match because of the space
+TAG = re.compile(rb'\[(White|Black|Result|PlyCount) "([^"]*)"\]')
+FIELDS = (b"White", b"Black", b"Result", b"PlyCount")
+# any other tags of a game, between the ones fitness needs
+OTHER_TAGS = rb'(?:\[\w+ "[^"]*"\]\s*)*?'
+# the players in either order, then Result and PlyCount, with any tags between them.
+# c-gomoku-cli writes Event, Date, Round, Black, White, Result, Termination, PlyCount and the
+# referee Event, Site, Date, Round, White, Black, Result, PlyCount, BoardSize
+GAME = re.compile(
+    rb'\[(White|Black) "([^"]*)"\]\s*'
+    + OTHER_TAGS
+    + rb'\[(White|Black) "([^"]*)"\]\s*'
+    + OTHER_TAGS
+    + rb'\[Result "([^"]*)"\]\s*'
+    + OTHER_TAGS
+    + rb'\[PlyCount "(\d+)"\]'
+)
+
+
+def scan_headers(pgn_path: str) -> Iterator[tuple[str, str, str, int]]:
+    """
+    (White, Black, Result, PlyCount) of every game in a pgn file, read straight from the
+    memory mapped file bytes without parsing the rest of the headers or the movetext
+    """
+    if os.path.getsize(pgn_path) == 0:
+        return
+
+    with open(pgn_path, "rb") as f, mmap.mmap(
+        f.fileno(), 0, access=mmap.ACCESS_READ
+    ) as data:
+        for game, _ in scan_buffer(data):
+            yield game
+
+
+def scan_buffer(data, final=True) -> Iterator[tuple[tuple[str, str, str, int], int]]:
+    """
+    (White, Black, Result, PlyCount) of every game in the pgn bytes, each with the offset
+    just past the last of those tags. Unless final the bytes may end in a game that is still
+    being written, which is left out until all four of its tags are complete
+    """
+    # one match per game while the games have the tags in one of the usual orders
+    position = 0
+    for match in GAME.finditer(data):
+        if (
+            match[1] == match[3]
+            or data.find(b'[White "', position, match.start()) != -1
+        ):
+            break
+        players = {match[1]: match[2], match[3]: match[4]}
+        position = match.end()
+        yield (
+            players[b"White"].decode(),
+            players[b"Black"].decode(),
+            match[5].decode(),
+            int(match[6]),
+        ), position
+    else:
+        if data.find(b'[White "', position) == -1:
+            return
+
+    # from the first game that is written differently on tag by tag, a game ends where
+    # one of its tags is seen again
+    game: dict[bytes, bytes] = {}
+    for match in TAG.finditer(data, position):
+        tag = match[1]
+        if tag in game:
+            yield _game_tuple(game), position
+            game = {}
+        game[tag] = match[2]
+        position = match.end()
+    if game and (final or len(game) == len(FIELDS)):
+        yield _game_tuple(game), position
+
+
+def _game_tuple(game: dict[bytes, bytes]):
+    if len(game) != len(FIELDS):
+        missing = [field.decode() for field in FIELDS if field not in game]
+        raise ValueError(f"game without {', '.join(missing)} header")
+    return (
+        game[b"White"].decode(),
+        game[b"Black"].decode(),
+        game[b"Result"].decode(),
+        int(game[b"PlyCount"]),
+    )
+
+
+# a header block and the movetext up to the next one
+GAME_TEXT = re.compile(rb'((?:\[\w+ "[^"]*"\][ \t]*\r?\n?)+)([^\[]*)')
+HEADER = re.compile(rb'\[(\w+) "([^"]*)"\]')
+COMMENT = re.compile(rb"\{[^}]*\}")
+# column letter followed by the 1 based row, like referee.move_to_str writes them
+MOVE = re.compile(rb"\b([a-z])(\d+)\b")
+
+
+def scan_games(pgn_path: str) -> Iterator[tuple[dict[str, str], list[tuple[int, int]]]]:
+    """headers and (x, y) moves of every game in a pgn file, comments are skipped"""
+    if os.path.getsize(pgn_path) == 0:
+        return
+
+    with open(pgn_path, "rb") as f, mmap.mmap(
+        f.fileno(), 0, access=mmap.ACCESS_READ
+    ) as data:
+        for match in GAME_TEXT.finditer(data):
+            headers = {
+                tag.decode(): value.decode() for tag, value in HEADER.findall(match[1])
+            }
+            moves = [
+                (ord(column) - ord("a"), int(row) - 1)
+                for column, row in MOVE.findall(COMMENT.sub(b"", match[2]))
+            ]
+            yield headers, moves
@@ -1,7 +1,17 @@
 import random
+from typing import Optional
 
-import chess.pgn
 from agent import GeneticAgent
+from fitness_cache import GameOutcome
+from fitness_stream import FitnessStream, game_fitness
+from pgn_scan import scan_headers
+
+# top agents that breed the offspring, and top agents kept unchanged
+BREEDING_POOL_SIZE = 8
+ELITE_COUNT = 2
+AGENT_CMD = "../base_brain/dist/pbrain-agent/pbrain-agent.exe"
+# children bred per offspring slot when a surrogate screens them
+SCREEN_FACTOR = 3
 
 
 def crossover(parent1: GeneticAgent, parent2: GeneticAgent) -> GeneticAgent:
@@ -31,32 +41,77 @@ class Population:
         self.agents = [
             GeneticAgent(
                 name=f"Agent {self.generation}.{i}",
-                cmd="../base_brain/dist/pbrain-agent/pbrain-agent.exe",
+                cmd=AGENT_CMD,
             )
             for i in range(size)
         ]
+        # surrogate.SurrogateEvaluator that screens the offspring before the tournament
+        self.surrogate = None
 
     def get_top_agents(self, n: int):
         """Get the top n agents by fitness"""
         self.agents.sort(key=lambda agent: agent.fitness, reverse=True)
         return self.agents[:n]
 
-    def evolve(self):
+    def breed(self, parents: list[GeneticAgent], count: int) -> list[GeneticAgent]:
+        """
+        Create count children of random pairs of parents through crossover and mutation,
+        the parents are left untouched. With a surrogate, SCREEN_FACTOR times as many
+        children are bred and the ones it scores best are kept
+        """
+        if self.surrogate is not None:
+            return self.screen(self._breed(parents, count * SCREEN_FACTOR), count)
+        return self._breed(parents, count)
+
+    def _breed(self, parents: list[GeneticAgent], count: int) -> list[GeneticAgent]:
+        offspring = []
+        for _ in range(count):
+            # Select two random parents from the breeding pool
+            parent1 = random.choice(parents)
+            parent2 = random.choice(parents)
+
+            # Create child through crossover
+            child = crossover(parent1, parent2)
+            child.fitness = -1  # Reset fitness for new tournament
+
+            # Apply mutation with slight probability
+            child.mutate()
+
+            offspring.append(child)
+        return offspring
+
+    def screen(self, candidates: list[GeneticAgent], count: int) -> list[GeneticAgent]:
+        """the count candidates with the best surrogate scores, best first"""
+        scores = self.surrogate.score([child.weights for child in candidates])
+        ranked = sorted(
+            zip(scores, candidates), key=lambda entry: entry[0], reverse=True
+        )
+        kept = [child for _, child in ranked[:count]]
+        print(
+            f"Surrogate kept {len(kept)} of {len(candidates)} children, agreement"
+            f" {ranked[0][0]:.4f} to {ranked[len(kept) - 1][0]:.4f}"
+        )
+        return kept
+
+    def evolve(self, offspring: Optional[list[GeneticAgent]] = None):
         """
         Evolve the population:
         - Take top 8 performing agents
         - Cross breed them for offspring
         - Apply slight mutation
         - Keep top 2 agents from previous generation as elites
+
+        offspring already bred from the top 8, e.g. while the tournament was still running,
+        is used instead of breeding new children
         """
         # Sort agents by their fitness (descending order)
         self.agents.sort(key=lambda agent: agent.fitness, reverse=True)
 
         # Get top 8 performers for crossbreeding
-        top_performers = self.agents[:8]
+        top_performers = self.agents[:BREEDING_POOL_SIZE]
 
         # Keep top 2 as elites (unchanged)
-        elites = self.agents[:2].copy()
+        elites = self.agents[:ELITE_COUNT].copy()
         print(
             f"Keeping elites: {elites[0].name} (fitness: {elites[0].fitness:.2f}), {elites[1].name} (fitness: {elites[1].fitness:.2f})"
         )
@@ -74,23 +129,13 @@ class Population:
         new_agents = elites.copy()
 
         # Fill the rest of the population with offspring from top 8 performers
-        offspring_count = len(self.agents) - 2  # Total minus the 2 elites
-
-        for _ in range(offspring_count):
-            # Select two random parents from top 8 performers
-            parent1 = random.choice(top_performers)
-            parent2 = random.choice(top_performers)
-
-            # Create child through crossover
-            child = crossover(parent1, parent2)
+        offspring_count = len(self.agents) - ELITE_COUNT  # Total minus the 2 elites
+        if offspring is None:
+            offspring = self.breed(top_performers, offspring_count)
 
+        for child in offspring[:offspring_count]:
             # Give child proper name for new generation
             child.name = f"Agent {self.generation}.{len(new_agents)}"
-            child.fitness = -1  # Reset fitness for new tournament
-
-            # Apply mutation with slight probability
-            child.mutate()
-
             new_agents.append(child)
 
         # Update population
@@ -115,46 +160,44 @@ class Population:
             "worst": min(fitnesses),
         }
 
-    def generate_fitness_values(self, pgn_path: str):
+    def generate_fitness_values(
+        self,
+        pgn_path: str,
+        cached_results: Optional[dict[str, list[GameOutcome]]] = None,
+    ):
+        """
+        Fitness from the games in the pgn file plus the cached games of agents that were not
+        replayed, by agent name
+        """
         results: dict[str, float] = {}
 
-        with open(pgn_path, "r") as f:
-            game_count = 0
-
-            while True:
-                game_headers = chess.pgn.read_headers(f)
-
-                if not game_headers:
-                    break
-
-                game_count += 1
-                white_agent = game_headers["White"]
-                black_agent = game_headers["Black"]
-                results.setdefault(white_agent, 0)
-                results.setdefault(black_agent, 0)
-
-                def update_entry(key: str, score: str, turns: int):
-                    if score == "1":
-                        results[key] += 2
-                    elif score == "1/2":
-                        results[key] += 1
-                    elif score == "0":
-                        # if its a loss, give small amount of fitness for turns survived
-                        turns_for_draw = 400
-                        max_points = 0.7
-                        results[key] += (turns / (turns_for_draw - 1)) * max_points
-
-                    else:
-                        raise ValueError(f"unknown score ({score})")
-
-                white_score, black_score = game_headers["Result"].split("-")
-                turns = int(game_headers["PlyCount"])
-
-                update_entry(white_agent, white_score, turns)
-                update_entry(black_agent, black_score, turns)
-
-            for agent in self.agents:
-                if agent.name not in results:
-                    continue
-                agent.fitness = round(results[agent.name], 4)
-                print(f"{agent.name}: fitness = {agent.fitness}")
+        def update_entry(key: str, score: str, turns: int):
+            results[key] += game_fitness(score, turns)
+
+        for name, outcomes in (cached_results or {}).items():
+            results.setdefault(name, 0)
+            for outcome in outcomes:
+                update_entry(name, outcome.score, outcome.plies)
+
+        for white_agent, black_agent, result, turns in scan_headers(pgn_path):
+            results.setdefault(white_agent, 0)
+            results.setdefault(black_agent, 0)
+
+            white_score, black_score = result.split("-")
+
+            update_entry(white_agent, white_score, turns)
+            update_entry(black_agent, black_score, turns)
+
+        for agent in self.agents:
+            if agent.name not in results:
+                continue
+            agent.fitness = round(results[agent.name], 4)
+            print(f"{agent.name}: fitness = {agent.fitness}")
+
+    def apply_fitness(self, stream: FitnessStream):
+        """Set fitness from a stream that followed the tournament, instead of rereading its pgn"""
+        for agent in self.agents:
+            if not stream.games.get(agent.name) and agent.name not in stream.estimates:
+                continue
+            agent.fitness = round(stream.final_fitness(agent.name), 4)
+            print(f"{agent.name}: fitness = {agent.fitness}")
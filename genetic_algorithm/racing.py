@@ -0,0 +1,94 @@
+import math
+from statistics import NormalDist
+
+from fitness_stream import WIN_FITNESS, FitnessStream
+
+# chance that a confidence bound of one agent is wrong
+RACE_DELTA = 0.05
+# games an agent plays before it can be dropped
+RACE_MIN_GAMES = 4
+# lower limit of the per game score deviation, a few equal scores are not certain
+RACE_MIN_STD = 0.3
+
+
+class Race:
+    """
+    Racing of the population trial: agents play their schedule in rounds and an agent is
+    dropped once confidence bounds show pool_size other agents are better than it can be.
+    Fitness is estimated for the full schedule of games_per_agent games from the mean score
+    of the games played so far, bounded with the normal approximation of that mean
+    """
+
+    def __init__(
+        self,
+        stream: FitnessStream,
+        names: list[str],
+        pool_size: int,
+        delta: float = RACE_DELTA,
+    ):
+        self.stream = stream
+        self.contenders = list(names)
+        self.dropped: list[str] = []
+        self.pool_size = pool_size
+        self.z = NormalDist().inv_cdf(1 - delta / 2)
+
+    def estimate(self, name: str):
+        if not self.stream.games.get(name, 0):
+            return WIN_FITNESS * self.stream.games_per_agent / 2
+        return self.stream.final_fitness(name)
+
+    def bounds(self, name: str) -> tuple[float, float]:
+        """confidence interval of the agent's fitness over the full schedule"""
+        games = self.stream.games.get(name, 0)
+        full = self.stream.games_per_agent
+        if not games:
+            return 0.0, WIN_FITNESS * full
+        mean = self.stream.fitness[name] / games
+        variance = 0.0
+        if games > 1:
+            variance = (self.stream.squares[name] - games * mean**2) / (games - 1)
+        radius = self.z * max(math.sqrt(max(variance, 0.0)), RACE_MIN_STD)
+        radius /= math.sqrt(games)
+        return (
+            max(mean - radius, 0.0) * full,
+            min(mean + radius, WIN_FITNESS) * full,
+        )
+
+    def cut(self):
+        """estimated fitness of the last agent in the breeding pool"""
+        estimates = sorted(
+            (self.estimate(name) for name in self.contenders), reverse=True
+        )
+        return estimates[min(self.pool_size, len(estimates)) - 1]
+
+    def drop_losers(self) -> list[str]:
+        """drop the agents that can not reach the breeding pool any more"""
+        if len(self.contenders) <= self.pool_size:
+            return []
+        lows = sorted(
+            ((self.bounds(name)[0], name) for name in self.contenders), reverse=True
+        )
+        dropped = []
+        for name in self.contenders:
+            if self.stream.games.get(name, 0) < RACE_MIN_GAMES:
+                continue
+            # the pool_size-th best lower bound among the other agents
+            others = [low for low, other in lows if other != name]
+            if self.bounds(name)[1] < others[self.pool_size - 1]:
+                dropped.append(name)
+        # never drop into a pool smaller than pool_size
+        dropped.sort(key=self.estimate)
+        dropped = dropped[: len(self.contenders) - self.pool_size]
+        for name in dropped:
+            self.contenders.remove(name)
+        self.dropped += dropped
+        return dropped
+
+    def near_cut(self) -> list[str]:
+        """contenders whose confidence interval still contains the breeding pool cut"""
+        cut = self.cut()
+        return [
+            name
+            for name in self.contenders
+            if self.bounds(name)[0] <= cut <= self.bounds(name)[1]
+        ]
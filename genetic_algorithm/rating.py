@@ -0,0 +1,124 @@
+import math
+import statistics
+from typing import Iterable
+
+from fitness_stream import WIN_FITNESS
+
+# elo difference that makes the stronger agent ten times as likely to win
+ELO_SCALE = 400
+K = math.log(10) / ELO_SCALE
+# spread of the prior rating of an agent that has not played yet
+PRIOR_SD = 1000
+# standard deviations between a rating and the breeding pool cut for its side to be settled
+CUT_Z = 1.5
+NEWTON_STEPS = 20
+
+SCORES = {"1": 1.0, "1/2": 0.5, "0": 0.0}
+
+
+class RatingModel:
+    """
+    Bradley-Terry model on the elo scale over genetic and gomocup agents. Gomocup agents are
+    anchored at the elo of agents.json, other agents start from a gaussian prior around the
+    anchors and their rating is the maximum a posteriori fit of the games they played, with the
+    laplace approximation of its variance
+    """
+
+    def __init__(self, anchors: dict[str, float], prior_sd: float = PRIOR_SD):
+        self.anchors = dict(anchors)
+        self.prior_elo = statistics.median(anchors.values()) if anchors else 0.0
+        self.prior_sd = prior_sd
+        self.ratings: dict[str, float] = dict(anchors)
+        self.variances: dict[str, float] = {name: 0.0 for name in anchors}
+        # opponent and score of the games of every agent, from that agent's side
+        self.games: dict[str, list[tuple[str, float]]] = {}
+
+    def add_agent(self, name: str):
+        if name not in self.ratings:
+            self.ratings[name] = self.prior_elo
+            self.variances[name] = self.prior_sd**2
+
+    def add_result(self, name: str, opponent: str, score: str):
+        """score of agent name against opponent: "1", "1/2" or "0" """
+        self.add_agent(name)
+        self.add_agent(opponent)
+        self.games.setdefault(name, []).append((opponent, SCORES[score]))
+        self.games.setdefault(opponent, []).append((name, 1 - SCORES[score]))
+
+    def add_game(self, white: str, black: str, result: str):
+        self.add_result(white, black, result.split("-")[0])
+
+    def expected_score(self, name: str, opponent: str):
+        difference = self.ratings[opponent] - self.ratings[name]
+        return 1 / (1 + 10 ** (difference / ELO_SCALE))
+
+    def fit(self, sweeps: int = 3):
+        """newton steps on each rating in turn, the anchors stay where they are"""
+        names = [name for name in self.ratings if name not in self.anchors]
+        # with only anchored opponents one sweep already converges
+        for _ in range(sweeps):
+            for name in names:
+                self._fit_agent(name)
+
+    def _fit_agent(self, name: str):
+        prior_precision = 1 / self.prior_sd**2
+        for _ in range(NEWTON_STEPS):
+            gradient = -(self.ratings[name] - self.prior_elo) * prior_precision
+            information = prior_precision
+            for opponent, score in self.games.get(name, []):
+                p = self.expected_score(name, opponent)
+                gradient += K * (score - p)
+                information += K**2 * p * (1 - p)
+            step = gradient / information
+            self.ratings[name] += step
+            if abs(step) < 0.01:
+                break
+        self.variances[name] = 1 / information
+
+    def sd(self, name: str):
+        return math.sqrt(self.variances[name])
+
+    def game_information(self, name: str, opponent: str):
+        """fisher information of one game about the rating of name"""
+        p = self.expected_score(name, opponent)
+        return K**2 * p * (1 - p)
+
+    def settled(self, name: str, cut: float, z: float = CUT_Z):
+        """whether the rating is on one side of cut with confidence"""
+        return abs(self.ratings[name] - cut) > z * self.sd(name)
+
+    def information_gain(self, name: str, opponent: str):
+        """
+        expected entropy reduction, in nats, of the rating of name from one more game against
+        opponent: the fisher information of the game added to the precision of the rating
+        """
+        information = self.game_information(name, opponent)
+        return 0.5 * math.log(1 + self.variances[name] * information)
+
+    def best_opponent(self, name: str, opponents: Iterable[str]):
+        return max(
+            opponents, key=lambda opponent: self.information_gain(name, opponent)
+        )
+
+    def next_pairings(
+        self, names: Iterable[str], opponents: list[str]
+    ) -> list[tuple[str, str]]:
+        """
+        (agent, opponent) for every agent given, against the opponent that tells the most about
+        it, the most informative pairings first
+        """
+        pairings = []
+        for name in names:
+            opponent = self.best_opponent(name, opponents)
+            pairings.append((self.information_gain(name, opponent), name, opponent))
+        pairings.sort(reverse=True)
+        return [(name, opponent) for _, name, opponent in pairings]
+
+    def expected_fitness(
+        self, name: str, opponents: list[str], games_per_opponent: int
+    ):
+        """fitness of the full gauntlet expected from the rating, survival bonus left out"""
+        return sum(
+            games_per_opponent * WIN_FITNESS * self.expected_score(name, opponent)
+            for opponent in opponents
+        )
@@ -0,0 +1,236 @@
+import os
+import sys
+from datetime import date
+from typing import Callable, Optional, Sequence
+
+import numpy as np
+from agent import GeneticAgent
+from pydantic import BaseModel
+
+# genetic agents are played in process with the brain's own evaluation code
+BASE_BRAIN_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "base_brain"
+)
+sys.path.append(BASE_BRAIN_PATH)
+import evaluation  # noqa: E402
+import search  # noqa: E402
+import transposition  # noqa: E402
+
+COLUMNS = "abcdefghijklmnopqrstuvwxyz"
+BLACK, WHITE = 1, -1
+# plies genetic agents search in local games, the brain's search stopped at a fixed depth
+# instead of the clock. 0 plays the greedy move choice, a different player than the brain
+SEARCH_DEPTH = 2
+# a search without time limit, only stopped by its depth
+UNLIMITED_MS = 10**9
+
+
+def move_to_str(x: int, y: int):
+    """Move in PGN notation, column letter followed by 1 based row (j10)"""
+    return f"{COLUMNS[x]}{y + 1}"
+
+
+def move_from_str(move: str):
+    """(x, y) of a move in PGN notation"""
+    return COLUMNS.index(move[0]), int(move[1:]) - 1
+
+
+class GameRecord(BaseModel):
+    black: str
+    white: str
+    # result from white's perspective first, as in c-gomoku-cli PGN files
+    result: str
+    moves: list[tuple[int, int]] = []
+    board_size: int = 20
+    round: int = 1
+
+    @property
+    def ply_count(self):
+        return len(self.moves)
+
+    def to_pgn(self):
+        headers = {
+            "Event": "Local Tournament",
+            "Site": "?",
+            "Date": date.today().strftime("%Y.%m.%d"),
+            "Round": self.round,
+            "White": self.white,
+            "Black": self.black,
+            "Result": self.result,
+            "PlyCount": self.ply_count,
+            "BoardSize": self.board_size,
+        }
+        return self._pgn(headers, " ".join(self._movetext()))
+
+    def to_cli_pgn(self, event="1", termination="normal"):
+        """
+        The game with the tags c-gomoku-cli writes, in its order, and the movetext wrapped
+        at 80 columns like the cli. Used where files must look like the tournament's
+        """
+        headers = {
+            "Event": event,
+            "Date": date.today().strftime("%Y.%m.%d"),
+            "Round": f"{self.round}.1",
+            "Black": self.black,
+            "White": self.white,
+            "Result": self.result,
+            "Termination": termination,
+            "PlyCount": self.ply_count,
+        }
+        lines, line = [], ""
+        for token in self._movetext():
+            if line and len(line) + len(token) + 1 > 80:
+                lines.append(line)
+                line = token
+            else:
+                line = f"{line} {token}" if line else token
+        lines.append(line)
+        return self._pgn(headers, "\n".join(lines))
+
+    def _movetext(self):
+        movetext = []
+        for i, (x, y) in enumerate(self.moves):
+            if i % 2 == 0:
+                movetext.append(f"{i // 2 + 1}.")
+            movetext.append(move_to_str(x, y))
+        movetext.append(self.result)
+        return movetext
+
+    @staticmethod
+    def _pgn(headers: dict, movetext: str):
+        lines = [f'[{key} "{value}"]' for key, value in headers.items()]
+        return "\n".join(lines) + "\n\n" + movetext + "\n\n"
+
+
+def search_move(
+    board: np.ndarray,
+    table: np.ndarray,
+    aggression: float,
+    depth: int,
+    exact5=True,
+    tables: Optional[tuple] = None,
+):
+    """
+    brain_turn's move searched to depth, on a board from the mover's view. tables are the
+    transposition table and evaluation cache kept between the turns of a game, as the brain
+    keeps them
+    """
+    transpositions, evaluations = tables or (None, None)
+    searcher = search.Search(
+        table,
+        aggression,
+        search.TimeManager(UNLIMITED_MS, 0, 0),
+        exact5=exact5,
+        transpositions=transpositions,
+        evaluations=evaluations,
+    )
+    result = searcher.run(board, max_depth=depth)
+    if result is None:
+        # empty board, the brain plays the center
+        width, height = board.shape
+        return width // 2, height // 2
+    return result[0]
+
+
+def round_robin_pairings(agents: Sequence[GeneticAgent], games_per_pair: int):
+    """(black, white) pairs playing every pair of agents games_per_pair times, alternating colors"""
+    pairings = []
+    for i, first in enumerate(agents):
+        for second in agents[i + 1 :]:
+            for game in range(games_per_pair):
+                pairings.append((first, second) if game % 2 == 0 else (second, first))
+    return pairings
+
+
+def play_pairings(
+    board_size: int, seed: int, pairings: Sequence[tuple], depth=SEARCH_DEPTH
+):
+    """worker process: play one game per (black, white) pairing, returns the game records"""
+    referee = Referee(board_size=board_size, seed=seed, depth=depth)
+    return [referee.play(black, white) for black, white in pairings]
+
+
+class Referee:
+    """Plays genetic agents against each other in memory, without engine processes"""
+
+    def __init__(
+        self,
+        board_size=20,
+        exact5=True,
+        seed: Optional[int] = None,
+        depth=SEARCH_DEPTH,
+    ):
+        """depth is the plies genetic agents search, 0 plays the greedy move choice"""
+        self.board_size = board_size
+        self.exact5 = exact5
+        self.rng = np.random.default_rng(seed)
+        self.depth = depth
+
+    def brain(self, agent) -> Callable[[np.ndarray], tuple[int, int]]:
+        """
+        Move function of an agent for one game, from its own view of the board. Genetic
+        agents play the brain's search with their genome, other agents like the reference
+        agents bring their own move function
+        """
+        if isinstance(agent, GeneticAgent):
+            table = evaluation.build_pattern_table(agent.weights)
+            if not self.depth:
+                return lambda board: evaluation.choose_move(
+                    board, table, agent.weights[-1], self.rng
+                )
+            tables = transposition.create_tables(0, search.MAX_CANDIDATES)
+            return lambda board: search_move(
+                board, table, agent.weights[-1], self.depth, self.exact5, tables
+            )
+        return agent.game_brain(self.rng, self.exact5)
+
+    def play(self, black: GeneticAgent, white: GeneticAgent, round=1) -> GameRecord:
+        """Play one game, black moves first"""
+        board = np.zeros((self.board_size, self.board_size), dtype=int)
+        players = {BLACK: self.brain(black), WHITE: self.brain(white)}
+        record = GameRecord(
+            black=black.name,
+            white=white.name,
+            result="1/2-1/2",
+            board_size=self.board_size,
+            round=round,
+        )
+
+        color = BLACK
+        while record.ply_count < board.size:
+            x, y = players[color](board * color)
+            if board[x, y] != 0:
+                # an illegal move forfeits the game, as the tournament manager would
+                record.result = "1-0" if color == BLACK else "0-1"
+                break
+
+            board[x, y] = color
+            record.moves.append((x, y))
+            if evaluation.completes_five(board, x, y, color, self.exact5):
+                record.result = "0-1" if color == BLACK else "1-0"
+                break
+            color = -color
+
+        return record
+
+    def round_robin(
+        self,
+        agents: Sequence[GeneticAgent],
+        games_per_pair: int,
+        pgn_path: str,
+        on_game: Optional[Callable[[GameRecord], None]] = None,
+    ):
+        """
+        Play every pair of agents games_per_pair times alternating colors, appending to pgn_path.
+        on_game is called with every finished game, e.g. a FitnessStream's add_record
+        """
+        records = []
+        with open(pgn_path, "a") as f:
+            for black, white in round_robin_pairings(agents, games_per_pair):
+                record = self.play(black, white, round=len(records) + 1)
+                f.write(record.to_pgn())
+                f.flush()
+                records.append(record)
+                if on_game is not None:
+                    on_game(record)
+        return records
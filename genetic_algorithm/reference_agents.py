@@ -0,0 +1,162 @@
+"""
+Ladder of reference agents played in process by the referee, from a random player to a
+shallow search. Their elo offsets are measured from a round robin between them, with the
+default genome at 0, so that local fitness can be read against a known scale.
+
+    python reference_agents.py --games-per-pair 40
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Optional, Sequence
+
+import numpy as np
+from pydantic import BaseModel, PrivateAttr
+from rating import RatingModel
+from referee import play_pairings, round_robin_pairings, search_move
+
+# the reference agents play with the brain's own evaluation and search
+BASE_BRAIN_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "base_brain"
+)
+sys.path.append(BASE_BRAIN_PATH)
+import evaluation  # noqa: E402
+import search  # noqa: E402
+import transposition  # noqa: E402
+from structs import DEFAULT_GENOME  # noqa: E402
+
+RANDOM, GREEDY, GENOME, SEARCH = "random", "greedy", "genome", "search"
+# the default genome sits in the middle of the ladder, offsets are measured from it
+ANCHOR = "ref-genome"
+
+
+class ReferenceAgent(BaseModel):
+    name: str
+    # random, greedy, genome (the greedy move choice of the genome) or search
+    brain: str
+    weights: list[float] = list(DEFAULT_GENOME)
+    # plies searched by the search brain
+    depth: int = 2
+    # measured elo offset from the anchor
+    elo: float = 0
+    _table: Optional[np.ndarray] = PrivateAttr(default=None)
+
+    @property
+    def table(self):
+        if self._table is None:
+            self._table = evaluation.build_pattern_table(self.weights)
+        return self._table
+
+    def game_brain(
+        self, rng: np.random.Generator, exact5=True
+    ) -> Callable[[np.ndarray], tuple[int, int]]:
+        """move function for one game, a search keeps its tables between the turns"""
+        tables = None
+        if self.brain == SEARCH:
+            tables = transposition.create_tables(0, search.MAX_CANDIDATES)
+        return lambda board: self.move(board, rng, exact5, tables)
+
+    def move(
+        self,
+        board: np.ndarray,
+        rng: np.random.Generator,
+        exact5=True,
+        tables: Optional[tuple] = None,
+    ):
+        """
+        move on a board seen from this agent's side, 1 own stones and -1 the opponent's.
+        tables are the search tables of the game, see search_move
+        """
+        width, height = board.shape
+        candidates = evaluation.relevant_points(board) & (board == 0)
+        if not candidates.any():
+            return width // 2, height // 2
+
+        if self.brain == RANDOM:
+            # like example.py, but only next to the stones
+            xs, ys = np.nonzero(candidates)
+            i = rng.choice(len(xs))
+            return int(xs[i]), int(ys[i])
+        if self.brain == GREEDY:
+            # only its own lines count, threats of the opponent are ignored
+            return evaluation.choose_move(board, self.table, 1.0, rng)
+        if self.brain == GENOME:
+            return evaluation.choose_move(board, self.table, self.weights[-1], rng)
+        if self.brain == SEARCH:
+            return search_move(
+                board, self.table, self.weights[-1], self.depth, exact5, tables
+            )
+        raise ValueError(f"unknown reference brain {self.brain}")
+
+
+# elo offsets from calibrate with 80 games per pair on a 20x20 board. The random agent lost
+# and the depth 4 search won (almost) every game, their offsets are bounds
+LADDER = [
+    ReferenceAgent(name="ref-random", brain=RANDOM, elo=-1277),
+    ReferenceAgent(name="ref-greedy", brain=GREEDY, elo=-198),
+    ReferenceAgent(name="ref-genome", brain=GENOME, elo=0),
+    ReferenceAgent(name="ref-search2", brain=SEARCH, depth=2, elo=281),
+    ReferenceAgent(name="ref-search4", brain=SEARCH, depth=4, elo=1052),
+]
+
+
+def calibrate(
+    ladder: Sequence[ReferenceAgent],
+    games_per_pair: int,
+    board_size=20,
+    workers: Optional[int] = None,
+    seed=0,
+    anchor: str = ANCHOR,
+) -> RatingModel:
+    """
+    Rating model fit to a round robin between the agents of the ladder, with the anchor at 0
+    and enough sweeps to fit all other agents together. An agent that wins or loses every
+    game is only held by the prior of the model, its offset is a bound
+    """
+    pairings = round_robin_pairings(ladder, games_per_pair)
+    chunks = [
+        pairings[i : i + games_per_pair]
+        for i in range(0, len(pairings), games_per_pair)
+    ]
+    model = RatingModel({anchor: 0.0})
+    with ProcessPoolExecutor(workers) as executor:
+        futures = [
+            executor.submit(play_pairings, board_size, seed + i, chunk)
+            for i, chunk in enumerate(chunks)
+        ]
+        for future in futures:
+            for record in future.result():
+                model.add_game(record.white, record.black, record.result)
+    model.fit(sweeps=50)
+    return model
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--games-per-pair", type=int, default=40)
+    parser.add_argument("--board-size", type=int, default=20)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.time()
+    model = calibrate(
+        LADDER, args.games_per_pair, args.board_size, args.workers, args.seed
+    )
+    print(f"Calibrated {len(LADDER)} reference agents in {time.time() - start:.2f}s")
+    for agent in LADDER:
+        games = model.games[agent.name]
+        score = sum(score for _, score in games) / len(games)
+        print(
+            f"  {agent.name}: {model.ratings[agent.name]:+.0f} (ladder {agent.elo:+.0f}),"
+            f" scored {score:.1%} of {len(games)} games"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+"""
+Move agreement surrogate fitness. Positions where a gomocup engine was to move are mined
+from the tournament pgn files once, each with the engine's reply, into a compact corpus.
+A genome then scores the share of those positions where the brain picks the engine's move,
+which takes seconds instead of a gauntlet.
+
+    python surrogate.py mine log/results.pgn log/shards/*.pgn
+    python surrogate.py score --population log/generations/final_population_gen5.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from typing import Iterable, Optional, Sequence
+
+import numpy as np
+from agent import GomocupAgent
+from pgn_scan import scan_games
+from referee import evaluation
+
+CORPUS_PATH = "./log/surrogate_corpus.npz"
+CORPUS_VERSION = 1
+# positions scored together in one pass of the evaluator
+CHUNK_SIZE = 512
+
+
+def mine_positions(
+    pgn_paths: Iterable[str],
+    engines: set[str],
+    board_size=20,
+    max_positions: Optional[int] = None,
+):
+    """
+    Moves of every game with an engine move and the (game, ply) of each position where an
+    engine moved, the first time the position is seen. The empty board is left out, every
+    genome opens in the center
+    """
+    moves: list[tuple[int, int]] = []
+    game_starts: list[int] = []
+    positions: list[tuple[int, int]] = []
+    seen: set[bytes] = set()
+    games = 0
+
+    for pgn_path in pgn_paths:
+        for headers, game_moves in scan_games(pgn_path):
+            games += 1
+            if int(headers.get("BoardSize", board_size)) != board_size:
+                continue
+            # black moves first
+            players = [headers.get("Black"), headers.get("White")]
+            if not engines.intersection(players):
+                continue
+
+            board = np.zeros((board_size, board_size), dtype=np.int8)
+            game = len(game_starts)
+            mined = []
+            legal = 0
+            for ply, (x, y) in enumerate(game_moves):
+                if not (0 <= x < board_size and 0 <= y < board_size) or board[x, y]:
+                    break
+                legal += 1
+                color = 1 if ply % 2 == 0 else -1
+                if ply > 0 and players[ply % 2] in engines:
+                    # positions are kept from the view of the side to move
+                    key = (board * color).tobytes()
+                    if key not in seen:
+                        seen.add(key)
+                        mined.append((game, ply))
+                board[x, y] = color
+
+            if mined:
+                game_starts.append(len(moves))
+                moves.extend(game_moves[:legal])
+                positions.extend(mined)
+            if max_positions is not None and len(positions) >= max_positions:
+                positions = positions[:max_positions]
+                print(f"Stopped after {max_positions} positions")
+                return moves, game_starts, positions, games
+
+    return moves, game_starts, positions, games
+
+
+def save_corpus(
+    path: str,
+    moves: Sequence[tuple[int, int]],
+    game_starts: Sequence[int],
+    positions: Sequence[tuple[int, int]],
+    board_size=20,
+):
+    """
+    The corpus keeps the moves of the mined games and a (game, ply) row per position, the
+    reply is the move at that ply. Boards are rebuilt when the corpus is loaded
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    np.savez_compressed(
+        path,
+        version=CORPUS_VERSION,
+        board_size=board_size,
+        moves=np.array(moves, dtype=np.uint8).reshape(-1, 2),
+        game_starts=np.array(game_starts, dtype=np.int64),
+        positions=np.array(positions, dtype=np.int32).reshape(-1, 2),
+    )
+
+
+class Corpus:
+    """boards from the view of the side to move, with the engine's (x, y) reply on each"""
+
+    def __init__(self, boards: np.ndarray, replies: np.ndarray):
+        self.boards = boards
+        self.replies = replies
+
+    def __len__(self):
+        return len(self.boards)
+
+    @classmethod
+    def load(cls, path: str = CORPUS_PATH):
+        with np.load(path) as data:
+            if int(data["version"]) != CORPUS_VERSION:
+                raise ValueError(
+                    f"corpus version {int(data['version'])} is not {CORPUS_VERSION},"
+                    " mine the positions again"
+                )
+            size = int(data["board_size"])
+            moves = data["moves"].astype(np.intp)
+            game_starts = data["game_starts"]
+            positions = data["positions"]
+
+        boards = np.zeros((len(positions), size, size), dtype=np.int8)
+        replies = np.zeros((len(positions), 2), dtype=np.intp)
+        for row, (game, ply) in enumerate(positions):
+            start = game_starts[game]
+            played = moves[start : start + ply]
+            # stones of the side to move are 1, black played the even plies
+            colors = np.where(np.arange(ply) % 2 == ply % 2, 1, -1)
+            boards[row, played[:, 0], played[:, 1]] = colors
+            replies[row] = moves[start + ply]
+        return cls(boards, replies)
+
+
+def agreement(corpus: Corpus, weights: Sequence[float], chunk_size=CHUNK_SIZE):
+    """
+    Share of the corpus positions where the brain's move choice is the engine's reply.
+    The brain picks randomly among equal best points, a tie counts as the chance of picking
+    the reply, and a board where nothing stands out gets the center like choose_move
+    """
+    if not len(corpus):
+        return 0.0
+    table = evaluation.build_pattern_table(weights)
+    aggression = weights[-1]
+    total = 0.0
+    for start in range(0, len(corpus), chunk_size):
+        boards = corpus.boards[start : start + chunk_size].astype(int)
+        xs, ys = corpus.replies[start : start + chunk_size].T
+        rows = np.arange(len(boards))
+        candidates = evaluation.relevant_points(boards) & (boards == 0)
+        totals = evaluation.total_scores(
+            evaluation.score_board(boards, table),
+            evaluation.score_board(boards, table, player=-1),
+            candidates,
+            aggression,
+        )
+
+        flat = totals.reshape(len(boards), -1)
+        maxima = flat.max(axis=1)
+        best = flat == maxima[:, None]
+        hits = best[rows, xs * boards.shape[2] + ys] / best.sum(axis=1)
+        # every point scores the same
+        undecided = maxima == flat.min(axis=1)
+        _, width, height = boards.shape
+        center = (xs == width // 2) & (ys == height // 2)
+        total += np.where(undecided, center, hits).sum()
+    return float(total / len(corpus))
+
+
+# corpus of each worker process, loaded once by the pool initializer
+_worker_corpus: Optional[Corpus] = None
+
+
+def _load_worker(corpus_path: str):
+    global _worker_corpus
+    _worker_corpus = Corpus.load(corpus_path)
+
+
+def _worker_agreement(weights: list[float]):
+    return agreement(_worker_corpus, weights)
+
+
+class SurrogateEvaluator:
+    """
+    Scores batches of genomes by move agreement over a pool of processes, each with its
+    own copy of the corpus
+    """
+
+    def __init__(self, corpus_path: str = CORPUS_PATH, processes: Optional[int] = None):
+        self.corpus_path = corpus_path
+        self.processes = processes or os.cpu_count() or 1
+        self.pool = multiprocessing.Pool(
+            self.processes, initializer=_load_worker, initargs=(corpus_path,)
+        )
+
+    def score(self, genomes: Sequence[Sequence[float]]) -> list[float]:
+        """agreement of every genome, in order"""
+        return self.pool.map(_worker_agreement, [list(genome) for genome in genomes])
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    subparsers = parser.add_subparsers(dest="mode", required=True)
+    mine = subparsers.add_parser("mine", help="mine engine replies from pgn files")
+    mine.add_argument("pgn", nargs="+")
+    mine.add_argument("--agents", default="gomocup_agents/agents.json")
+    mine.add_argument(
+        "--min-elo", type=int, default=0, help="only replies of engines this strong"
+    )
+    mine.add_argument("--max-positions", type=int)
+    mine.add_argument("--board-size", type=int, default=20)
+    mine.add_argument("--corpus", default=CORPUS_PATH)
+
+    score = subparsers.add_parser("score", help="score genomes by move agreement")
+    score.add_argument("--population", help="json list of genetic agents")
+    score.add_argument("--corpus", default=CORPUS_PATH)
+    score.add_argument("--processes", type=int)
+    args = parser.parse_args()
+
+    if args.mode == "mine":
+        with open(args.agents) as f:
+            engines = {
+                agent.name
+                for agent in (GomocupAgent(**entry) for entry in json.load(f))
+                if agent.elo >= args.min_elo
+            }
+        start = time.time()
+        moves, game_starts, positions, games = mine_positions(
+            args.pgn, engines, args.board_size, args.max_positions
+        )
+        save_corpus(args.corpus, moves, game_starts, positions, args.board_size)
+        print(
+            f"Mined {len(positions)} positions from {len(game_starts)} of {games} games"
+            f" in {time.time() - start:.2f}s, corpus {args.corpus}"
+            f" ({os.path.getsize(args.corpus)} bytes)"
+        )
+        return
+
+    with open(args.population) as f:
+        agents = json.load(f)
+    start = time.time()
+    with SurrogateEvaluator(args.corpus, args.processes) as evaluator:
+        scores = evaluator.score([agent["weights"] for agent in agents])
+    print(f"Scored {len(agents)} genomes in {time.time() - start:.2f}s")
+    ranked = sorted(zip(scores, agents), key=lambda entry: entry[0], reverse=True)
+    for i, (value, agent) in enumerate(ranked):
+        print(
+            f"{i}. {agent['name']}: agreement {value:.4f}, fitness {agent['fitness']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import json
+import os
+import time
+from typing import Optional
+
+TELEMETRY_PATH = "./log/telemetry.jsonl"
+
+
+def cpu_seconds():
+    """
+    cpu time of this process and of its children that finished, which includes the cli and
+    its engines on posix. Windows does not report children, only this process is counted
+    """
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+class Timer:
+    """wall and cpu time since it was made"""
+
+    def __init__(self):
+        self.wall = time.perf_counter()
+        self.cpu = cpu_seconds()
+
+    def elapsed(self):
+        return time.perf_counter() - self.wall
+
+    def fields(self, games: Optional[int] = None) -> dict:
+        """
+        wall and cpu seconds, and cpu utilization as the share of all cores that was busy,
+        with the games/sec of games when given
+        """
+        wall = self.elapsed()
+        cpu = cpu_seconds() - self.cpu
+        fields = {
+            "wall_s": round(wall, 3),
+            "cpu_s": round(cpu, 3),
+            "cpu_utilization": (
+                round(cpu / (wall * (os.cpu_count() or 1)), 4) if wall > 0 else 0.0
+            ),
+        }
+        if games is not None:
+            fields["games"] = games
+            fields["games_per_sec"] = round(games / wall, 3) if wall > 0 else 0.0
+        return fields
+
+
+class Telemetry:
+    """
+    Structured records of a run, one json object per line: "generation" records of the
+    generation loop, "trial" records of population trials and "job" records of every
+    gauntlet or round robin. Every record has its kind, the run it belongs to and the time
+    it was written
+    """
+
+    def __init__(self, path: str = TELEMETRY_PATH, run: Optional[str] = None):
+        self.path = path
+        self.run = run or time.strftime("%Y%m%d-%H%M%S")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def record(self, kind: str, **fields):
+        entry = {"kind": kind, "run": self.run, "time": round(time.time(), 3)}
+        entry.update(fields)
+        # appended and closed right away, the records before a crash are kept
+        with open(self.path, "a") as f:
+            f.write(json.dumps(entry) + "\n")
@@ -0,0 +1,149 @@
+"""
+Report of the telemetry of a run: a row per generation with its throughput and where its
+time went, the throughput trend over the run, and the slowest generations and jobs.
+
+    python telemetry_report.py
+    python telemetry_report.py log/telemetry.jsonl --run 20260101-120000 --json report.json
+"""
+
+import argparse
+import json
+from typing import Optional
+
+from telemetry import TELEMETRY_PATH
+
+
+def read_records(path: str):
+    records = []
+    with open(path) as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                # the last line of a run killed while writing it
+                continue
+    return records
+
+
+def mean(values: list[float]):
+    return sum(values) / len(values) if values else 0.0
+
+
+def report(records: list[dict], run: Optional[str] = None, slowest=5):
+    """summary of the records of a run, the last run in the file by default"""
+    if run is None:
+        run = records[-1]["run"]
+    records = [record for record in records if record["run"] == run]
+    generations = [record for record in records if record["kind"] == "generation"]
+    jobs = [record for record in records if record["kind"] == "job"]
+
+    # throughput of the first quarter of the generations against the last quarter
+    quarter = max(len(generations) // 4, 1)
+    first = mean([record["games_per_sec"] for record in generations[:quarter]])
+    last = mean([record["games_per_sec"] for record in generations[-quarter:]])
+
+    job_types: dict[str, list[dict]] = {}
+    for job in jobs:
+        job_types.setdefault(job["job"], []).append(job)
+
+    return {
+        "run": run,
+        "generations": [
+            {
+                key: record.get(key)
+                for key in (
+                    "generation",
+                    "wall_s",
+                    "games",
+                    "games_per_sec",
+                    "cpu_utilization",
+                    "evaluation_s",
+                    "evolve_s",
+                    "parse_s",
+                    "best",
+                    "average",
+                )
+            }
+            for record in generations
+        ],
+        "trend": {
+            "first_games_per_sec": round(first, 3),
+            "last_games_per_sec": round(last, 3),
+            "change": round(last / first - 1, 4) if first else None,
+        },
+        "slowest_generations": sorted(
+            generations, key=lambda record: record["wall_s"], reverse=True
+        )[:slowest],
+        "jobs": {
+            job_type: {
+                "count": len(records),
+                "games": sum(record["games"] for record in records),
+                "mean_games_per_sec": round(
+                    mean([record["games_per_sec"] for record in records]), 3
+                ),
+                "min_games_per_sec": min(record["games_per_sec"] for record in records),
+            }
+            for job_type, records in sorted(job_types.items())
+        },
+        "slowest_jobs": sorted(jobs, key=lambda job: job["wall_s"], reverse=True)[
+            :slowest
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("path", nargs="?", default=TELEMETRY_PATH)
+    parser.add_argument("--run", help="the run to report, the last one by default")
+    parser.add_argument("--slowest", type=int, default=5)
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    records = read_records(args.path)
+    if not records:
+        raise SystemExit(f"no telemetry in {args.path}")
+    summary = report(records, args.run, args.slowest)
+
+    print(f"Run {summary['run']}, {len(summary['generations'])} generations")
+    print(
+        "  gen     wall   games  games/s    cpu    eval  evolve   parse      best   average"
+    )
+    for row in summary["generations"]:
+        print(
+            f"  {row['generation']:3} {row['wall_s']:8.1f} {row['games']:7}"
+            f" {row['games_per_sec']:8.2f} {row['cpu_utilization']:6.1%}"
+            f" {row['evaluation_s']:7.1f} {row['evolve_s']:7.2f} {row['parse_s']:7.2f}"
+            f" {row['best']:9.2f} {row['average']:9.2f}"
+        )
+    trend = summary["trend"]
+    if trend["change"] is not None:
+        print(
+            f"games/sec went from {trend['first_games_per_sec']} in the first quarter of"
+            f" the run to {trend['last_games_per_sec']} in the last ({trend['change']:+.1%})"
+        )
+    print("slowest generations:")
+    for record in summary["slowest_generations"]:
+        print(f"  generation {record['generation']}: {record['wall_s']}s")
+    print("jobs:")
+    for job_type, values in summary["jobs"].items():
+        print(
+            f"  {job_type:18} n={values['count']:5}  games={values['games']:7}"
+            f"  mean {values['mean_games_per_sec']:.2f} games/sec,"
+            f" min {values['min_games_per_sec']:.2f}"
+        )
+    print("slowest jobs:")
+    for job in summary["slowest_jobs"]:
+        print(
+            f"  {job['label']} (generation {job.get('generation')}): {job['wall_s']}s,"
+            f" {job['games_per_sec']} games/sec"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,25 @@
+import glob
 import os
 import random
+import shutil
 import subprocess
-import time
-from typing import Sequence
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Optional, Sequence
 
 from agent import Agent, GeneticAgent, GomocupAgent
+from batch_sim import BatchSimulator
+from fitness_cache import NO_OPENING, CacheKey, FitnessCache, GameOutcome
+from fitness_stream import FitnessStream
+from orchestrator import Job, Orchestrator
 from population import Population
+from referee import SEARCH_DEPTH, Referee, play_pairings, round_robin_pairings
+from telemetry import Telemetry, Timer
+from trials import GauntletTrial, PopulationTrial, ShardedTrial
 
 GOMOKU_CLI_PATH = "c-gomoku-cli.exe"
 AGENT_FOLDER_PATH = "./gomocup_agents/"
+LOG_FOLDER_PATH = "./log/"
 
 
 def _agent_to_params(agent: Agent):
@@ -29,14 +40,77 @@ def _agent_to_params(agent: Agent):
 
 
 class Tournament:
-    def __init__(self):
+    def __init__(self, log_folder: str = LOG_FOLDER_PATH):
+        # pgn files, shards and logs of this tournament
+        self.log_folder = log_folder
+        self.shard_folder = os.path.join(log_folder, "shards")
         self.time_per_turn = 5
         self.time_per_game = 180
         self.games_per_pair = 2
         self.concurrency = 16
-        self.pgn_path = "./log/results.pgn"
+        self.board_size = 20
+        self.cli_path = GOMOKU_CLI_PATH
+        # cli runs in flight at once, sharing the concurrency slots through the orchestrator
+        self.jobs_in_flight = 1
+        # an orchestrated gauntlet is split in runs of this many agents, None for runs of
+        # about trials.JOB_ROUNDS games per slot
+        self.agents_per_job: Optional[int] = None
+        self.pgn_path = os.path.join(log_folder, "results.pgn")
+        # play genetic agents against each other in process instead of through the cli
+        self.local_games = False
+        # plies genetic agents search in in process games, 0 plays the greedy move choice
+        self.local_depth = SEARCH_DEPTH
+        # how the population trial is played, see trials.py
+        self.trial: PopulationTrial = GauntletTrial()
+        # processes of the sharded, racing, scheduled and local trials
+        self.workers = os.cpu_count()
+        # population trial games already played by the same genome are not replayed
+        self.fitness_cache: Optional[FitnessCache] = FitnessCache(
+            os.path.join(log_folder, "fitness_cache.jsonl")
+        )
+        self.opening = NO_OPENING
+        # cached games standing in for the trial games that were not played, by agent name
+        self.cached_results: dict[str, list[GameOutcome]] = {}
+        # agents waiting for the games of an agent with the same genome
+        self.deferred: list[tuple[GeneticAgent, CacheKey]] = []
+        # games of the running trial already added to the fitness cache
+        self._recorded = 0
+        # the next population trial continues one that was interrupted, a trial that plays
+        # whole pairs is sharded instead so that no cached game of a partly played pair is
+        # replayed
+        self.resume_trial = False
+        # jsonl records of every population trial and gauntlet or round robin job
+        self.telemetry: Optional[Telemetry] = None
 
-    def _new_pgn_file(self, name: str):
+    def record_telemetry(self, kind: str, **fields):
+        if self.telemetry is not None:
+            self.telemetry.record(kind, **fields)
+
+    def _record_trial_telemetry(
+        self,
+        population: Population,
+        mode: str,
+        opponents: int,
+        stream: FitnessStream,
+        timer: Timer,
+        cached_games=0,
+    ):
+        self.record_telemetry(
+            "trial",
+            generation=population.generation,
+            mode=mode,
+            agents=len(population.agents),
+            opponents=opponents,
+            cached_games=cached_games,
+            parse_s=round(stream.parse_time, 3),
+            **timer.fields(len(stream.results)),
+        )
+
+    @property
+    def time_control(self):
+        return f"{self.time_per_game}/{self.time_per_turn}"
+
+    def new_pgn_file(self, name: str):
         self.pgn_path = name
         if os.path.exists(self.pgn_path):
             os.remove(self.pgn_path)
@@ -44,46 +118,78 @@ class Tournament:
     def _pre_engine_params(self) -> list[str]:
         return [
             "-each",
-            f"tc={self.time_per_game}/{self.time_per_turn}",
+            f"tc={self.time_control}",
             "tolerance=20",
         ]
 
-    def _post_engine_params(self) -> list[str]:
+    def _post_engine_params(
+        self, concurrency: Optional[int] = None, pgn_path: Optional[str] = None
+    ) -> list[str]:
         # delete results.pgn file since cli program will append
         return [
             "-boardsize",
-            "20",
+            f"{self.board_size}",
             "-concurrency",
-            f"{self.concurrency}",
+            f"{concurrency or self.concurrency}",
             "-games",
             f"{self.games_per_pair}",
             "-pgn",
-            self.pgn_path,
+            pgn_path or self.pgn_path,
         ]
 
-    def round_robin(self, agents: Sequence[Agent]):
-        command: list[str] = [GOMOKU_CLI_PATH]
+    def _round_robin_command(
+        self,
+        agents: Sequence[Agent],
+        concurrency: Optional[int] = None,
+        pgn_path: Optional[str] = None,
+    ) -> list[str]:
+        command: list[str] = [self.cli_path]
         command += self._pre_engine_params()
 
         for agent in agents:
             command += _agent_to_params(agent)
 
-        command += self._post_engine_params()
-        result = subprocess.run(command, stdout=subprocess.DEVNULL)
-
-        result.check_returncode()
+        command += self._post_engine_params(concurrency, pgn_path)
+        return command
 
-    def gauntlet(self, main_agent: Agent, population: Sequence[Agent]):
-        command: list[str] = [GOMOKU_CLI_PATH]
+    def gauntlet_command(
+        self,
+        main_agent: Agent,
+        population: Sequence[Agent],
+        concurrency: Optional[int] = None,
+        pgn_path: Optional[str] = None,
+    ) -> list[str]:
+        command: list[str] = [self.cli_path]
         command += self._pre_engine_params()
 
         command += _agent_to_params(main_agent)
         for agent in population:
             command += _agent_to_params(agent)
 
-        command += self._post_engine_params()
+        command += self._post_engine_params(concurrency, pgn_path)
         command.append("-gauntlet")
+        return command
+
+    def job_slots(self, runs: Optional[int] = None):
+        """concurrency of one cli run when jobs_in_flight runs, or all runs, share the slots"""
+        in_flight = min(self.jobs_in_flight, runs or self.jobs_in_flight)
+        return max(self.concurrency // in_flight, 1)
+
+    def job_pgn_path(self, index: int):
+        return os.path.join(self.shard_folder, f"job_{index:03}.pgn")
+
+    def round_robin(self, agents: Sequence[Agent]):
+        command = self._round_robin_command(agents)
+        result = subprocess.run(command, stdout=subprocess.DEVNULL)
+
+        result.check_returncode()
+
+    def local_round_robin(self, agents: Sequence[GeneticAgent]):
+        referee = Referee(board_size=self.board_size, depth=self.local_depth)
+        referee.round_robin(agents, self.games_per_pair, self.pgn_path)
 
+    def gauntlet(self, main_agent: Agent, population: Sequence[Agent]):
+        command = self.gauntlet_command(main_agent, population)
         result = subprocess.run(command, stdout=subprocess.DEVNULL)
         result.check_returncode()
 
@@ -100,29 +206,320 @@ class Tournament:
             ]
         return groups
 
-    def population_trial(
-        self, population: Population, gomocup_agents: list[GomocupAgent]
+    def cache_key(self, agent: GeneticAgent, opponent: GomocupAgent):
+        return FitnessCache.key(
+            agent.weights,
+            opponent.name,
+            self.time_control,
+            self.board_size,
+            self.opening,
+        )
+
+    def plan_trial(
+        self,
+        population: Population,
+        gomocup_agents: list[GomocupAgent],
+        stream: FitnessStream,
+        whole_pairs: bool,
+    ) -> dict[str, list[tuple[GeneticAgent, int]]]:
+        """
+        Games of the population trial still to be played as {opponent name: [(agent, first game
+        index)]}, the cached games standing in for the others are collected in cached_results
+        and added to the stream. With whole_pairs a pair is replayed completely unless all of
+        its games are cached
+        """
+        self.cached_results = {}
+        self.deferred = []
+        plan: dict[str, list[tuple[GeneticAgent, int]]] = {}
+        reused = 0
+        for opponent in gomocup_agents:
+            plan[opponent.name] = []
+            scheduled: set[CacheKey] = set()
+            for agent in population.agents:
+                if self.fitness_cache is None:
+                    plan[opponent.name].append((agent, 0))
+                    continue
+
+                key = self.cache_key(agent, opponent)
+                cached = self.fitness_cache.outcomes(key, self.games_per_pair)
+                if whole_pairs and len(cached) < self.games_per_pair:
+                    cached = []
+                if len(cached) < self.games_per_pair and key in scheduled:
+                    # a clone in this population plays the games for both
+                    self.deferred.append((agent, key))
+                    continue
+
+                self.cached_results.setdefault(agent.name, []).extend(cached)
+                for outcome in cached:
+                    stream.add_outcome(agent.name, outcome)
+                reused += len(cached)
+                if len(cached) < self.games_per_pair:
+                    scheduled.add(key)
+                    plan[opponent.name].append((agent, len(cached)))
+
+        if self.fitness_cache is not None:
+            print(
+                f"Fitness cache: reusing {reused} games, {len(self.deferred)} pairs wait for a clone"
+            )
+        return plan
+
+    def _record_games(
+        self,
+        population: Population,
+        gomocup_agents: list[GomocupAgent],
+        stream: FitnessStream,
     ):
-        """run a tournament where each genetic agents plays each gomocup agent some number of times"""
+        """add the games the stream read since the last call to the fitness cache"""
+        if self.fitness_cache is None:
+            return
+
+        agents = {agent.name: agent for agent in population.agents}
+        opponents = {agent.name: agent for agent in gomocup_agents}
+        games: list[tuple[CacheKey, GameOutcome]] = []
+        new_results = stream.results[self._recorded :]
+        self._recorded += len(new_results)
+        for white, black, result, plies in new_results:
+            white_score, black_score = result.split("-")
+            for name, opponent, score in (
+                (white, black, white_score),
+                (black, white, black_score),
+            ):
+                if name in agents and opponent in opponents:
+                    key = self.cache_key(agents[name], opponents[opponent])
+                    games.append((key, GameOutcome(score=score, plies=plies)))
+        self.fitness_cache.add(games)
+
+    def record_trial(
+        self,
+        population: Population,
+        gomocup_agents: list[GomocupAgent],
+        stream: FitnessStream,
+    ):
+        """add the last games of the trial to the fitness cache, then score deferred clones"""
+        self._record_games(population, gomocup_agents, stream)
+        if self.fitness_cache is None:
+            return
+
+        for agent, key in self.deferred:
+            outcomes = self.fitness_cache.outcomes(key, self.games_per_pair)
+            self.cached_results.setdefault(agent.name, []).extend(outcomes)
+            for outcome in outcomes:
+                stream.add_outcome(agent.name, outcome)
+
+    def play_following(
+        self,
+        play: Callable[[], None],
+        pattern: str,
+        stream: FitnessStream,
+        on_update: Optional[Callable[[FitnessStream], None]],
+    ):
+        """run play on a thread while the stream reads the games it writes to pattern"""
+        errors: list[BaseException] = []
+
+        def run():
+            try:
+                play()
+            except BaseException as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        stream.follow(pattern, lambda: not thread.is_alive(), on_update)
+        thread.join()
+        if errors:
+            raise errors[0]
+
+    def population_trial(
+        self,
+        population: Population,
+        gomocup_agents: list[GomocupAgent],
+        on_update: Optional[Callable[[FitnessStream], None]] = None,
+    ) -> FitnessStream:
+        """
+        run a tournament where each genetic agents plays each gomocup agent some number of times,
+        played by the trial strategy. Fitness is accumulated while the games are played,
+        on_update is called with the stream whenever new games were read. Games go to the fitness cache as soon as they are read,
+        so a trial that crashes is resumed without replaying them
+        """
 
-        self._new_pgn_file("./log/population_trial.pgn")
+        trial = self.trial
+        if self.resume_trial and not trial.single_games:
+            trial = ShardedTrial()
+        self.resume_trial = False
+        stream = FitnessStream(
+            [agent.name for agent in population.agents],
+            len(gomocup_agents) * self.games_per_pair,
+            racing=trial.estimates_fitness,
+        )
+        self._recorded = 0
 
-        for i, gomocup_agent in enumerate(gomocup_agents):
-            start = time.time()
-            print(f"Gauntlet {i + 1}/{len(gomocup_agents)} vs {gomocup_agent.name}")
-            self.gauntlet(gomocup_agent, population.agents)
-            print(f"completed in {round(time.time() - start, 2)}")
+        def update(stream: FitnessStream):
+            self._record_games(population, gomocup_agents, stream)
+            if on_update is not None:
+                on_update(stream)
+
+        timer = Timer()
+        trial.play(self, population, gomocup_agents, stream, update)
+        self._record_trial_telemetry(
+            population,
+            trial.mode,
+            len(gomocup_agents),
+            stream,
+            timer,
+            sum(len(outcomes) for outcomes in self.cached_results.values()),
+        )
+        return stream
+
+    def local_population_trial(
+        self,
+        population: Population,
+        opponents: Sequence,
+        on_update: Optional[Callable[[FitnessStream], None]] = None,
+    ) -> FitnessStream:
+        """
+        population trial against opponents played in process, like the reference agents,
+        by referees on a process pool. Each agent plays every opponent games_per_pair times
+        with the opponent first on even games, as in the gauntlets
+        """
+        stream = FitnessStream(
+            [agent.name for agent in population.agents],
+            len(opponents) * self.games_per_pair,
+        )
+        # local games are not cached, an interrupted local trial is played again
+        self.resume_trial = False
+        self.new_pgn_file(os.path.join(self.log_folder, "local_trial.pgn"))
+        pairs = [
+            [
+                (opponent, agent) if game % 2 == 0 else (agent, opponent)
+                for game in range(self.games_per_pair)
+            ]
+            for opponent in opponents
+            for agent in population.agents
+        ]
+
+        timer = Timer()
+        with ProcessPoolExecutor(self.workers) as executor, open(
+            self.pgn_path, "a"
+        ) as f:
+            futures = [
+                executor.submit(
+                    play_pairings,
+                    self.board_size,
+                    random.getrandbits(32),
+                    pairings,
+                    self.local_depth,
+                )
+                for pairings in pairs
+            ]
+            for future in as_completed(futures):
+                for record in future.result():
+                    f.write(record.to_pgn())
+                    stream.add_record(record)
+                f.flush()
+                if on_update is not None:
+                    on_update(stream)
+
+        elapsed = timer.elapsed()
+        print(
+            f"Local trial of {len(stream.results)} games vs {len(opponents)} opponents"
+            f" completed in {round(elapsed, 2)} ({round(len(stream.results) / elapsed, 2)}"
+            " games/sec)"
+        )
+        self._record_trial_telemetry(population, "local", len(opponents), stream, timer)
+        return stream
+
+    def _single_game_command(self, first: Agent, second: Agent) -> list[str]:
+        """cli command playing one game, first agent moves first"""
+        command: list[str] = [self.cli_path]
+        command += self._pre_engine_params()
+        command += _agent_to_params(first)
+        command += _agent_to_params(second)
+        command += [
+            "-boardsize",
+            f"{self.board_size}",
+            "-concurrency",
+            "1",
+            "-games",
+            "1",
+        ]
+        return command
+
+    def trial_game_command(self, agent: Agent, opponent: Agent, game: int):
+        """
+        alternate which agent moves first as the cli does between games, the gomocup agent
+        leads a gauntlet so it moves first in the first game of a pair
+        """
+        if game % 2 == 0:
+            return self._single_game_command(opponent, agent)
+        return self._single_game_command(agent, opponent)
+
+    def reset_shards(self):
+        self.new_pgn_file(os.path.join(self.log_folder, "population_trial.pgn"))
+        self._clear_shards()
+
+    def _clear_shards(self):
+        shutil.rmtree(self.shard_folder, ignore_errors=True)
+        os.makedirs(self.shard_folder)
+
+    def merge_shards(self):
+        with open(self.pgn_path, "w") as f:
+            for shard_path in sorted(
+                glob.glob(os.path.join(self.shard_folder, "*.pgn"))
+            ):
+                with open(shard_path) as shard:
+                    f.write(shard.read())
+
+    def batch_round_robin(self, population: Population):
+        """
+        play the whole population round robin as one batch of in process games. The batch
+        simulator plays the greedy move choice, not the brain's search, so its fitness is a
+        greedy fitness and is not comparable with gauntlet or local_depth fitness
+        """
+
+        self.new_pgn_file(
+            os.path.join(
+                self.log_folder, f"population_batch{population.generation}.pgn"
+            )
+        )
+
+        timer = Timer()
+        simulator = BatchSimulator(board_size=self.board_size)
+        records = simulator.play(
+            round_robin_pairings(population.agents, self.games_per_pair)
+        )
+        with open(self.pgn_path, "w") as f:
+            for record in records:
+                f.write(record.to_pgn())
+        print(
+            f"greedy batch of {len(records)} games completed ({round(simulator.games_per_second, 2)} games/sec)"
+        )
+        self.record_telemetry(
+            "job",
+            generation=population.generation,
+            job="batch_round_robin",
+            label=f"Batch round robin of {len(population.agents)} agents",
+            agents=len(population.agents),
+            **timer.fields(len(records)),
+        )
 
     def split_tournament(self, population: Population):
         """run several mini round robin tournaments within the population"""
 
-        self._new_pgn_file(f"./log/population_tournament{population.generation}.pgn")
+        self.new_pgn_file(
+            os.path.join(
+                self.log_folder, f"population_tournament{population.generation}.pgn"
+            )
+        )
         self.games_per_pair = 2
 
         agents_groupings = self.split_random_groups(population.agents, repeats=1)
 
+        if self.jobs_in_flight > 1 and not self.local_games:
+            self._orchestrated_round_robins(agents_groupings, population.generation)
+            return
+
         # Run many round robin tournaments for each member of the population
-        with open("./log/tournamentlog.txt", "w") as f:
+        with open(os.path.join(self.log_folder, "tournamentlog.txt"), "w") as f:
             for i, group in enumerate(agents_groupings):
                 print(f"generation {population.generation}", file=f, flush=True)
                 agent_names = [agent.name for agent in group]
@@ -132,10 +529,60 @@ class Tournament:
                     flush=True,
                 )
 
-                start = time.time()
-                self.round_robin(group)
+                timer = Timer()
+                if self.local_games:
+                    self.local_round_robin(group)
+                else:
+                    self.round_robin(group)
+                print(
+                    f"tournament finished in {round(timer.elapsed(), 2)} seconds",
+                    file=f,
+                    flush=True,
+                )
+                self.record_telemetry(
+                    "job",
+                    generation=population.generation,
+                    job="round_robin",
+                    label=f"Round robin tournament for group {i + 1}/{len(agents_groupings)}",
+                    agents=len(group),
+                    **timer.fields(
+                        len(group) * (len(group) - 1) // 2 * self.games_per_pair
+                    ),
+                )
+
+    def _orchestrated_round_robins(
+        self, groups: list[list[GeneticAgent]], generation: Optional[int] = None
+    ):
+        """the round robins of the groups run jobs_in_flight at a time, merged in pgn_path"""
+        self._clear_shards()
+        slots = self.job_slots(len(groups))
+        jobs = []
+        for i, group in enumerate(groups):
+            command = self._round_robin_command(group, slots, self.job_pgn_path(i))
+            games = len(group) * (len(group) - 1) // 2 * self.games_per_pair
+            label = f"Round robin tournament for group {i + 1}/{len(groups)}"
+            jobs.append(Job(label, command, slots, games))
+
+        with open(os.path.join(self.log_folder, "tournamentlog.txt"), "w") as f:
+            for job, group in zip(jobs, groups):
+                print(f"{job.label}: {[agent.name for agent in group]}", file=f)
+
+            def on_finish(job: Job):
                 print(
-                    f"tournament finished in {round(time.time() - start, 2)} seconds",
+                    f"{job.label} finished in {round(job.elapsed, 2)} seconds",
                     file=f,
                     flush=True,
                 )
+                self.record_telemetry(
+                    "job",
+                    generation=generation,
+                    job="round_robin",
+                    label=job.label,
+                    slots=job.slots,
+                    wall_s=round(job.elapsed, 3),
+                    games=job.games,
+                    games_per_sec=round(job.games / job.elapsed, 3),
+                )
+
+            Orchestrator(self.concurrency, on_finish).run(jobs)
+        self.merge_shards()
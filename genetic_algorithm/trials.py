@@ -0,0 +1,509 @@
+"""
+Ways of playing the population trial of a tournament, one class per mode. A trial plays the
+games of the population against the gomocup agents into a fitness stream, the tournament
+gives it the cli commands, the cached games and the shard files it plays with:
+
+    tournament.trial = RacingTrial(round_games=2)
+    tournament.trial = TRIAL_MODES["sharded"]()
+"""
+
+import os
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Optional
+
+from agent import Agent, GeneticAgent, GomocupAgent
+from fitness_cache import genome_hash
+from fitness_stream import FitnessStream
+from orchestrator import Job, Orchestrator
+from population import BREEDING_POOL_SIZE, Population
+from racing import RACE_DELTA, Race
+from rating import RatingModel
+from telemetry import Timer
+
+# games per slot of an orchestrated cli run, short runs leave few idle slots at their end
+JOB_ROUNDS = 4
+
+
+def _play_sharded_game(command: list[str], shard_folder: str):
+    """worker process: play one game, appending it to this worker's pgn shard"""
+    shard_path = os.path.join(shard_folder, f"shard_{os.getpid()}.pgn")
+    result = subprocess.run(command + ["-pgn", shard_path], stdout=subprocess.DEVNULL)
+    result.check_returncode()
+
+
+class PopulationTrial:
+    """
+    A way of playing the population trial. play is given the tournament, whose settings and
+    fitness cache it uses, and the stream the games go to; on_update is called whenever the
+    stream read new games
+    """
+
+    # name of the mode in main.py and the telemetry
+    mode = ""
+    # games are played one by one, so that no cached game of a partly played pair is replayed
+    single_games = False
+    # agents may play fewer or more games than the gauntlet, their fitness is an estimate
+    estimates_fitness = False
+
+    def play(
+        self,
+        tournament,
+        population: Population,
+        gomocup_agents: list[GomocupAgent],
+        stream: FitnessStream,
+        on_update: Optional[Callable[[FitnessStream], None]] = None,
+    ):
+        raise NotImplementedError
+
+    def play_games(
+        self,
+        tournament,
+        executor: ProcessPoolExecutor,
+        games: list[tuple[Agent, Agent, int]],
+        stream: FitnessStream,
+        on_update: Optional[Callable[[FitnessStream], None]],
+    ):
+        """
+        play (agent, opponent, game index) single games on the pool, reading the shards as each
+        game finishes. The games that did finish are read before the error of a failed game
+        is raised
+        """
+        futures = [
+            executor.submit(
+                _play_sharded_game,
+                tournament.trial_game_command(agent, opponent, game),
+                tournament.shard_folder,
+            )
+            for agent, opponent, game in games
+        ]
+        error: Optional[BaseException] = None
+        for future in as_completed(futures):
+            if future.exception() is not None:
+                error = error or future.exception()
+            elif stream.read(os.path.join(tournament.shard_folder, "*.pgn")):
+                if on_update is not None:
+                    on_update(stream)
+        if error is not None:
+            raise error
+
+
+class GauntletTrial(PopulationTrial):
+    """one cli gauntlet after the other, one per gomocup agent"""
+
+    mode = "gauntlet"
+
+    def play(self, tournament, population, gomocup_agents, stream, on_update=None):
+        tournament.new_pgn_file(
+            os.path.join(tournament.log_folder, "population_trial.pgn")
+        )
+        plan = tournament.plan_trial(
+            population, gomocup_agents, stream, whole_pairs=True
+        )
+
+        def play():
+            for i, gomocup_agent in enumerate(gomocup_agents):
+                agents = [agent for agent, _ in plan[gomocup_agent.name]]
+                if not agents:
+                    print(f"Gauntlet {i + 1}/{len(gomocup_agents)} fully cached")
+                    continue
+
+                timer = Timer()
+                label = (
+                    f"Gauntlet {i + 1}/{len(gomocup_agents)} vs {gomocup_agent.name}"
+                )
+                print(label)
+                tournament.gauntlet(gomocup_agent, agents)
+                elapsed = timer.elapsed()
+                games = len(agents) * tournament.games_per_pair
+                print(
+                    f"completed in {round(elapsed, 2)} ({round(games / elapsed, 2)} games/sec)"
+                )
+                tournament.record_telemetry(
+                    "job",
+                    generation=population.generation,
+                    job="gauntlet",
+                    label=label,
+                    agents=len(agents),
+                    **timer.fields(games),
+                )
+
+        tournament.play_following(play, tournament.pgn_path, stream, on_update)
+        # no pgn is written when every gauntlet was cached
+        open(tournament.pgn_path, "a").close()
+        tournament.record_trial(population, gomocup_agents, stream)
+
+
+class OrchestratedTrial(PopulationTrial):
+    """
+    The tournament's jobs_in_flight gauntlet runs at once through the orchestrator, each over
+    a part of the agents and writing its own pgn, so a run that is finishing its last games
+    leaves its slots to the next one
+    """
+
+    mode = "orchestrated"
+
+    def play(self, tournament, population, gomocup_agents, stream, on_update=None):
+        tournament.reset_shards()
+        plan = tournament.plan_trial(
+            population, gomocup_agents, stream, whole_pairs=True
+        )
+        slots = tournament.job_slots()
+        per_job = tournament.agents_per_job or -(
+            -JOB_ROUNDS * slots // tournament.games_per_pair
+        )
+        jobs = []
+        for i, gomocup_agent in enumerate(gomocup_agents):
+            agents = [agent for agent, _ in plan[gomocup_agent.name]]
+            if not agents:
+                print(f"Gauntlet {i + 1}/{len(gomocup_agents)} fully cached")
+                continue
+            for first in range(0, len(agents), per_job):
+                part = agents[first : first + per_job]
+                command = tournament.gauntlet_command(
+                    gomocup_agent, part, slots, tournament.job_pgn_path(len(jobs))
+                )
+                label = (
+                    f"Gauntlet {i + 1}/{len(gomocup_agents)} vs {gomocup_agent.name}"
+                    f" agents {first + 1}-{first + len(part)}"
+                )
+                games = len(part) * tournament.games_per_pair
+                jobs.append(Job(label, command, slots, games))
+
+        start = time.time()
+        print(
+            f"Orchestrated trial: {len(jobs)} gauntlet runs, {tournament.jobs_in_flight}"
+            f" in flight with {slots} of {tournament.concurrency} slots each"
+        )
+
+        def on_finish(job: Job):
+            tournament.record_telemetry(
+                "job",
+                generation=population.generation,
+                job="gauntlet",
+                label=job.label,
+                slots=job.slots,
+                wall_s=round(job.elapsed, 3),
+                games=job.games,
+                games_per_sec=round(job.games / job.elapsed, 3),
+            )
+
+        orchestrator = Orchestrator(tournament.concurrency, on_finish)
+        tournament.play_following(
+            lambda: orchestrator.run(jobs),
+            os.path.join(tournament.shard_folder, "*.pgn"),
+            stream,
+            on_update,
+        )
+        tournament.merge_shards()
+
+        elapsed = time.time() - start
+        games = sum(job.games for job in jobs)
+        print(
+            f"Orchestrated trial completed in {round(elapsed, 2)}"
+            f" ({round(games / elapsed, 2)} games/sec)"
+        )
+        tournament.record_trial(population, gomocup_agents, stream)
+
+
+class ShardedTrial(PopulationTrial):
+    """
+    Every (genetic agent, gomocup agent, game index) is its own work item. Items are spread
+    over a process pool of the tournament's workers, each worker appends its games to its own
+    pgn shard. The stream follows the shards while they are written, they are merged into the
+    trial pgn once every game is played
+    """
+
+    mode = "sharded"
+    single_games = True
+
+    def play(self, tournament, population, gomocup_agents, stream, on_update=None):
+        tournament.reset_shards()
+        plan = tournament.plan_trial(
+            population, gomocup_agents, stream, whole_pairs=False
+        )
+        commands = []
+        for gomocup_agent in gomocup_agents:
+            for agent, first_game in plan[gomocup_agent.name]:
+                for game in range(first_game, tournament.games_per_pair):
+                    commands.append(
+                        tournament.trial_game_command(agent, gomocup_agent, game)
+                    )
+
+        start = time.time()
+        print(f"Sharded trial: {len(commands)} games on {tournament.workers} workers")
+
+        def play():
+            with ProcessPoolExecutor(max_workers=tournament.workers) as executor:
+                futures = [
+                    executor.submit(
+                        _play_sharded_game, command, tournament.shard_folder
+                    )
+                    for command in commands
+                ]
+                for future in as_completed(futures):
+                    future.result()
+
+        tournament.play_following(
+            play, os.path.join(tournament.shard_folder, "*.pgn"), stream, on_update
+        )
+
+        tournament.merge_shards()
+
+        elapsed = time.time() - start
+        print(
+            f"completed in {round(elapsed, 2)} ({round(len(commands) / elapsed, 2)} games/sec)"
+        )
+        tournament.record_trial(population, gomocup_agents, stream)
+
+
+class RacingTrial(PopulationTrial):
+    """
+    Raced in rounds of round_games single games per agent, every agent going through the
+    opponents in the same order. After each round the agents that can not reach the breeding
+    pool are dropped. The games they leave unplayed are then spent on extra rounds for the
+    agents whose fitness is still uncertain around the pool cut, their fitness is the mean
+    score scaled to the full schedule
+    """
+
+    mode = "racing"
+    single_games = True
+    estimates_fitness = True
+
+    def __init__(self, round_games=2, delta=RACE_DELTA):
+        self.round_games = round_games
+        self.delta = delta
+        # games not played thanks to racing, by the last trial
+        self.games_saved = 0
+
+    def play(self, tournament, population, gomocup_agents, stream, on_update=None):
+        tournament.reset_shards()
+        plan = tournament.plan_trial(
+            population, gomocup_agents, stream, whole_pairs=False
+        )
+        opponents = {agent.name: agent for agent in gomocup_agents}
+        agents = {agent.name: agent for agent in population.agents}
+
+        # remaining (opponent name, game index) of every agent, game by game over the opponents
+        schedule: dict[str, list[tuple[str, int]]] = {}
+        for game in range(tournament.games_per_pair):
+            for gomocup_agent in gomocup_agents:
+                for agent, first_game in plan[gomocup_agent.name]:
+                    if game >= first_game:
+                        schedule.setdefault(agent.name, []).append(
+                            (gomocup_agent.name, game)
+                        )
+        scheduled_games = sum(len(games) for games in schedule.values())
+
+        deferred = {agent.name for agent, _ in tournament.deferred}
+        race = Race(
+            stream,
+            [name for name in agents if name not in deferred],
+            BREEDING_POOL_SIZE,
+            self.delta,
+        )
+        played = 0
+        rounds = 0
+        start = time.time()
+
+        def play_round(games: list[tuple[str, str, int]]):
+            self.play_games(
+                tournament,
+                executor,
+                [
+                    (agents[name], opponents[opponent], game)
+                    for name, opponent, game in games
+                ],
+                stream,
+                on_update,
+            )
+
+        with ProcessPoolExecutor(max_workers=tournament.workers) as executor:
+            while True:
+                round_games = []
+                for name in race.contenders:
+                    games = schedule.get(name, [])
+                    round_games += [
+                        (name, opponent, game)
+                        for opponent, game in games[: self.round_games]
+                    ]
+                    schedule[name] = games[self.round_games :]
+                if not round_games:
+                    break
+                play_round(round_games)
+                played += len(round_games)
+                rounds += 1
+                dropped = race.drop_losers()
+                if dropped:
+                    print(f"Race round {rounds}: dropped {', '.join(dropped)}")
+
+            # the games of dropped agents go to the agents near the cut, extra games go on
+            # through the opponents past games_per_pair
+            budget = scheduled_games - played
+            extra_games = {name: 0 for name in race.contenders}
+            extra = 0
+            while True:
+                near = race.near_cut()
+                if not near or len(near) * self.round_games > budget - extra:
+                    break
+                round_games = []
+                for name in near:
+                    for _ in range(self.round_games):
+                        game, opponent = divmod(extra_games[name], len(gomocup_agents))
+                        round_games.append(
+                            (
+                                name,
+                                gomocup_agents[opponent].name,
+                                tournament.games_per_pair + game,
+                            )
+                        )
+                        extra_games[name] += 1
+                play_round(round_games)
+                played += len(round_games)
+                extra += len(round_games)
+                rounds += 1
+
+        tournament.merge_shards()
+        self.games_saved = scheduled_games - played
+        elapsed = time.time() - start
+        print(
+            f"Race finished in {rounds} rounds, {round(elapsed, 2)}s: played {played} of"
+            f" {scheduled_games} scheduled games ({extra} extra near the cut), saved"
+            f" {self.games_saved} with {len(race.dropped)} agents dropped"
+        )
+        tournament.record_trial(population, gomocup_agents, stream)
+
+
+class ScheduledTrial(PopulationTrial):
+    """
+    Scheduled by a rating model seeded with the elo of the gomocup agents. Each round every
+    agent not yet known to be above or below the breeding pool cut plays a single game against
+    the gomocup agent expected to tell the most about its rating. The population plays at most
+    the games of the full gauntlet, one agent at most gauntlets times its share, fitness is the
+    gauntlet fitness expected from the rating
+    """
+
+    mode = "scheduled"
+    single_games = True
+    estimates_fitness = True
+
+    def __init__(self, gauntlets=2):
+        # most games of an agent, in gauntlets
+        self.gauntlets = gauntlets
+        self.rating_model: Optional[RatingModel] = None
+        # gauntlet games not played, by the last trial
+        self.games_saved = 0
+
+    def unsettled_ratings(
+        self, model: RatingModel, names: list[str], games_per_agent: int
+    ):
+        """agents not known to be in or out of the breeding pool that may play more games"""
+        ranked = sorted((model.ratings[name] for name in names), reverse=True)
+        # halfway between the last agent in the breeding pool and the first one out of it
+        cut = None
+        if len(ranked) > BREEDING_POOL_SIZE:
+            cut = (ranked[BREEDING_POOL_SIZE - 1] + ranked[BREEDING_POOL_SIZE]) / 2
+        max_games = games_per_agent * self.gauntlets
+        return [
+            name
+            for name in names
+            if len(model.games.get(name, [])) < max_games
+            and (cut is None or not model.settled(name, cut))
+        ]
+
+    def play(self, tournament, population, gomocup_agents, stream, on_update=None):
+        tournament.reset_shards()
+        tournament.cached_results = {}
+        tournament.deferred = []
+        model = RatingModel({agent.name: agent.elo for agent in gomocup_agents})
+        self.rating_model = model
+        opponents = {agent.name: agent for agent in gomocup_agents}
+
+        # agents with the same genome share the games and rating of the first of them
+        players: dict[str, GeneticAgent] = {}
+        clones: dict[str, list[GeneticAgent]] = {}
+        for agent in population.agents:
+            genome = genome_hash(agent.weights)
+            players.setdefault(genome, agent)
+            clones.setdefault(genome, []).append(agent)
+        agents = {agent.name: agent for agent in players.values()}
+
+        # cached games are evidence for the rating, games per pair give the next colours
+        pair_games: dict[tuple[str, str], int] = {}
+        reused = 0
+        for agent in agents.values():
+            model.add_agent(agent.name)
+            for opponent in gomocup_agents:
+                outcomes = []
+                if tournament.fitness_cache is not None:
+                    outcomes = tournament.fitness_cache.outcomes(
+                        tournament.cache_key(agent, opponent)
+                    )
+                for outcome in outcomes:
+                    model.add_result(agent.name, opponent.name, outcome.score)
+                    stream.add_outcome(agent.name, outcome)
+                tournament.cached_results.setdefault(agent.name, []).extend(outcomes)
+                pair_games[agent.name, opponent.name] = len(outcomes)
+                reused += len(outcomes)
+        model.fit()
+        if tournament.fitness_cache is not None:
+            print(f"Fitness cache: {reused} games seed the ratings")
+
+        budget = len(agents) * stream.games_per_agent
+        played = 0
+        rounds = 0
+        start = time.time()
+        with ProcessPoolExecutor(max_workers=tournament.workers) as executor:
+            while played < budget:
+                unsettled = self.unsettled_ratings(
+                    model, list(agents), stream.games_per_agent
+                )
+                pairings = model.next_pairings(unsettled, list(opponents))
+                pairings = pairings[: budget - played]
+                if not pairings:
+                    break
+                games = []
+                for name, opponent in pairings:
+                    games.append(
+                        (agents[name], opponents[opponent], pair_games[name, opponent])
+                    )
+                    pair_games[name, opponent] += 1
+                first_result = len(stream.results)
+                self.play_games(tournament, executor, games, stream, on_update)
+                for white, black, result, _ in stream.results[first_result:]:
+                    model.add_game(white, black, result)
+                model.fit()
+                played += len(games)
+                rounds += 1
+
+        for genome, agent in players.items():
+            fitness = model.expected_fitness(
+                agent.name, list(opponents), tournament.games_per_pair
+            )
+            for clone in clones[genome]:
+                stream.estimates[clone.name] = fitness
+
+        tournament.merge_shards()
+        self.games_saved = budget - played
+        unsettled = self.unsettled_ratings(model, list(agents), stream.games_per_agent)
+        elapsed = time.time() - start
+        print(
+            f"Scheduled trial: {rounds} rounds, {round(elapsed, 2)}s: played {played} of"
+            f" {budget} gauntlet games, saved {self.games_saved},"
+            f" {len(unsettled)}/{len(agents)} ratings still unsettled"
+        )
+        tournament.record_trial(population, gomocup_agents, stream)
+
+
+# trial classes by mode name
+TRIAL_MODES: dict[str, type[PopulationTrial]] = {
+    trial.mode: trial
+    for trial in (
+        GauntletTrial,
+        ShardedTrial,
+        RacingTrial,
+        ScheduledTrial,
+        OrchestratedTrial,
+    )
+}
@@ -0,0 +1,23 @@
+import os
+import stat
+import sys
+
+import pytest
+
+# the brain and the genetic algorithm are run from their own folders, not installed
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASE_BRAIN = os.path.join(ROOT, "base_brain")
+GENETIC_ALGORITHM = os.path.join(ROOT, "genetic_algorithm")
+sys.path[:0] = [BASE_BRAIN, GENETIC_ALGORITHM]
+FAKE_CLI = os.path.join(ROOT, "tests", "fake_cli.py")
+
+
+@pytest.fixture
+def cli_path(tmp_path):
+    """the fake cli as the single executable path the tournament runs"""
+    if os.name == "nt":
+        pytest.skip("the fake cli is started through a shell script")
+    path = tmp_path / "c-gomoku-cli"
+    path.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{FAKE_CLI}" "$@"\n')
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+    return str(path)
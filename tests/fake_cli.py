@@ -0,0 +1,88 @@
+"""
+Stand in for c-gomoku-cli that plays no engines. It takes the arguments the tournament
+builds, -engine, -games, -gauntlet and -pgn, and appends a game per pairing in the pgn
+format of the cli, a game at a time with a short pause so that the file is read while it
+is still being written. The winner of a game only depends on the agent names and the game
+index, the stronger name by a hash wins unless the game index is odd and the names are close
+"""
+
+import hashlib
+import os
+import sys
+import time
+
+sys.path.insert(
+    0,
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "genetic_algorithm"),
+)
+from referee import GameRecord  # noqa: E402
+
+# seconds between games, FAKE_CLI_PAUSE in the environment overrides it
+PAUSE = 0.01
+
+
+def strength(name: str):
+    return int(hashlib.sha1(name.encode()).hexdigest(), 16) % 1000
+
+
+def play(black: str, white: str, game: int, round: int) -> GameRecord:
+    """result of the game, from white's perspective first, and a move per ply"""
+    difference = strength(black) - strength(white)
+    if abs(difference) < 100 and game % 2 == 1:
+        result = "1/2-1/2"
+    else:
+        result = "0-1" if difference > 0 else "1-0"
+    plies = 9 + (strength(black + white) + game) % 100
+    moves = [(ply % 20, ply // 20) for ply in range(plies)]
+    return GameRecord(black=black, white=white, result=result, moves=moves, round=round)
+
+
+def main(args: list[str]):
+    engines: list[str] = []
+    games = 1
+    pgn_path = None
+    gauntlet = False
+    i = 0
+    while i < len(args):
+        if args[i] == "-engine":
+            # -engine name=... cmd=...
+            engines.append(args[i + 1].split("=", 1)[1])
+            i += 3
+        elif args[i] == "-each":
+            # -each tc=... tolerance=...
+            i += 3
+        elif args[i] in ("-boardsize", "-concurrency", "-games", "-pgn"):
+            if args[i] == "-games":
+                games = int(args[i + 1])
+            elif args[i] == "-pgn":
+                pgn_path = args[i + 1]
+            i += 2
+        elif args[i] == "-gauntlet":
+            gauntlet = True
+            i += 1
+        else:
+            sys.exit(f"unknown argument {args[i]}")
+
+    if gauntlet:
+        pairs = [(engines[0], engine) for engine in engines[1:]]
+    else:
+        pairs = [
+            (first, second)
+            for k, first in enumerate(engines)
+            for second in engines[k + 1 :]
+        ]
+    pause = float(os.environ.get("FAKE_CLI_PAUSE", PAUSE))
+    round = 0
+    with open(pgn_path, "a") as f:
+        for first, second in pairs:
+            # the first engine of a pair moves first in its first game, as in the cli
+            for game in range(games):
+                round += 1
+                black, white = (first, second) if game % 2 == 0 else (second, first)
+                f.write(play(black, white, game, round).to_cli_pgn())
+                f.flush()
+                time.sleep(pause)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,50 @@
+import json
+
+import numpy as np
+from array_population import ArrayPopulation
+from checkpoint import Checkpoint
+from fitness_stream import FitnessStream
+
+RESULTS = ["1-0", "0-1", "1/2-1/2"]
+
+
+def played_stream(population: ArrayPopulation, seed=0):
+    """a round of games between neighbouring agents, in a stream"""
+    rng = np.random.default_rng(seed)
+    names = population.names()
+    stream = FitnessStream(names, 2)
+    for i, name in enumerate(names):
+        stream.add_game(
+            name, names[(i + 1) % len(names)], rng.choice(RESULTS), rng.integers(9, 99)
+        )
+    return stream
+
+
+def test_agents_have_the_fitness_applied():
+    population = ArrayPopulation(12, seed=1)
+    assert [agent.fitness for agent in population.agents] == [-1.0] * 12
+
+    population.apply_fitness(played_stream(population))
+    assert (population.fitness != -1).all()
+    assert [agent.fitness for agent in population.agents] == population.fitness.tolist()
+    assert [agent.model_dump()["fitness"] for agent in population.agents] == (
+        population.fitness.tolist()
+    )
+
+
+def test_checkpoint_resumes_breeding():
+    """a population restored from a checkpoint breeds like the one that went on"""
+    population = ArrayPopulation(12, seed=2)
+    population.apply_fitness(played_stream(population))
+    population.evolve()
+    checkpoint = Checkpoint.capture(population)
+    restored = Checkpoint(**json.loads(checkpoint.model_dump_json())).restore_array()
+
+    assert restored.names() == population.names()
+    np.testing.assert_array_equal(restored.weights, population.weights)
+    for generation in range(3):
+        for evolving in (population, restored):
+            evolving.apply_fitness(played_stream(evolving, seed=generation))
+            evolving.evolve()
+        assert restored.names() == population.names()
+        np.testing.assert_array_equal(restored.weights, population.weights)
@@ -0,0 +1,67 @@
+import functools
+import json
+import random
+import sys
+
+import main
+import pytest
+import tournament
+from agent import GomocupAgent
+from array_population import ArrayPopulation
+
+GENERATIONS = 3
+
+
+def run(folder, monkeypatch, *args):
+    """main in its own log folder, as run from the genetic_algorithm folder"""
+    monkeypatch.chdir(folder)
+    monkeypatch.setattr(sys, "argv", ["main.py", *args])
+    main.main()
+
+
+def final_populations(folder):
+    populations = []
+    for generation in range(1, GENERATIONS + 1):
+        path = folder / "log" / "generations" / f"final_population_gen{generation}.json"
+        with open(path) as f:
+            populations.append(json.load(f))
+    return populations
+
+
+@pytest.mark.parametrize("array_population", [False, True])
+def test_resumed_run_evolves_like_an_uninterrupted_one(
+    tmp_path, cli_path, monkeypatch, array_population
+):
+    monkeypatch.setenv("FAKE_CLI_PAUSE", "0")
+    monkeypatch.setattr(tournament, "GOMOKU_CLI_PATH", cli_path)
+    monkeypatch.setattr(main, "POPULATION_SIZE", 10)
+    monkeypatch.setattr(
+        main, "ArrayPopulation", functools.partial(ArrayPopulation, seed=3)
+    )
+    options = ["--workers", "2"] + ["--array-population"] * array_population
+    folders = []
+    for name in ("straight", "resumed"):
+        folder = tmp_path / name
+        (folder / "gomocup_agents").mkdir(parents=True)
+        opponents = [
+            GomocupAgent(
+                name=f"OPPONENT {i}", elo=1500, cmd="opponent.exe"
+            ).model_dump()
+            for i in range(3)
+        ]
+        (folder / "gomocup_agents" / "agents.json").write_text(json.dumps(opponents))
+        folders.append(folder)
+
+    random.seed(7)
+    run(folders[0], monkeypatch, "--generations", str(GENERATIONS), *options)
+    random.seed(7)
+    run(folders[1], monkeypatch, "--generations", "1", *options)
+    # anything drawn between the runs is undone by the checkpoint
+    random.random()
+    run(
+        folders[1], monkeypatch, "--generations", str(GENERATIONS), "--resume", *options
+    )
+
+    straight, resumed = (final_populations(folder) for folder in folders)
+    assert resumed == straight
+    assert straight[0] != straight[-1]
@@ -0,0 +1,115 @@
+import evaluation
+import numpy as np
+import pytest
+from structs import DEFAULT_GENOME
+
+THREAT_SCALE = 1000
+directions = [[0, 1], [1, 1], [1, 0], [1, -1]]
+
+
+def clamp(value, min_val, max_val):
+    return max(min(value, max_val), min_val)
+
+
+def calculate_value_at_point(genome, board, x, y, maxLength=5, player=1):
+    """the per point loop of the brain before the vectorized evaluator, genome as argument"""
+    value = 0
+    lookup = np.array(genome[:-1]) * THREAT_SCALE
+    for direction in directions:
+        i, j = x, y
+        tilesInARow = 1
+        lengthPos, lengthNeg = 0, 0
+        blocked = False
+
+        for k in range(1, maxLength):  # crawl direction out to max length
+            i += direction[0]
+            j += direction[1]
+            if i < 0 or i >= len(board) or j < 0 or j >= len(board[0]):
+                lengthPos = k - 1
+                blocked = True
+                break
+            if board[i][j] == 0:
+                continue
+            elif board[i][j] == player:  # if new piece of
+                tilesInARow += 1
+            # if there's an enemy piece, threat cannot continue in this direction
+            elif board[i][j] == -player:
+                lengthPos = k - 1
+                blocked = True
+                break
+        i, j = x, y
+        for k in range(1, maxLength):  # crawl direction out to max length
+            i -= direction[0]
+            j -= direction[1]
+            if i < 0 or i >= len(board) or j < 0 or j >= len(board[0]):
+                lengthNeg = k - 1
+                blocked = True
+                break
+            if board[i][j] == 0:
+                continue
+            elif board[i][j] == player:  # if new piece of
+                tilesInARow += 1
+            elif (
+                board[i][j] == -player
+            ):  # if there's an enemy piece, threat cannot continue in this direction
+                lengthNeg = k - 1
+                blocked = True
+                break
+        # if continuous length is bounded on both ends
+        if lengthNeg != 0 and lengthPos != 0:
+            maxLengthAlongAxis = lengthNeg + lengthPos + 1
+            # if the max length of contiguous spaces containing this point between obstructions can't possibly generate a winning threat
+            if maxLengthAlongAxis < 5:
+                break
+        if tilesInARow >= 5:
+            # if this point is part of a winning threat, return infinity/max value
+            return 2.0 * THREAT_SCALE
+        if blocked:
+            value += lookup[
+                clamp(2 * (tilesInARow) - 2, 0, len(lookup) - 1)
+            ]  # if the threat is blocked on one side, use the lookup table to get the value of the threat
+        else:
+            value += lookup[clamp(2 * (tilesInARow) - 1, 0, len(lookup) - 1)]
+    return value
+
+
+def random_board(rng: np.random.Generator):
+    """a board of 5 to 20 points a side, with up to half of it stones and a few blocks"""
+    width, height = rng.integers(5, 21, size=2)
+    board = np.zeros((width, height), dtype=int)
+    stones = rng.integers(0, width * height // 2 + 1)
+    points = rng.choice(width * height, stones, replace=False)
+    board.flat[points] = rng.choice([1, -1, 3], stones, p=[0.48, 0.48, 0.04])
+    return board
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_score_board_matches_per_point_loop(seed):
+    rng = np.random.default_rng(seed)
+    genomes = [list(DEFAULT_GENOME)] + [list(rng.random(9)) for _ in range(2)]
+    for _ in range(10):
+        board = random_board(rng)
+        for genome in genomes:
+            table = evaluation.build_pattern_table(genome)
+            for player in (1, -1):
+                expected = [
+                    [
+                        calculate_value_at_point(genome, board, x, y, player=player)
+                        for y in range(board.shape[1])
+                    ]
+                    for x in range(board.shape[0])
+                ]
+                np.testing.assert_allclose(
+                    evaluation.score_board(board, table, player), expected
+                )
+
+
+def test_score_points_matches_score_board():
+    rng = np.random.default_rng(0)
+    board = random_board(rng)
+    table = evaluation.build_pattern_table(DEFAULT_GENOME)
+    xs, ys = np.nonzero(np.ones_like(board))
+    scores = evaluation.score_board(board, table, player=-1)
+    np.testing.assert_allclose(
+        evaluation.score_points(board, xs, ys, table, player=-1), scores[xs, ys]
+    )
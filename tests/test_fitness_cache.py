@@ -0,0 +1,35 @@
+from fitness_cache import FitnessCache, GameOutcome
+
+
+def cached_games(path, count):
+    cache = FitnessCache(path)
+    games = [
+        (
+            FitnessCache.key([i / 10] * 10, "OPPONENT", "1000", 15),
+            GameOutcome(score="1", plies=9 + i),
+        )
+        for i in range(count)
+    ]
+    cache.add(games)
+    return games
+
+
+def test_truncated_last_line_is_dropped(tmp_path):
+    """a run killed while appending leaves part of a line at the end of the file"""
+    path = str(tmp_path / "fitness_cache.jsonl")
+    games = cached_games(path, 3)
+    with open(path, "rb+") as f:
+        f.truncate(f.seek(0, 2) - 20)
+
+    cache = FitnessCache(path)
+    assert [(key, cache.outcomes(key)) for key, _ in games[:2]] == [
+        (key, [outcome]) for key, outcome in games[:2]
+    ]
+    assert cache.outcomes(games[2][0]) == []
+
+    # games appended afterwards are read back on lines of their own
+    cache.add([games[2]])
+    cache = FitnessCache(path)
+    assert [(key, cache.outcomes(key)) for key, _ in games] == [
+        (key, [outcome]) for key, outcome in games
+    ]
@@ -0,0 +1,74 @@
+import evaluation
+import gomoku_agent_template as brain
+import numpy as np
+import pytest
+from pisqpipe import state
+from structs import DEFAULT_GENOME, Point
+
+
+def full_state():
+    """the score state of the brain's board computed from scratch"""
+    board = brain.npBoard
+    table = evaluation.build_pattern_table(brain.genome)
+    empty = board == 0
+    counts = np.zeros(board.shape, dtype=int)
+    for x, y in zip(*np.nonzero(board)):
+        counts[
+            max(x - brain.RELEVANCE_RANGE, 0) : x + brain.RELEVANCE_RANGE + 1,
+            max(y - brain.RELEVANCE_RANGE, 0) : y + brain.RELEVANCE_RANGE + 1,
+        ] += 1
+    return (
+        np.where(empty, evaluation.score_board(board, table), 0),
+        np.where(empty, evaluation.score_board(board, table, player=-1), 0),
+        counts,
+        brain.zobrist.board_hash(board),
+    )
+
+
+def assert_incremental_state():
+    offensive, defensive, counts, key = full_state()
+    np.testing.assert_array_equal(brain.offensiveScores, offensive)
+    np.testing.assert_array_equal(brain.defensiveScores, defensive)
+    np.testing.assert_array_equal(brain.relevanceCounts, counts)
+    np.testing.assert_array_equal(
+        brain.relevanceCounts > 0, evaluation.relevant_points(brain.npBoard)
+    )
+    assert brain.positionHash == key
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_incremental_state_matches_full_recompute(seed, capsys, monkeypatch):
+    """stones placed, blocked, taken back and boards restarted in a random order"""
+    rng = np.random.default_rng(seed)
+    genome = list(DEFAULT_GENOME) if seed == 0 else rng.random(9).tolist()
+    monkeypatch.setattr(brain, "genome", genome)
+    monkeypatch.setattr(brain, "patternTable", None)
+    brain.load_engine()
+    width, height = rng.integers(5, 21, size=2).tolist()
+    monkeypatch.setattr(state, "width", width)
+    monkeypatch.setattr(state, "height", height)
+    brain.brain_restart()
+    assert_incremental_state()
+
+    for _ in range(150):
+        free = [Point(int(x), int(y)) for x, y in zip(*np.nonzero(brain.npBoard == 0))]
+        stones = [Point(int(x), int(y)) for x, y in zip(*np.nonzero(brain.npBoard))]
+        op = rng.choice(
+            ["my", "opponents", "block", "takeback", "restart"],
+            p=[0.35, 0.35, 0.05, 0.23, 0.02],
+        )
+        if op == "takeback":
+            if stones:
+                assert brain.brain_takeback(stones[rng.integers(len(stones))]) == 0
+        elif op == "restart":
+            brain.brain_restart()
+        elif free:
+            place = {
+                "my": brain.brain_my,
+                "opponents": brain.brain_opponents,
+                "block": brain.brain_block,
+            }[op]
+            place(free[rng.integers(len(free))])
+        assert_incremental_state()
+    # no move was rejected
+    assert "ERROR" not in capsys.readouterr().out
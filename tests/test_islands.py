@@ -0,0 +1,58 @@
+import json
+import threading
+from multiprocessing.connection import Listener
+
+import pytest
+from agent import GeneticAgent, GomocupAgent
+from islands import IslandConfig, authkey, run_island, run_local
+
+
+@pytest.fixture
+def config(tmp_path, cli_path):
+    """two generations of small islands that migrate after the last one"""
+    agents_path = tmp_path / "agents.json"
+    opponents = [
+        GomocupAgent(name=f"OPPONENT {i}", elo=1500, cmd="opponent.exe")
+        for i in range(2)
+    ]
+    agents_path.write_text(json.dumps([agent.model_dump() for agent in opponents]))
+    return IslandConfig(
+        islands=2,
+        population_size=8,
+        generations=2,
+        migration_interval=2,
+        migrants=2,
+        log_folder=str(tmp_path / "islands"),
+        agents_path=str(agents_path),
+        cli_path=cli_path,
+    )
+
+
+def test_run_local(config):
+    results = run_local(config)
+
+    assert sorted(results) == [0, 1]
+    for island, best in results.items():
+        with open(f"{config.log_folder}/island{island}/generation_results.txt") as f:
+            generations = f.read().splitlines()
+        assert generations[-1] == f"Generation 2: {best['fitness']}"
+
+
+def test_island_best_is_not_an_immigrant(config):
+    """an immigrant fitter than the island arrives with the last generation's migration"""
+    immigrant = GeneticAgent(name="Agent 2.0", cmd="agent.exe", fitness=1000.0)
+    with Listener(authkey=authkey()) as listener:
+        island = threading.Thread(target=run_island, args=(0, listener.address, config))
+        island.start()
+        with listener.accept() as connection:
+            messages = [connection.recv()]
+            while messages[-1][0] != "migrate":
+                messages.append(connection.recv())
+            connection.send(("immigrants", [(1, immigrant.model_dump())]))
+            _, best = connection.recv()
+        island.join()
+
+    _, generation, best_fitness, _ = messages[-2]
+    assert generation == 2
+    assert best["fitness"] == best_fitness != immigrant.fitness
+    assert "(island" not in best["name"]
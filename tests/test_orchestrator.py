@@ -0,0 +1,49 @@
+import json
+import os
+import random
+
+from agent import GomocupAgent
+from population import Population
+from telemetry import Telemetry
+from tournament import Tournament
+from trials import OrchestratedTrial
+
+
+def test_orchestrated_trial_streams_the_merged_pgn_fitness(
+    tmp_path, cli_path, monkeypatch
+):
+    # runs long enough for the stream to read them more than once
+    monkeypatch.setenv("FAKE_CLI_PAUSE", "0.05")
+    random.seed(0)
+    log_folder = str(tmp_path / "log")
+    os.makedirs(log_folder)
+    tournament = Tournament(log_folder)
+    tournament.cli_path = cli_path
+    tournament.trial = OrchestratedTrial()
+    tournament.concurrency = 6
+    tournament.jobs_in_flight = 3
+    tournament.agents_per_job = 2
+    tournament.telemetry = Telemetry(os.path.join(log_folder, "telemetry.jsonl"))
+    population = Population(8)
+    opponents = [
+        GomocupAgent(name=f"OPPONENT {i}", elo=1500 + 200 * i, cmd="opponent.exe")
+        for i in range(3)
+    ]
+
+    updates = []
+    stream = tournament.population_trial(population, opponents, updates.append)
+
+    games = len(population.agents) * len(opponents) * tournament.games_per_pair
+    assert len(stream.results) == games
+    # more runs than are in flight at once, read while they were still playing
+    with open(tournament.telemetry.path) as f:
+        records = [json.loads(line) for line in f]
+    jobs = [record for record in records if record["kind"] == "job"]
+    assert len(jobs) > tournament.jobs_in_flight
+    assert len(updates) > 1
+
+    population.apply_fitness(stream)
+    streamed = {agent.name: agent.fitness for agent in population.agents}
+    population.generate_fitness_values(tournament.pgn_path)
+    assert {agent.name: agent.fitness for agent in population.agents} == streamed
+    assert len(set(streamed.values())) > 1
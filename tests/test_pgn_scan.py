@@ -0,0 +1,102 @@
+import random
+
+import pytest
+from fitness_stream import PgnFollower
+from pgn_scan import scan_headers
+from referee import GameRecord
+
+RESULTS = ["1-0", "0-1", "1/2-1/2"]
+
+
+def random_records(games: int, seed=0):
+    rng = random.Random(seed)
+    names = [f"Agent 1.{i}" for i in range(10)] + ["MUSHROOM 3.14159 (2011)"]
+    return [
+        GameRecord(
+            black=black,
+            white=white,
+            result=rng.choice(RESULTS),
+            moves=[
+                (rng.randrange(20), rng.randrange(20))
+                for _ in range(rng.randint(9, 60))
+            ],
+            round=game + 1,
+        )
+        for game, (white, black) in enumerate(
+            rng.sample(names, 2) for _ in range(games)
+        )
+    ]
+
+
+def expected(records: list[GameRecord]):
+    return [
+        (record.white, record.black, record.result, record.ply_count)
+        for record in records
+    ]
+
+
+@pytest.mark.parametrize("writer", ["to_cli_pgn", "to_pgn", "mixed"])
+def test_scan_headers(tmp_path, writer):
+    records = random_records(50)
+    path = tmp_path / "games.pgn"
+    with open(path, "w") as f:
+        for i, record in enumerate(records):
+            if writer == "mixed":
+                f.write(record.to_pgn() if i % 3 else record.to_cli_pgn())
+            else:
+                f.write(getattr(record, writer)())
+    assert list(scan_headers(str(path))) == expected(records)
+
+
+def other_tag_order(record: GameRecord):
+    return (
+        f'[PlyCount "{record.ply_count}"]\n[Result "{record.result}"]\n'
+        f'[Black "{record.black}"]\n[White "{record.white}"]\n\n{record.result}\n\n'
+    )
+
+
+def test_scan_headers_other_tag_order(tmp_path):
+    """games with the tags in an unusual order are read tag by tag"""
+    records = random_records(5)
+    path = tmp_path / "games.pgn"
+    with open(path, "w") as f:
+        for record in records:
+            f.write(other_tag_order(record))
+    assert list(scan_headers(str(path))) == expected(records)
+
+
+@pytest.mark.parametrize("writer", ["to_cli_pgn", "to_pgn", "mixed"])
+def test_follower_reads_games_while_written(tmp_path, writer):
+    """a file written in pieces cut anywhere, even inside a tag, is read game by game"""
+    records = random_records(30, seed=1)
+    if writer == "mixed":
+        # tag by tag games between the usual ones as well
+        writers = [GameRecord.to_cli_pgn, GameRecord.to_pgn, other_tag_order]
+    else:
+        writers = [getattr(GameRecord, writer)]
+    text = "".join(
+        writers[i % len(writers)](record) for i, record in enumerate(records)
+    ).encode()
+    path = tmp_path / "games.pgn"
+    follower = PgnFollower(str(path))
+    assert follower.read_games() == []
+
+    rng = random.Random(2)
+    games = []
+    written = 0
+    with open(path, "wb") as f:
+        while written < len(text):
+            size = rng.randint(1, 200)
+            f.write(text[written : written + size])
+            f.flush()
+            written += size
+            games += follower.read_games()
+    assert games == expected(records)
+    assert games == list(scan_headers(str(path)))
+
+
+def test_scan_headers_missing_tag(tmp_path):
+    path = tmp_path / "games.pgn"
+    path.write_text('[White "a"]\n[Black "b"]\n[Result "1-0"]\n\n1-0\n\n')
+    with pytest.raises(ValueError, match="PlyCount"):
+        list(scan_headers(str(path)))
@@ -0,0 +1,84 @@
+import bench_protocol
+import pytest
+from bench_protocol import DEFAULT_CMD, BrainProcess, is_move
+
+# stop() waits for the working thread to notice the terminate flag
+STOP_BOUND_MS = 50
+
+
+@pytest.fixture
+def brain():
+    brain = BrainProcess(DEFAULT_CMD)
+    yield brain
+    if brain.process.poll() is None:
+        brain.process.kill()
+        brain.process.wait()
+
+
+def reply(brain: BrainProcess, timeout=10.0):
+    """next line of the brain that is not DEBUG or MESSAGE output"""
+    while True:
+        line = brain.lines.get(timeout=timeout)
+        if not line.startswith(("DEBUG", "MESSAGE")):
+            return line
+
+
+def move(line: str):
+    assert is_move(line), line
+    x, y = line.split(",")
+    return int(x), int(y)
+
+
+def test_game_commands(brain):
+    brain.send("INFO timeout_turn 200")
+    brain.send("START 20")
+    assert reply(brain) == "OK"
+
+    brain.send("BEGIN")
+    assert move(reply(brain)) == (10, 10)
+    played = {(10, 10)}
+    for opponent in [(11, 11), (9, 9), (12, 12)]:
+        played.add(opponent)
+        brain.send(f"TURN {opponent[0]},{opponent[1]}")
+        own = move(reply(brain))
+        assert own not in played and all(0 <= v < 20 for v in own)
+        played.add(own)
+
+    brain.send(f"TAKEBACK {own[0]},{own[1]}")
+    assert reply(brain) == "OK"
+    # the taken back point is free again
+    brain.send(f"TAKEBACK {own[0]},{own[1]}")
+    assert reply(brain) == "ERROR bad coordinates"
+
+    brain.send("RESTART")
+    assert reply(brain) == "OK"
+    for line in ["BOARD", "10,10,1", "10,11,2", "DONE"]:
+        brain.send(line)
+    assert move(reply(brain)) not in {(10, 10), (10, 11)}
+
+    brain.send("ABOUT")
+    assert reply(brain).startswith('name="pbrain-geneticPeabrain"')
+    brain.send("END")
+    assert brain.process.wait(timeout=10) == 0
+
+
+def test_bad_commands(brain):
+    brain.send("START 4")
+    assert reply(brain) == "ERROR bad START parameter"
+    brain.send("START 30")
+    assert reply(brain) == "ERROR Maximal board size is 20"
+    brain.send("START 15")
+    assert reply(brain) == "OK"
+    brain.send("TURN 15,0")
+    assert reply(brain) == "ERROR bad coordinates"
+    brain.send("FLIP")
+    assert reply(brain) == "UNKNOWN command FLIP"
+    brain.send("END")
+    assert brain.process.wait(timeout=10) == 0
+
+
+def test_stop_wait_bound():
+    """RESTART, TURN and END while the brain is thinking return within the bound"""
+    stop_waits, _ = bench_protocol.measure(DEFAULT_CMD, rounds=10)
+    for command, waits in stop_waits.items():
+        assert waits and max(waits) < STOP_BOUND_MS, (command, waits)
@@ -0,0 +1,35 @@
+from fitness_cache import GameOutcome
+from fitness_stream import FitnessStream
+from racing import RACE_MIN_GAMES, Race
+
+# scores of each agent's games in order, two agents win every game
+SCRIPT = {
+    "strong 1": ["1"] * 6,
+    "strong 2": ["1"] * 6,
+    "close 1": ["1", "1/2", "1", "1", "1/2", "1"],
+    "close 2": ["1/2", "1", "1", "1/2", "1", "1"],
+    "beaten": ["0"] * 6,
+}
+
+
+def play(race: Race, games: int):
+    """the scripted games of every contender up to games"""
+    for name in race.contenders:
+        for score in SCRIPT[name][race.stream.games[name] : games]:
+            race.stream.add_outcome(name, GameOutcome(score=score, plies=60))
+
+
+def test_race_drops_a_clearly_beaten_agent():
+    stream = FitnessStream(SCRIPT, games_per_agent=12, racing=True)
+    race = Race(stream, list(SCRIPT), pool_size=2)
+
+    play(race, RACE_MIN_GAMES - 1)
+    assert race.drop_losers() == []
+
+    play(race, 6)
+    assert race.drop_losers() == ["beaten"]
+    assert race.contenders == ["strong 1", "strong 2", "close 1", "close 2"]
+    assert race.dropped == ["beaten"]
+    # the close agents can still reach the cut held by the strong ones
+    assert sorted(race.near_cut()) == ["close 1", "close 2", "strong 1", "strong 2"]
+    assert race.drop_losers() == []
@@ -0,0 +1,55 @@
+import math
+
+import numpy as np
+import pytest
+from rating import RatingModel
+
+ANCHORS = {"weak": 1000.0, "middle": 1500.0, "strong": 2000.0}
+
+
+def expected(elo: float, opponent: float):
+    return 1 / (1 + 10 ** ((opponent - elo) / 400))
+
+
+def test_ratings_recover_the_strength_order():
+    rng = np.random.default_rng(0)
+    strengths = {f"agent {i}": 900.0 + 250 * i for i in range(5)}
+    model = RatingModel(ANCHORS)
+    players = {**ANCHORS, **strengths}
+    for name, elo in strengths.items():
+        for opponent in players:
+            if opponent == name:
+                continue
+            for _ in range(20):
+                won = rng.random() < expected(elo, players[opponent])
+                model.add_result(name, opponent, "1" if won else "0")
+    model.fit()
+
+    ratings = [model.ratings[name] for name in strengths]
+    assert ratings == sorted(ratings)
+    for name, elo in strengths.items():
+        assert abs(model.ratings[name] - elo) < 3 * model.sd(name)
+    # the anchors stay where they are
+    assert {name: model.ratings[name] for name in ANCHORS} == ANCHORS
+
+
+@pytest.mark.parametrize("score", ["1", "0"])
+def test_undefeated_or_winless_agents_stay_finite(score):
+    model = RatingModel(ANCHORS)
+    for opponent in ANCHORS:
+        for _ in range(10):
+            model.add_result("agent", opponent, score)
+    model.fit()
+
+    rating, sd = model.ratings["agent"], model.sd("agent")
+    assert math.isfinite(rating) and math.isfinite(sd)
+    if score == "1":
+        assert ANCHORS["strong"] < rating < ANCHORS["strong"] + 2000
+    else:
+        assert ANCHORS["weak"] - 2000 < rating < ANCHORS["weak"]
+    # more games of the same score move the rating further out, without running away
+    for opponent in ANCHORS:
+        model.add_result("agent", opponent, score)
+    model.fit()
+    moved = model.ratings["agent"] - rating
+    assert 0 < (moved if score == "1" else -moved) < 200
@@ -0,0 +1,80 @@
+import evaluation
+import numpy as np
+import pytest
+import search
+from structs import DEFAULT_GENOME
+
+TABLE = evaluation.build_pattern_table(DEFAULT_GENOME)
+
+
+def position(mine, theirs, size=15):
+    board = np.zeros((size, size), dtype=int)
+    for point in mine:
+        board[point] = 1
+    for point in theirs:
+        board[point] = -1
+    return board
+
+
+def searcher(timeout_turn=100_000, should_stop=lambda: False):
+    time_manager = search.TimeManager(timeout_turn, 0, 0)
+    return search.Search(TABLE, DEFAULT_GENOME[-1], time_manager, should_stop)
+
+
+def test_plays_the_immediate_win():
+    """its own four is completed before the opponent's"""
+    board = position([(7, 5), (7, 6), (7, 7), (7, 8)], [(8, 5), (8, 6), (8, 7), (8, 8)])
+    move, score = searcher().run(board, max_depth=4)
+    assert move in [(7, 4), (7, 9)]
+    assert score == search.WIN_VALUE
+
+
+def test_blocks_a_four():
+    board = position([(7, 4), (3, 3)], [(7, 5), (7, 6), (7, 7), (7, 8)])
+    move, score = searcher().run(board, max_depth=4)
+    assert move == (7, 9)
+    assert abs(score) < search.WIN_BOUND
+
+
+@pytest.mark.parametrize(
+    "three, ends",
+    [
+        ([(7, 5), (7, 6), (7, 7)], [(7, 4), (7, 8)]),
+        ([(5, 5), (6, 6), (7, 7)], [(4, 4), (8, 8)]),
+    ],
+)
+def test_blocks_an_open_three(three, ends):
+    """a block away from the three would leave the opponent an open four"""
+    board = position([(12, 12), (3, 3)], three)
+    move, score = searcher().run(board, max_depth=4)
+    assert move in ends
+    assert abs(score) < search.WIN_BOUND
+
+
+MIDGAME = position(
+    [(7, 7), (8, 8), (6, 8), (9, 6), (5, 9)], [(7, 8), (8, 7), (6, 7), (9, 9), (7, 6)]
+)
+
+
+def test_stops_when_terminated():
+    """no depth is completed, the first candidate is played"""
+    runner = searcher(should_stop=lambda: True)
+    move, score = runner.run(MIDGAME)
+    assert runner.depth == 0
+    assert runner.nodes == search.CHECK_INTERVAL
+    assert MIDGAME[move] == 0
+    assert score == -np.inf
+
+
+def test_stops_after_one_depth_without_time():
+    runner = searcher(timeout_turn=0)
+    runner.run(MIDGAME)
+    assert runner.depth == 1
+
+
+def test_stops_on_the_time_budget():
+    runner = searcher(timeout_turn=200)
+    runner.run(MIDGAME)
+    assert 1 <= runner.depth < search.MAX_DEPTH
+    # a depth is aborted every few nodes once the budget is used
+    assert runner.time_manager.elapsed() < 2 * runner.time_manager.budget
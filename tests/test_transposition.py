@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+import transposition
+from transposition import (
+    EXACT,
+    LOWER,
+    UPPER,
+    EvaluationCache,
+    TranspositionTable,
+    Zobrist,
+)
+
+ENTRIES = 1024
+
+
+def test_store_and_probe_round_trip():
+    table = TranspositionTable(ENTRIES)
+    key = 0xDEADBEEF12345678
+    assert table.probe(key) is None
+    table.store(key, -1234.5, 3, LOWER, (7, 11))
+    assert table.probe(key) == (-1234.5, 3, LOWER, (7, 11))
+    # the slot holds a single position, another key in it misses
+    assert table.probe(key + ENTRIES) is None
+    # the same position is always overwritten, shallower or not
+    table.store(key, 10.0, 1, UPPER, (0, 1))
+    assert table.probe(key) == (10.0, 1, UPPER, (0, 1))
+    assert (table.hits, table.probes, table.stores, table.replaced) == (2, 4, 2, 0)
+
+
+def test_evaluation_cache_round_trip():
+    cache = EvaluationCache(ENTRIES, 8)
+    moves = [(3, 4), (14, 0), (7, 7)]
+    cache.store(99, 512.0, moves)
+    cache.store(100, 0.0, [])
+    assert cache.probe(99) == (512.0, moves)
+    assert cache.probe(100) == (0.0, [])
+    assert cache.probe(99 + ENTRIES) is None
+    # always replaces
+    cache.store(99 + ENTRIES, 1.0, moves[:1])
+    assert cache.probe(99) is None
+    assert cache.probe(99 + ENTRIES) == (1.0, moves[:1])
+    assert cache.replaced == 1
+
+
+def test_deeper_results_of_the_search_are_kept():
+    table = TranspositionTable(ENTRIES)
+    deep, shallow, deeper = 5, 5 + ENTRIES, 5 + 2 * ENTRIES
+    table.store(deep, 1.0, 6, EXACT, (1, 1))
+    table.store(shallow, 2.0, 2, EXACT, (2, 2))
+    assert table.probe(shallow) is None
+    assert table.probe(deep) == (1.0, 6, EXACT, (1, 1))
+
+    table.store(deeper, 3.0, 7, EXACT, (3, 3))
+    assert table.probe(deeper) == (3.0, 7, EXACT, (3, 3))
+
+    # results of an earlier search give way to any depth
+    table.new_search()
+    table.store(shallow, 2.0, 2, EXACT, (2, 2))
+    assert table.probe(shallow) == (2.0, 2, EXACT, (2, 2))
+    assert table.replaced == 2
+
+
+@pytest.mark.parametrize("shape", [(15, 15), (20, 20), (7, 12)])
+def test_incremental_hash_matches_the_full_hash(shape):
+    zobrist = Zobrist(*shape)
+    rng = np.random.default_rng(sum(shape))
+    board = np.zeros(shape, dtype=int)
+    key = 0
+    for _ in range(300):
+        x, y = rng.integers(shape[0]), rng.integers(shape[1])
+        if board[x, y]:
+            key ^= zobrist.stone(int(board[x, y]), x, y)
+            board[x, y] = 0
+        else:
+            board[x, y] = rng.choice([1, -1, 3])
+            key ^= zobrist.stone(int(board[x, y]), x, y)
+        assert key == zobrist.board_hash(board)
+    # every process hashes a position the same way
+    assert Zobrist(*shape).board_hash(board) == key
+
+
+@pytest.mark.parametrize("max_memory", [0, 1 << 20, 70_000_000, 10_000])
+def test_tables_are_sized_from_max_memory(max_memory):
+    width = 8
+    memory = (
+        max_memory * transposition.MEMORY_SHARE
+        if max_memory
+        else transposition.DEFAULT_MEMORY
+    )
+    transpositions, evaluations = transposition.create_tables(max_memory, width)
+    for entries, entry_bytes in [
+        (len(transpositions.keys), TranspositionTable.ENTRY_BYTES),
+        (len(evaluations.keys), EvaluationCache.entry_bytes(width)),
+    ]:
+        assert entries & (entries - 1) == 0
+        if entries > transposition.MIN_ENTRIES:
+            # the largest power of two that fits in half of the tables' memory
+            assert entries * entry_bytes <= memory / 2 < 2 * entries * entry_bytes
+        else:
+            assert memory / 2 < 2 * entries * entry_bytes